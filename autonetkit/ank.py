@@ -6,6 +6,9 @@ import autonetkit.log as log
 import networkx as nx
 from ank_utils import unwrap_edges, unwrap_graph, unwrap_nodes
 from anm import NmEdge, NmNode
+from anm.adjacency import Adjacency, numpy
+from anm.interface import SharedInterfaceData
+from anm.segment import SEGMENT_KEYS, members_adjacent, pair_data
 
 try:
     import cPickle as pickle
@@ -38,87 +41,196 @@ def set_node_default(NmGraph, nbunch = None, **kwargs):
     if nbunch is None:
         nbunch = graph.nodes()
     else:
-        nbunch = unwrap_nodes(nbunch)
+        nbunch = [getattr(n, "node_id", n) for n in nbunch]
+    anm = NmGraph._anm
+    defaults = kwargs.items()
     for node in nbunch:
-        for key, val in kwargs.items():
-            if key not in graph.node[node]:
-                graph.node[node][key] = val
-
-
-#TODO: also add ability to copy multiple attributes
+        node_data = graph.node[node]
+        for key, val in defaults:
+            if key not in node_data:
+                node_data[key] = val
+                anm._record(NmGraph._overlay_id, 'set', 'node', node, key)
+
+    anm._node_attrs_set(NmGraph._overlay_id, nbunch, kwargs.keys(),
+                        record = False)
+
+def _attr_pairs(src_attr, dst_attr):
+    """Returns [(src_attr, dst_attr)] for the copy helpers.
+    src_attr and dst_attr are an attribute name, or a list of names"""
+    if isinstance(src_attr, basestring):
+        src_attr = [src_attr]
+    if not dst_attr:
+        dst_attr = src_attr
+    elif isinstance(dst_attr, basestring):
+        dst_attr = [dst_attr]
+    if len(src_attr) != len(dst_attr):
+        raise ValueError("Can't copy %s to %s" % (src_attr, dst_attr))
+    return zip(src_attr, dst_attr)
+
+def _cast(val, type):
+    #TODO: use a dtype to take an int, float, etc
+    if type is float:
+        return float(val)
+    elif type is int:
+        return int(val)
+    return val
 
 #TODO: rename to copy_node_attr_from
 def copy_attr_from(overlay_src, overlay_dst, src_attr, dst_attr = None, nbunch = None, type = None, default = None):
-    #TODO: add dest format, eg to convert to int
-    if not dst_attr:
-        dst_attr = src_attr
+    """Copies src_attr of nodes in nbunch (default all) to dst_attr.
+    src_attr and dst_attr can be lists, to copy several attributes
+    in one pass, eg
+    copy_attr_from(g_in, g_bgp, ["ibgp_l2_cluster", "ibgp_l3_cluster"],
+        ["hrr_cluster", "rr_cluster"])
+    """
+    attrs = _attr_pairs(src_attr, dst_attr)
 
     graph_src = unwrap_graph(overlay_src)
     graph_dst = unwrap_graph(overlay_dst)
     if not nbunch:
         nbunch = graph_src.nodes()
+    else:
+        nbunch = [getattr(n, "node_id", n) for n in nbunch]
 
+    copied = []
     for n in nbunch:
         try:
-            val = graph_src.node[n].get(src_attr, default)
+            src_data = graph_src.node[n]
         except KeyError:
             #TODO: check if because node doesn't exist in dest, or because attribute doesn't exist in graph_src
-            log.debug("Unable to copy node attribute %s for %s in %s" % (src_attr, n, overlay_src))
-        else:
-            #TODO: use a dtype to take an int, float, etc
-            if type is float:
-                val = float(val)
-            elif type is int:
-                val = int(val)
+            log.debug("Unable to copy node attributes %s for %s in %s" % (
+                [src for (src, _) in attrs], n, overlay_src))
+            continue
+
+        try:
+            dst_data = graph_dst.node[n]
+        except KeyError:
+            continue
+        for (src, dst) in attrs:
+            val = src_data.get(src, default)
+            if type is not None:
+                val = _cast(val, type)
+            dst_data[dst] = val
+        copied.append(n)
 
-            if n in graph_dst:
-                graph_dst.node[n][dst_attr] = val
+    overlay_dst._anm._node_attrs_set(overlay_dst._overlay_id, copied,
+                                     [dst for (_, dst) in attrs])
 
 def copy_int_attr_from(overlay_src, overlay_dst, src_attr, dst_attr = None, nbunch = None, type = None, default = None):
-    # note; uses high-level API for practicality over raw speed
-    if not dst_attr:
-        dst_attr = src_attr
+    """As for copy_attr_from, for the physical interfaces of nodes in
+    nbunch"""
+    attrs = _attr_pairs(src_attr, dst_attr)
 
+    graph_src = unwrap_graph(overlay_src)
+    graph_dst = unwrap_graph(overlay_dst)
     if not nbunch:
-        nbunch = overlay_src.nodes()
+        nbunch = graph_src.nodes()
+    nbunch = [getattr(n, "node_id", n) for n in nbunch]
 
+    anm = overlay_dst._anm
+    graph_phy = anm.overlay_nx_graphs['phy']
+    shared = {}
     for node in nbunch:
-        for src_int in node:
-            val = src_int.get(src_attr)
-            if val is None:
-                val = default
-
-            if type is float:
-                val = float(val)
-            elif type is int:
-                val = int(val)
-
-            dst_int = overlay_dst.interface(src_int)
-            if dst_int is not None:
-                dst_int.set(dst_attr, val)
+        try:
+            src_interfaces = graph_src.node[node]['_interfaces']
+            dst_interfaces = graph_dst.node[node]['_interfaces']
+        except KeyError:
+            log.debug("Unable to copy interface attributes %s for %s to %s"
+                      % ([src for (src, _) in attrs], node, overlay_dst))
+            continue
+
+        # as for NmInterface.type: other overlays take the type from phy
+        type_interfaces = {}
+        if overlay_src._overlay_id not in ('input', 'phy'):
+            type_interfaces = graph_phy.node.get(node, {}).get(
+                '_interfaces', {})
+
+        for interface_id, src_data in src_interfaces.items():
+            if interface_id == 0:
+                continue  # loopback zero
+            type_data = type_interfaces.get(interface_id, src_data)
+            if type_data.get('type') != 'physical':
+                continue
+
+            values = []
+            for (src, dst) in attrs:
+                val = src_data.get(src)
+                if val is None:
+                    val = default
+                values.append((dst, _cast(val, type)))
+
+            dst_data = dst_interfaces.get(interface_id)
+            if dst_data is None:
+                log.debug("Unable to copy interface attributes %s for %s.%s to %s"
+                          % ([src for (src, _) in attrs], interface_id,
+                             node, overlay_dst))
+                continue
+            if isinstance(dst_data, SharedInterfaceData):
+                # copy on write
+                dst_interfaces[interface_id] = _shared_copy(dst_data,
+                                                            values, shared)
+            else:
+                dst_data.update(values)
+            for (dst, _) in values:
+                anm._record(overlay_dst._overlay_id, 'set', 'interface',
+                            (node, interface_id), dst)
 
 def copy_edge_attr_from(overlay_src, overlay_dst, src_attr, dst_attr = None, type = None, default = None):
+    """As for copy_attr_from, for all edges of overlay_src"""
+    attrs = _attr_pairs(src_attr, dst_attr)
+
     graph_src = unwrap_graph(overlay_src)
     graph_dst = unwrap_graph(overlay_dst)
-    if not dst_attr:
-        dst_attr = src_attr
 
+    copied = []
     for src, dst in graph_src.edges():
+        src_data = graph_src[src][dst]
+        values = [(dst_attr, _cast(src_data.get(src_attr, default), type))
+                  for (src_attr, dst_attr) in attrs]
+        if graph_dst.has_edge(src, dst):
+            graph_dst[src][dst].update(values)
+            copied.append((src, dst))
+        else:
+            log.debug("Unable to copy edge attributes %s for (%s, %s) not in target graph %s" % ([s for (s, _) in attrs], src, dst, overlay_dst))
+
+    overlay_dst._anm._edge_attrs_set(overlay_dst._overlay_id, copied,
+                                     [dst_attr for (_, dst_attr) in attrs])
+
+def _shared_copy(data, values, shared):
+    """Returns a copy of the SharedInterfaceData data updated with values,
+    shared with the other copies in shared with the same attributes,
+    rather than a dict per interface. Unshared if values aren't hashable"""
+    copy = dict(data)
+    copy.update(values)
+    try:
+        key = frozenset(copy.items())
+        return shared.setdefault(key, SharedInterfaceData(copy))
+    except TypeError:
+        return copy
+
+def set_int_attrs(NmGraph, values):
+    """Sets interface attributes from (node_id, interface_id, [(attr,
+    value)]) in values, in order, as interface.attr = value does but
+    without an interface handle for each. Interfaces not yet written to
+    that end up with the same attributes share them copy-on-write"""
+    graph = unwrap_graph(NmGraph)
+    anm = NmGraph._anm
+    shared = {}
+    for (node, interface_id, attrs) in values:
         try:
-            val = graph_src[src][dst].get(src_attr, default)
-        except KeyError:
-            #TODO: check if because edge doesn't exist in dest, or because attribute doesn't exist in graph_src
-            log.debug("Unable to copy edge attribute %s for (%s, %s) in %s" % (src_attr, src, dst, overlay_src))
+            interfaces = graph.node[node]['_interfaces']
+            data = interfaces[interface_id]
+        except KeyError, e:
+            log.warning(e)
+            continue
+        if isinstance(data, SharedInterfaceData):
+            # copy on write
+            interfaces[interface_id] = _shared_copy(data, attrs, shared)
         else:
-            #TODO: use a dtype to take an int, float, etc
-            if type is float:
-                val = float(val)
-            elif type is int:
-                val = int(val)
-            if graph_dst.has_edge(src, dst):
-                graph_dst[src][dst][dst_attr] = val
-            else:
-                log.debug("Unable to copy edge attribute %s for (%s, %s) not in target graph %s" % (src_attr, src, dst, overlay_dst))
+            data.update(attrs)
+        for (attr, _) in attrs:
+            anm._record(NmGraph._overlay_id, 'set', 'interface',
+                        (node, interface_id), attr)
 
 #TODO: make edges own module
 def wrap_edges(NmGraph, edges):
@@ -188,6 +300,10 @@ def split(NmGraph, edges, retain = [], id_prepend = ""):
 
     graph.remove_edges_from(edges)
     graph.add_edges_from(edges_to_add)
+    NmGraph._anm._invalidate_handles(NmGraph._overlay_id, ebunch=edges)
+    NmGraph._anm._invalidate_bindings(NmGraph._overlay_id,
+                                      (n for e in edges for n in e))
+    NmGraph._anm._invalidate_edge_index(NmGraph._overlay_id)
 
     return wrap_nodes(NmGraph, added_nodes)
 
@@ -231,30 +347,166 @@ def explode_nodes(NmGraph, nodes, retain = []):
         graph.add_edges_from(edges_to_add)
         added_edges += edges_to_add
 
+        NmGraph._anm._invalidate_handles(NmGraph._overlay_id, [node])
         graph.remove_node(node)
+        NmGraph._anm._invalidate_bindings(NmGraph._overlay_id,
+                                          neighbors + [node])
+    NmGraph._anm._invalidate_edge_index(NmGraph._overlay_id)
+    NmGraph._anm._invalidate_phy_attrs(NmGraph._overlay_id, nodes)
     return wrap_edges(NmGraph, added_edges)
 
+def multipoint_nodes(NmGraph, nodes, retain = [], group_attr = None):
+    """Replaces each node in nodes (eg an aggregated switch) with a
+    multipoint segment joining the interfaces its neighbors bind to it,
+    rather than the full mesh of edges explode_nodes adds.
+    Edge, neighbor and interface binding queries expand the segment to the
+    same pairs on demand.
+    Keys in retain are copied from the edges to the segment, which is
+    marked multipoint. If group_attr is set, neighbors with the same value
+    of it are not adjacent over the segment (see NmGraph.add_segment).
+    As with explode_nodes, an edge already between two adjacent neighbors
+    is bound to their interfaces on the segment instead.
+    Returns the segments added.
+    """
+    log.debug("Replacing nodes with multipoint segments")
+    try:
+        retain.lower()
+        retain = [retain] # was a string, put into list
+    except AttributeError:
+        pass # already a list
+
+    graph = unwrap_graph(NmGraph)
+    nodes = list(unwrap_nodes(nodes))
+    segments = []
+    for node in nodes:
+        neighbors = graph.neighbors(node)
+        interfaces = {}
+        data = {}
+        for neigh in neighbors:
+            if graph.has_edge(neigh, node):
+                edge_data = graph[neigh][node]
+            else:
+                edge_data = graph[node][neigh]  # directed from node only
+            interfaces[neigh] = edge_data["_interfaces"][neigh]
+            data.update((key, edge_data.get(key)) for key in retain)
+
+        NmGraph._anm._invalidate_handles(NmGraph._overlay_id, [node])
+        graph.remove_node(node)
+        NmGraph._anm._invalidate_bindings(NmGraph._overlay_id,
+                                          neighbors + [node])
+        data['multipoint'] = True
+        segment = NmGraph.add_segment(node, interfaces.items(),
+                                      group_attr, **data)
+        if segment is None:
+            continue
+        segments.append(segment)
+
+        # edges between adjacent members: as the mesh replaced these,
+        # bind them to the segment interfaces
+        segment_data = segment._data
+        for src in interfaces:
+            for dst in graph.neighbors(src):
+                if dst in interfaces and members_adjacent(segment_data,
+                        src, dst, graph.is_directed()):
+                    graph[src][dst].update(pair_data(segment_data, src,
+                                                     dst))
+        NmGraph._anm._invalidate_bindings(NmGraph._overlay_id, interfaces)
+
+    NmGraph._anm._invalidate_edge_index(NmGraph._overlay_id)
+    NmGraph._anm._invalidate_phy_attrs(NmGraph._overlay_id, nodes)
+    return segments
+
+def split_segments(NmGraph, attribute):
+    """Splits each segment of NmGraph into one per value of attribute of
+    its members, eg "asn" to keep IGP adjacencies within an AS.
+    Members with no others of the same value are no longer joined.
+    """
+    for segment in NmGraph.segments():
+        by_value = {}
+        for interface in segment.interfaces():
+            value = interface.node.get(attribute)
+            by_value.setdefault(value, []).append(interface)
+        if len(by_value) == 1:
+            continue # all members have the same value
+
+        data = dict((key, val) for (key, val) in segment._data.items()
+                    if key not in SEGMENT_KEYS)
+        NmGraph.remove_segment(segment)
+        for (value, interfaces) in by_value.items():
+            segment_id = "%s_%s" % (segment.segment_id, value)
+            NmGraph.add_segment(segment_id, interfaces, **data)
+
 def label(NmGraph, nodes):
     return list(NmGraph._anm.node_label(node) for node in nodes)
 
+def node_clusters(graph, nodes):
+    """Returns (clusters, boundaries) for nodes of the NetworkX graph, from
+    one pass over their adjacency, without copying the graph.
+    clusters are lists of nodes joined by edges between them (in both
+    directions, for directed graphs), ordered as in nodes. boundaries[i]
+    are the (src, dst) edges out of clusters[i]"""
+    members = []
+    parent = {}
+    for node in nodes:
+        if node in graph and node not in parent:
+            members.append(node)
+            parent[node] = node
+
+    def find(node):
+        root = node
+        while parent[root] != root:
+            root = parent[root]
+        while parent[node] != root:
+            (parent[node], node) = (root, parent[node])
+        return root
+
+    directed = graph.is_directed()
+    one_way = False
+    edges = []
+    for src in members:
+        for dst in graph[src]:
+            edges.append((src, dst))
+            if dst not in parent:
+                continue
+            if directed and src not in graph[dst]:
+                one_way = True  # may still be joined through a cycle
+                continue
+            (src_root, dst_root) = (find(src), find(dst))
+            if src_root != dst_root:
+                parent[dst_root] = src_root
+
+    if one_way:
+        # strongly connected components: rare, copy the member subgraph
+        subgraph = graph.subgraph(members)
+        for component in nx.strongly_connected_components(subgraph):
+            root = component[0]
+            for node in component:
+                parent[node] = root
+
+    index = {}
+    cluster_of = {}
+    clusters = []
+    for node in members:
+        root = find(node)
+        if root not in index:
+            index[root] = len(clusters)
+            clusters.append([])
+        cluster = cluster_of[node] = index[root]
+        clusters[cluster].append(node)
+
+    boundaries = [[] for _ in clusters]
+    for (src, dst) in edges:
+        cluster = cluster_of[src]
+        if cluster_of.get(dst) != cluster:
+            boundaries[cluster].append((src, dst))
+
+    return (clusters, boundaries)
+
 def connected_subgraphs(NmGraph, nodes):
     nodes = list(unwrap_nodes(nodes))
     graph = unwrap_graph(NmGraph)
-    subgraph = graph.subgraph(nodes)
-    if not len(subgraph.edges()):
-        #print "Nothing to aggregate for %s: no edges in subgraph"
-        pass
-    total_added_edges = []
-    if graph.is_directed():
-        component_nodes_list = nx.strongly_connected_components(subgraph)
-    else:
-        component_nodes_list = nx.connected_components(subgraph)
-
-    wrapped = []
-    for component in component_nodes_list:
-        wrapped.append(list(wrap_nodes(NmGraph, component)))
-
-    return wrapped
+    (clusters, _) = node_clusters(graph, nodes)
+    return [list(wrap_nodes(NmGraph, cluster)) for cluster in clusters]
 
 def aggregate_nodes(NmGraph, nodes, retain = []):
     """Combines connected into a single node"""
@@ -266,57 +518,40 @@ def aggregate_nodes(NmGraph, nodes, retain = []):
 
     nodes = list(unwrap_nodes(nodes))
     graph = unwrap_graph(NmGraph)
-    subgraph = graph.subgraph(nodes)
-    if not len(subgraph.edges()):
-        #print "Nothing to aggregate for %s: no edges in subgraph"
-        pass
+    directed = graph.is_directed()
     total_added_edges = []
-    if graph.is_directed():
-        component_nodes_list = nx.strongly_connected_components(subgraph)
-    else:
-        component_nodes_list = nx.connected_components(subgraph)
-    for component_nodes in component_nodes_list:
+    nodes_to_remove = []
+    (clusters, boundaries) = node_clusters(graph, nodes)
+    for (component_nodes, external_edges) in zip(clusters, boundaries):
         if len(component_nodes) > 1:
             base = component_nodes.pop() # choose one base device to retain
-            nodes_to_remove = set(component_nodes) # remaining nodes, set for fast membership test
-            external_edges = nx.edge_boundary(graph, component_nodes)
             edges_to_add = []
             for src, dst in external_edges:
                 # src is the internal node to remove
-                if src == base or dst == base:
+                if src == base:
                     continue # don't alter edges from base
-                else:
-                    if src in nodes_to_remove:
-                        # edge from component to outside
-                        interfaces = graph[src][dst]["_interfaces"]
-                        dst_int_id = interfaces[dst]
-                        data = dict( (key, graph[src][dst][key]) for key in retain)
-                        data['_interfaces'] = {dst: dst_int_id}
-                        edges_to_add.append((base, dst, data))
-                        if graph.is_directed():
-                            # other direction
-                            #TODO: check which data should be copied
-                            dst_data = dict( (key, graph[src][dst][key]) for key in retain)
-                            dst_data['_interfaces'] = {dst: dst_int_id}
-                            edges_to_add.append((dst, base, dst_data))
-                    else:
-                        # edge from outside into component
-                        interfaces = graph[dst][src]["_interfaces"]
-                        src_int_id = interfaces[src]
-                        data = dict( (key, graph[dst][src][key]) for key in retain)
-                        data['_interfaces'] = {src: src_int_id}
-                        edges_to_add.append((base, src, data))
-                        if graph.is_directed():
-                            # other direction
-                            #TODO: check which data should be copied
-                            dst_data = dict( (key, graph[src][dst][key]) for key in retain)
-                            dst_data['_interfaces'] = {src: src_int_id}
-                            edges_to_add.append((src, base, dst_data))
+                interfaces = graph[src][dst]["_interfaces"]
+                dst_int_id = interfaces[dst]
+                data = dict( (key, graph[src][dst][key]) for key in retain)
+                data['_interfaces'] = {dst: dst_int_id}
+                edges_to_add.append((base, dst, data))
+                if directed:
+                    # other direction
+                    #TODO: check which data should be copied
+                    dst_data = dict( (key, graph[src][dst][key]) for key in retain)
+                    dst_data['_interfaces'] = {dst: dst_int_id}
+                    edges_to_add.append((dst, base, dst_data))
 
             graph.add_edges_from(edges_to_add)
             total_added_edges += edges_to_add
-            graph.remove_nodes_from(nodes_to_remove)
-
+            nodes_to_remove += component_nodes
+
+    NmGraph._anm._invalidate_handles(NmGraph._overlay_id, nodes_to_remove)
+    graph.remove_nodes_from(nodes_to_remove)
+    # edges moved onto base nodes from across the overlay
+    NmGraph._anm._invalidate_bindings(NmGraph._overlay_id)
+    NmGraph._anm._invalidate_edge_index(NmGraph._overlay_id)
+    NmGraph._anm._invalidate_phy_attrs(NmGraph._overlay_id, nodes)
     return wrap_edges(NmGraph, total_added_edges)
 
 # chain of two or more nodes
@@ -326,7 +561,14 @@ def most_frequent(iterable):
 # from http://stackoverflow.com/q/1518522
     g = itertools.groupby
     try:
-        return max(g(sorted(iterable)), key=lambda(x, v):(len(list(v)),-iterable.index(x)))[0]
+        first = {}
+        for (index, item) in enumerate(iterable):
+            first.setdefault(item, index)
+        position = first.__getitem__
+    except TypeError:
+        position = iterable.index  # unhashable values
+    try:
+        return max(g(sorted(iterable)), key=lambda(x, v):(len(list(v)),-position(x)))[0]
     except ValueError, e:
         log.warning("Unable to calculate most_frequent, %s" % e)
         return None
@@ -346,6 +588,13 @@ def neigh_most_frequent(NmGraph, node, attribute, attribute_graph = None, allow_
         values = [v for v in values if v is not None]
     return most_frequent(values)
 
+def _average(values):
+    """mean of values if numeric, else most frequent value"""
+    try:
+        values = [float(val) for val in values]
+        return sum(values)/len(values)
+    except ValueError:
+        return most_frequent(values)
 
 def neigh_average(NmGraph, node, attribute, attribute_graph = None):
     """ averages out attribute from neighbors in specified NmGraph
@@ -361,11 +610,7 @@ def neigh_average(NmGraph, node, attribute, attribute_graph = None):
     node = unwrap_nodes(node)
     values = [attribute_graph.node[n].get(attribute) for n in graph.neighbors(node)]
 #TODO: use neigh_attr
-    try:
-        values = [float(val) for val in values]
-        return sum(values)/len(values)
-    except ValueError:
-        return most_frequent(values)
+    return _average(values)
 
 def neigh_attr(NmGraph, node, attribute, attribute_graph = None):
     #TODO: tidy up parameters to take attribute_graph first, and then evaluate if attribute_graph set, if not then use attribute_graph as attribute
@@ -387,6 +632,188 @@ def neigh_equal(NmGraph, node, attribute, attribute_graph = None):
     neigh_attrs = neigh_attr(NmGraph, node, attribute, attribute_graph)
     return len(set(neigh_attrs)) == 1
 
+# Bulk versions of the neigh_ functions: one result per node of nodes, in
+# order, computed with NumPy over a CSR snapshot of their neighbors.
+# nodes can be a snapshot from neigh_adjacency, to share it between calls
+
+def neigh_adjacency(NmGraph, nodes):
+    """Returns a snapshot of the neighbors of nodes in NmGraph, to pass as
+    nodes to the bulk neigh_ functions. The snapshot isn't updated if
+    NmGraph changes. The list of nodes if NumPy isn't installed"""
+    nodes = list(nodes)
+    if numpy is None:
+        return nodes
+    return Adjacency(unwrap_graph(NmGraph), unwrap_nodes(nodes))
+
+def _neigh_values(NmGraph, nodes, attribute, attribute_graph, present_only):
+    """Returns (adjacency, values) for nodes: values has attribute (from
+    attribute_graph) for each neighbor in adjacency. Neighbors not in
+    attribute_graph have value None if present_only, else raise KeyError"""
+    graph = unwrap_graph(NmGraph)
+    if attribute_graph:
+        attribute_graph = unwrap_graph(attribute_graph)
+    else:
+        attribute_graph = graph # use input graph
+    if isinstance(nodes, Adjacency):
+        adjacency = nodes
+    else:
+        adjacency = Adjacency(graph, unwrap_nodes(nodes))
+    attr_nodes = attribute_graph.node
+    if present_only:
+        values = [attr_nodes[n].get(attribute) if n in attr_nodes else None
+                  for n in adjacency.neighbors]
+    else:
+        values = [attr_nodes[n].get(attribute) for n in adjacency.neighbors]
+    return (adjacency, values)
+
+def _neigh_column(NmGraph, adjacency, attribute, attribute_graph):
+    """Returns (values, present) arrays of attribute for each neighbor in
+    adjacency, sliced from its column in attribute_graph (see
+    anm.columnar_attributes). None if attribute isn't held in a column, or
+    a neighbor isn't in attribute_graph"""
+    overlay = attribute_graph or NmGraph
+    found = overlay._anm._node_column(overlay._overlay_id, attribute)
+    if found is None:
+        return None
+    (columns, (values, present)) = found
+    rows = columns.rows_for(adjacency.neighbors)
+    if rows is None:
+        return None
+    return (values[rows], present[rows])
+
+def _neigh_present(NmGraph, adjacency, attribute_graph):
+    """Returns if each neighbor in adjacency is in attribute_graph"""
+    if attribute_graph:
+        attribute_graph = unwrap_graph(attribute_graph)
+    else:
+        attribute_graph = unwrap_graph(NmGraph)
+    return [n in attribute_graph for n in adjacency.neighbors]
+
+def neigh_averages(NmGraph, nodes, attribute, attribute_graph = None):
+    """neigh_average for each of nodes"""
+    if numpy is None:
+        return [neigh_average(NmGraph, node, attribute, attribute_graph)
+                for node in nodes]
+
+    if isinstance(nodes, Adjacency):
+        adjacency = nodes
+    else:
+        adjacency = Adjacency(unwrap_graph(NmGraph), unwrap_nodes(nodes))
+    found = _neigh_column(NmGraph, adjacency, attribute, attribute_graph)
+    if found is not None:
+        (numeric, valid) = found
+        numeric = numeric.astype(float)
+        values = None  # read for rows with unset values only
+    else:
+        (_, values) = _neigh_values(NmGraph, adjacency, attribute,
+                                    attribute_graph, False)
+        numeric = numpy.zeros(len(values))
+        valid = numpy.ones(len(values), dtype=bool)
+        for (index, value) in enumerate(values):
+            try:
+                numeric[index] = float(value)
+            except (TypeError, ValueError):
+                valid[index] = False
+
+    # summed in neighbor order, as sum() does
+    rows = adjacency.rows
+    sums = numpy.bincount(rows, weights=numeric[adjacency.indices],
+                          minlength=len(adjacency))
+    invalid = numpy.bincount(rows, weights=~valid[adjacency.indices],
+                             minlength=len(adjacency))
+    result = []
+    for row in range(len(adjacency)):
+        count = int(adjacency.counts[row])
+        if count and not invalid[row]:
+            result.append(float(sums[row]) / count)
+        else:
+            # non-numeric (or no) neighbors: as neigh_average
+            if values is None:
+                (_, values) = _neigh_values(NmGraph, adjacency, attribute,
+                                            attribute_graph, False)
+            result.append(_average(adjacency.row_values(values, row)))
+    return result
+
+def neigh_most_frequents(NmGraph, nodes, attribute, attribute_graph = None, allow_none = False):
+    """neigh_most_frequent for each of nodes"""
+    if numpy is None:
+        return [neigh_most_frequent(NmGraph, node, attribute,
+                                    attribute_graph, allow_none)
+                for node in nodes]
+
+    (adjacency, values) = _neigh_values(NmGraph, nodes, attribute,
+                                        attribute_graph, False)
+    try:
+        uniques = sorted(set(values))
+    except TypeError:
+        # unhashable values
+        return [neigh_most_frequent(NmGraph, node, attribute,
+                                    attribute_graph, allow_none)
+                for node in wrap_nodes(NmGraph, adjacency.nodes)]
+
+    # codes in sorted order: ties go to the smallest value, as in the
+    # sorted list neigh_most_frequent passes to most_frequent
+    rank = dict((value, code) for (code, value) in enumerate(uniques))
+    codes = numpy.array([rank[value] for value in values],
+                        dtype=int)[adjacency.indices]
+    rows = adjacency.rows
+    if not allow_none and None in rank:
+        keep = codes != rank[None]
+        (codes, rows) = (codes[keep], rows[keep])
+
+    size = max(len(uniques), 1)
+    (keys, counts) = numpy.unique(rows * size + codes, return_counts=True)
+    (key_rows, key_codes) = divmod(keys, size)
+    best = {}
+    for index in numpy.lexsort((key_codes, -counts, key_rows)):
+        best.setdefault(key_rows[index], key_codes[index])
+
+    result = []
+    for row in range(len(adjacency)):
+        if row in best:
+            result.append(uniques[best[row]])
+        else:
+            result.append(most_frequent([]))  # logs, as for no values
+    return result
+
+def neigh_attrs(NmGraph, nodes, attribute, attribute_graph = None):
+    """neigh_attr for each of nodes, as lists"""
+    if numpy is None:
+        return [list(neigh_attr(NmGraph, node, attribute, attribute_graph))
+                for node in nodes]
+
+    (adjacency, values) = _neigh_values(NmGraph, nodes, attribute,
+                                        attribute_graph, True)
+    present = _neigh_present(NmGraph, adjacency, attribute_graph)
+    return [[value for (value, keep) in zip(adjacency.row_values(values, row),
+                                            adjacency.row_values(present, row))
+             if keep] for row in range(len(adjacency))]
+
+def neigh_equals(NmGraph, nodes, attribute, attribute_graph = None):
+    """neigh_equal for each of nodes"""
+    if numpy is None:
+        return [neigh_equal(NmGraph, node, attribute, attribute_graph)
+                for node in nodes]
+
+    (adjacency, values) = _neigh_values(NmGraph, nodes, attribute,
+                                        attribute_graph, True)
+    present = numpy.array(_neigh_present(NmGraph, adjacency,
+                                         attribute_graph), dtype=bool)
+    codes = {}
+    value_codes = numpy.array([codes.setdefault(value, len(codes))
+                               for value in values], dtype=int)
+
+    keep = present[adjacency.indices]
+    rows = adjacency.rows[keep]
+    entry_codes = value_codes[adjacency.indices][keep]
+    lowest = numpy.empty(len(adjacency), dtype=int)
+    lowest.fill(len(codes))
+    highest = numpy.empty(len(adjacency), dtype=int)
+    highest.fill(-1)
+    numpy.minimum.at(lowest, rows, entry_codes)
+    numpy.maximum.at(highest, rows, entry_codes)
+    return [bool(equal) for equal in lowest == highest]
+
 def unique_attr(NmGraph, attribute):
     graph = unwrap_graph(NmGraph)
     return set(graph.node[node].get(attribute) for node in graph)
@@ -150,6 +150,8 @@ def ank_json_loads(data):
 
 def jsonify_anm(anm):
     """ Returns a dictionary of json-ified overlay graphs"""
+    # saved models have every overlay, as restored models have no builders
+    anm.build_overlays()
     anm_json = {}
     for overlay_id in anm.overlays():
         NmGraph = anm[overlay_id]._graph.copy()
@@ -169,7 +171,9 @@ def shortened_interface(name):
     return name
 
 def jsonify_anm_with_graphics(anm, nidb = None):
-    """ Returns a dictionary of json-ified overlay graphs, with graphics data appended to each overlay"""
+    """ Returns a dictionary of json-ified overlay graphs, with graphics data appended to each overlay.
+    Overlays not yet built (see NetworkModel.add_overlay_builder) aren't
+    built to be visualised, so are left out"""
     anm_json = {}
     test_anm_data = {}
     graphics_graph = anm["graphics"]._graph.copy()
@@ -196,6 +200,20 @@ def jsonify_anm_with_graphics(anm, nidb = None):
     for overlay_id in anm.overlays():
         NmGraph = anm[overlay_id]._graph.copy()
 
+        # draw multipoint segments as a node linked to each member
+        segments = NmGraph.graph.pop('_segments', {})
+        for segment_id, segment_data in segments.items():
+            if segment_id in attribute_cache:
+                NmGraph.add_node(segment_id)  # eg the switch it replaced
+            else:
+                NmGraph.add_node(segment_id, device_type="broadcast_domain")
+            edge_data = dict((key, val) for key, val in segment_data.items()
+                if not key.startswith("_"))
+            for member, interface_id in segment_data['_interfaces'].items():
+                if member in NmGraph:
+                    NmGraph.add_edge(member, segment_id, attr_dict=edge_data,
+                        _interfaces={member: interface_id})
+
         for node in NmGraph:
             node_data = dict(attribute_cache.get(node, {}))
             # update with node data from this overlay
@@ -248,9 +266,12 @@ def jsonify_anm_with_graphics(anm, nidb = None):
                         except KeyError:
                             #TODO: check why arrive here - something not initialised?
                             continue
-                        NmGraph.node[node]['_interfaces'][interface_id]['id'] = nidb_interface_id
+                        # copy as interface data can be shared between interfaces
+                        interface_data = dict(overlay_interfaces[interface_id])
+                        interface_data['id'] = nidb_interface_id
                         id_brief = shortened_interface(nidb_interface_id)
-                        NmGraph.node[node]['_interfaces'][interface_id]['id_brief'] = id_brief
+                        interface_data['id_brief'] = id_brief
+                        overlay_interfaces[interface_id] = interface_data
 
         anm_json[overlay_id] = ank_json_dumps(NmGraph)
         test_anm_data[overlay_id] = NmGraph
@@ -3,6 +3,9 @@ AutoNetkit Utilities
 """
 
 #from anm import overlay_node, overlay_edge
+import heapq
+import re
+
 import autonetkit
 
 def call_log(fn, *args, **kwargs):
@@ -28,6 +31,289 @@ def unwrap_graph(nm_graph):
     return nm_graph._graph
 
 
+def natural_sort_key(label):
+    """Key to sort labels in the way that humans expect, eg r2 before r11.
+    Non-string labels, such as integer node ids, sort on their value."""
+    try:
+        chunks = re.split('([0-9]+)', label)
+    except TypeError:
+        return (label, )
+    return tuple(int(chunk) if chunk.isdigit() else chunk
+                 for chunk in chunks)
+
+class InterfaceIdAllocator(object):
+
+    """Allocates free interface ids (from 1, as 0 is loopback zero) for
+    an interface dict, in amortised O(1).
+    Keeps a high-water mark plus a heap of free ids below it. Built from
+    the dict, so a dict replaced or resized other than through the
+    allocator (eg restored from ank_json) is picked up by rebuilding,
+    see tracks(), and the lowest free id is returned.
+    In-place changes that keep the size of the dict (an id removed and
+    another added) aren't seen: the ids returned are still free, but not
+    necessarily the lowest."""
+
+    __slots__ = ('interfaces', 'size', 'next_id', 'free')
+
+    def __init__(self, interfaces):
+        self.interfaces = interfaces
+        self.size = len(interfaces)
+        used = set(interfaces)
+        high_water = max([0] + [i for i in used if isinstance(i, int)])
+        self.next_id = high_water + 1
+        self.free = [i for i in range(1, high_water) if i not in used]
+        heapq.heapify(self.free)
+
+    def tracks(self, interfaces):
+        """Returns if allocations are up to date with interfaces: the
+        same dict, at the size the allocator left it"""
+        return interfaces is self.interfaces \
+            and len(interfaces) == self.size
+
+    def allocate(self):
+        """Returns a free interface id, the lowest unless the dict was
+        changed in place (see above). The caller adds the interface to
+        the dict with this id."""
+        interfaces = self.interfaces
+        free = self.free
+        while free:
+            interface_id = heapq.heappop(free)
+            if interface_id not in interfaces:
+                break
+        else:
+            while self.next_id in interfaces:
+                self.next_id += 1
+            interface_id = self.next_id
+            self.next_id += 1
+        self.size += 1
+        return interface_id
+
+class _FilteredAdjacency(object):
+
+    """Read-only mapping of node -> data, for keys of mapping that are
+    in members"""
+
+    __slots__ = ('mapping', 'members')
+
+    def __init__(self, mapping, members):
+        self.mapping = mapping
+        self.members = members
+
+    def __getitem__(self, key):
+        if key not in self.members:
+            raise KeyError(key)
+        return self.mapping[key]
+
+    def __contains__(self, key):
+        return key in self.members and key in self.mapping
+
+    def __iter__(self):
+        members = self.members
+        return (key for key in self.mapping if key in members)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self):
+        return list(self)
+
+    def items(self):
+        return [(key, self.mapping[key]) for key in self]
+
+    def iteritems(self):
+        return ((key, self.mapping[key]) for key in self)
+
+    def values(self):
+        return [self.mapping[key] for key in self]
+
+
+class _FilteredNodes(_FilteredAdjacency):
+
+    """Read-only mapping of node -> adjacency, for members only, with the
+    adjacency also restricted to members"""
+
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        return _FilteredAdjacency(
+            super(_FilteredNodes, self).__getitem__(key), self.members)
+
+    def __iter__(self):
+        return iter(self.members)
+
+    def __len__(self):
+        return len(self.members)
+
+
+class SubgraphView(object):
+
+    """Read-only view of the NetworkX graph, restricted to a set of its
+    nodes. Supports the read API of networkx.Graph (iteration, node and
+    edge data, neighbors, degree, edges) without copying node or edge
+    structure: data is that of the graph, so attributes set through the
+    view are set on the graph. Nodes and edges added to or removed from
+    the graph show in the view, for nodes in the view. Use copy() for a
+    (mutable) networkx subgraph."""
+
+    def __init__(self, graph, nbunch):
+        self._parent = graph
+        self._nodes = []  # in nbunch order, as iterated
+        self._members = set()
+        for node in nbunch:
+            if node in graph and node not in self._members:
+                self._nodes.append(node)
+                self._members.add(node)
+        self.graph = graph.graph
+        self.node = _FilteredAdjacency(graph.node, self._members)
+        self.adj = _FilteredNodes(graph.adj, self._members)
+        if graph.is_directed():
+            self.succ = self.adj
+            self.pred = _FilteredNodes(graph.pred, self._members)
+
+    def __repr__(self):
+        return "SubgraphView of %s nodes" % len(self._members)
+
+    def __iter__(self):
+        return (node for node in self._nodes if node in self._parent)
+
+    def __len__(self):
+        parent = self._parent
+        return sum(1 for node in self._nodes if node in parent)
+
+    def __contains__(self, node):
+        try:
+            return node in self._members and node in self._parent
+        except TypeError:
+            return False
+
+    def __getitem__(self, node):
+        return self.adj[node]
+
+    def is_directed(self):
+        return self._parent.is_directed()
+
+    def is_multigraph(self):
+        return self._parent.is_multigraph()
+
+    def has_node(self, node):
+        return node in self
+
+    def has_edge(self, src, dst):
+        return src in self and dst in self and self._parent.has_edge(src, dst)
+
+    def nbunch_iter(self, nbunch=None):
+        """Nodes of nbunch (a node, or container of nodes) in the view"""
+        if nbunch is None:
+            return iter(self)
+        if nbunch in self:
+            return iter([nbunch])
+        return (node for node in nbunch if node in self)
+
+    def nodes_iter(self, data=False):
+        if data:
+            return ((node, self._parent.node[node]) for node in self)
+        return iter(self)
+
+    def nodes(self, data=False):
+        return list(self.nodes_iter(data))
+
+    def number_of_nodes(self):
+        return len(self)
+
+    order = number_of_nodes
+
+    def neighbors_iter(self, node):
+        return iter(self.adj[node])
+
+    def neighbors(self, node):
+        return list(self.adj[node])
+
+    successors_iter = neighbors_iter
+    successors = neighbors
+
+    def predecessors_iter(self, node):
+        return iter(self.pred[node])
+
+    def predecessors(self, node):
+        return list(self.pred[node])
+
+    def edges_iter(self, nbunch=None, data=False):
+        """Edges from nodes in nbunch, each once for undirected views"""
+        members = self._members
+        parent_adj = self._parent.adj
+        multigraph = self._parent.is_multigraph()
+        seen = None if self._parent.is_directed() else set()
+        for src in self.nbunch_iter(nbunch):
+            for (dst, edge_data) in parent_adj[src].iteritems():
+                if dst not in members or (seen is not None and dst in seen):
+                    continue
+                if multigraph:
+                    for key_data in edge_data.values():
+                        yield (src, dst, key_data) if data else (src, dst)
+                else:
+                    yield (src, dst, edge_data) if data else (src, dst)
+            if seen is not None:
+                seen.add(src)
+
+    def edges(self, nbunch=None, data=False):
+        return list(self.edges_iter(nbunch, data))
+
+    out_edges_iter = edges_iter
+    out_edges = edges
+
+    def in_edges_iter(self, nbunch=None, data=False):
+        for dst in self.nbunch_iter(nbunch):
+            for (src, edge_data) in self.pred[dst].iteritems():
+                yield (src, dst, edge_data) if data else (src, dst)
+
+    def in_edges(self, nbunch=None, data=False):
+        return list(self.in_edges_iter(nbunch, data))
+
+    def get_edge_data(self, src, dst, default=None):
+        if src in self and dst in self:
+            return self._parent.get_edge_data(src, dst, default)
+        return default
+
+    def degree_iter(self, nbunch=None):
+        for node in self.nbunch_iter(nbunch):
+            if self._parent.is_multigraph():
+                degree = sum(len(keys) for keys in self.adj[node].values())
+            else:
+                degree = len(self.adj[node])
+            if self._parent.is_directed():
+                degree += len(self.pred[node])
+            elif node in self._parent.adj[node]:
+                degree += 1  # self loops count twice
+            yield (node, degree)
+
+    def degree(self, nbunch=None):
+        if nbunch in self:
+            return self.degree_iter(nbunch).next()[1]
+        return dict(self.degree_iter(nbunch))
+
+    def size(self):
+        return sum(1 for _ in self.edges_iter())
+
+    def number_of_edges(self, src=None, dst=None):
+        if src is None:
+            return self.size()
+        return 1 if self.has_edge(src, dst) else 0
+
+    def subgraph(self, nbunch):
+        """View of nodes of nbunch in this view"""
+        return SubgraphView(self._parent, self.nbunch_iter(nbunch))
+
+    def copy(self):
+        """Returns the nodes of the view as a networkx subgraph, with its
+        own copy of the data, as networkx.Graph.copy()"""
+        return self._parent.subgraph(self._nodes).copy()
+
 def alphabetical_sort( l ):
     """From http://stackoverflow.com/questions/2669059/how-to-sort-alpha-numeric-set-in-python"""
 #TODO: fix as currently only handles strings - not objects with repr?
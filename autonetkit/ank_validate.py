@@ -34,7 +34,19 @@ def validate_ibgp(anm):
 
     for asn, devices in ank_utils.groupby("asn", g_ibgp_v4):
         asn_subgraph = g_ibgp_v4.subgraph(devices)
-        graph = asn_subgraph._graph
+        graph = asn_subgraph._graph.copy()
+        # full mesh segments connect their members: a cycle through them
+        # is enough for connectivity, without expanding each session
+        for segment in g_ibgp_v4.segments():
+            if segment.get("_groups") or segment.get("_removed"):
+                graph.add_edges_from((e.src_id, e.dst_id)
+                    for e in segment.edges() if e.src_id in graph
+                    and e.dst_id in graph)
+                continue
+            members = [n.node_id for n in segment if n.node_id in graph]
+            if len(members) > 1:
+                graph.add_edges_from(zip(members,
+                                         members[1:] + members[:1]))
         # get subgraph
         if not nx.is_strongly_connected(graph):
             g_ibgp_v4.log.warning("iBGP v4 topology for ASN%s is disconnected" % asn)
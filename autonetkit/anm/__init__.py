@@ -2,4 +2,5 @@ from autonetkit.anm.network_model import NetworkModel as NetworkModel
 from autonetkit.anm.graph import NmGraph as NmGraph
 from autonetkit.anm.node import NmNode as NmNode
 from autonetkit.anm.edge import NmEdge as NmEdge
-from autonetkit.anm.interface import NmInterface as NmInterface
\ No newline at end of file
+from autonetkit.anm.interface import NmInterface as NmInterface
+from autonetkit.anm.segment import NmSegment as NmSegment
\ No newline at end of file
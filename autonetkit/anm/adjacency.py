@@ -0,0 +1,44 @@
+try:
+    import numpy
+except ImportError:
+    numpy = None  # optional: bulk helpers fall back to per-node loops
+
+
+class Adjacency(object):
+
+    """Neighbors of a list of nodes of a NetworkX graph, as a compressed
+    sparse row (CSR) snapshot: the neighbors of nodes[row] are
+    neighbors[indices[indptr[row]:indptr[row + 1]]], and rows[entry] is
+    the row of each entry. neighbors are unique, so an attribute is read
+    once per neighbor however many rows share it. Not updated if the
+    graph changes"""
+
+    def __init__(self, graph, nodes):
+        self.nodes = list(nodes)
+        self.neighbors = []
+        positions = {}
+        indices = []
+        indptr = [0]
+        for node in self.nodes:
+            for neigh in graph.neighbors(node):
+                try:
+                    indices.append(positions[neigh])
+                except KeyError:
+                    positions[neigh] = len(self.neighbors)
+                    indices.append(positions[neigh])
+                    self.neighbors.append(neigh)
+            indptr.append(len(indices))
+
+        self.indices = numpy.array(indices, dtype=int)
+        self.indptr = numpy.array(indptr, dtype=int)
+        self.counts = numpy.diff(self.indptr)
+        self.rows = numpy.repeat(numpy.arange(len(self.nodes)), self.counts)
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def row_values(self, values, row):
+        """Returns values (one per neighbor) for the neighbors of row"""
+
+        return [values[index] for index
+                in self.indices[self.indptr[row]:self.indptr[row + 1]]]
@@ -6,6 +6,7 @@ from autonetkit.anm.edge import NmEdge
 from autonetkit.anm.graph_data import NmGraphData
 from autonetkit.anm.interface import NmInterface
 from autonetkit.anm.node import NmNode
+from autonetkit.anm.segment import NmSegment
 from autonetkit.exception import OverlayNotFound
 from autonetkit.log import CustomAdapter
 
@@ -18,7 +19,7 @@ class OverlayBase(object):
     def __init__(self, anm, overlay_id):
         """"""
 
-        if overlay_id not in anm.overlay_nx_graphs:
+        if not anm.has_overlay(overlay_id):  # builds lazy overlays
             raise OverlayNotFound(overlay_id)
             #TODO: return False instead?
         self._overlay_id = overlay_id
@@ -61,15 +62,15 @@ class OverlayBase(object):
         '''returns edge in this graph with same src and dst'''
 
         if isinstance(edge_to_find, NmEdge):
-            src_id = edge_to_find.src
-            dst_id = edge_to_find.dst
+            src_id = edge_to_find.src_id
+            dst_id = edge_to_find.dst_id
 
             # TODO: add MultiGraph support in terms of key here
 
-            for (src, dst) in self._graph.edges_iter(src_id):
-                if dst == dst_id:
-                    return NmEdge(self._anm, self._overlay_id,
-                                       src, dst)
+            if self._has_edge(src_id, dst_id):
+                return NmEdge(self._anm, self._overlay_id, src_id,
+                              dst_id)
+            src_id = edge_to_find.src
 
         # TODO: tidy this logic up
 
@@ -78,7 +79,7 @@ class OverlayBase(object):
             dst = dst_to_find
             src.lower()
             dst.lower()
-            if self._graph.has_edge(src, dst):
+            if self._has_edge(src, dst):
                 return NmEdge(self._anm, self._overlay_id, src,
                                    dst)
         except AttributeError:
@@ -96,12 +97,16 @@ class OverlayBase(object):
             src_id = None
             search_id = edge_to_find
 
+        if dst_to_find:
+            # searching by nodes
+            if self._has_edge(src_id, search_id):
+                return NmEdge(self._anm, self._overlay_id, src_id,
+                              search_id)
+            return
+
         for (src, dst) in self._graph.edges_iter(src_id):
             try:
                 if (src, dst) == (src_id, search_id):
-
-                    # searching by nodes
-
                     return NmEdge(self._anm, self._overlay_id,
                                        src, dst)
             except KeyError:
@@ -114,7 +119,7 @@ class OverlayBase(object):
 
     def node(self, key):
         """Returns node based on name
-        This is currently O(N). Could use a lookup table"""
+        Label lookups use the label index held by the NetworkModel"""
 
         try:
             if key.node_id in self._graph:
@@ -125,18 +130,17 @@ class OverlayBase(object):
             # doesn't have node_id, likely a label string, search based on this
             # label
 
-            for node in self:
-                if str(node) == key:
-                    return node
+            node_id = self._anm._label_lookup(self._overlay_id, key,
+                                              self._graph)
+            if node_id is not None:
+                return NmNode(self._anm, self._overlay_id, node_id)
             log.warning('Unable to find node %s in %s ' % (key, self))
             return None
 
     def overlay(self, key):
         """Get to other overlay graphs in functions"""
 
-        #TODO: refactor: shouldn't be returning concrete instantiation from abstract parent!
-        from autonetkit.anm.graph import NmGraph
-        return NmGraph(self._anm, key)
+        return self._anm[key]
 
     @property
     def name(self):
@@ -155,7 +159,29 @@ class OverlayBase(object):
     def has_edge(self, edge):
         """Tests if edge in graph"""
 
-        return self._graph.has_edge(edge.src, edge.dst)
+        return self._has_edge(edge.src_id, edge.dst_id)
+
+    def _has_edge(self, src_id, dst_id):
+        """Tests if src_id and dst_id are joined by an edge, or are
+        adjacent over a segment"""
+
+        if self._graph.has_edge(src_id, dst_id):
+            return True
+        return src_id in self._graph and dst_id in self._graph \
+            and self._anm._segment_of_pair(self._overlay_id, src_id,
+                                           dst_id) is not None
+
+    def segments(self):
+        """Multipoint segments of the overlay, see NmSegment"""
+
+        return [NmSegment(self._anm, self._overlay_id, segment_id)
+                for segment_id in self._anm._segments(self._overlay_id)]
+
+    def segment(self, segment_id):
+        """Returns the segment with segment_id, or None"""
+
+        if segment_id in self._anm._segments(self._overlay_id):
+            return NmSegment(self._anm, self._overlay_id, segment_id)
 
     def __iter__(self):
         """"""
@@ -170,12 +196,11 @@ class OverlayBase(object):
     def nodes(self, *args, **kwargs):
         """"""
 
-        result = iter(NmNode(self._anm, self._overlay_id, node)
-                    for node in self._graph)
-
         if len(args) or len(kwargs):
-            result = self.filter(result, *args, **kwargs)
-        return result
+            return self.filter(None, *args, **kwargs)
+
+        return iter(NmNode(self._anm, self._overlay_id, node)
+                    for node in self._graph)
 
     def routers(self, *args, **kwargs):
         """Shortcut for nodes(), sets device_type to be router"""
@@ -231,10 +256,23 @@ class OverlayBase(object):
         *args,
         **kwargs
     ):
-        """"""
+        """Filters nbunch (default all nodes) on args being set, and
+        kwargs matching. Without nbunch, uses a compiled predicate on
+        the node data, and any attribute indexes opted in to on the
+        NetworkModel"""
 
         if not nbunch:
-            nbunch = self.nodes()
+            predicate = self._anm._compile_node_filter(self._overlay_id,
+                                                       args, kwargs)
+            node_ids = None
+            if self._graph is self._anm.overlay_nx_graphs[self._overlay_id]:
+                # indexes cover the full overlay, not subgraphs
+                node_ids = self._anm._indexed_nodes(self._overlay_id,
+                                                    args, kwargs, predicate)
+            if node_ids is None:
+                node_ids = (n for n in self._graph if predicate(n))
+            return (NmNode(self._anm, self._overlay_id, n)
+                    for n in node_ids)
 
         def filter_func(node):
             """Filter based on args and kwargs"""
@@ -252,7 +290,43 @@ class OverlayBase(object):
         *args,
         **kwargs
     ):
-        """"""
+        """Edges from src_nbunch (default all nodes) to dst_nbunch,
+        filtered on args being set, and kwargs matching. Without node
+        bunches, uses any edge attribute indexes opted in to on the
+        NetworkModel.
+        Pairs of members adjacent over a segment are included, expanded
+        from the segments with matching attributes, unless segments=False
+        is passed"""
+
+        expand_segments = kwargs.pop('segments', True)
+        segment_edges = []
+        if expand_segments and self._anm._segments(self._overlay_id):
+            # node bunches are read twice
+            if src_nbunch and not hasattr(src_nbunch, 'node_id'):
+                src_nbunch = list(src_nbunch)
+                if not src_nbunch:
+                    return []
+            if dst_nbunch and not hasattr(dst_nbunch, 'node_id'):
+                dst_nbunch = list(dst_nbunch)
+                if not dst_nbunch:
+                    return []
+            segment_edges = self._segment_edges(src_nbunch, dst_nbunch,
+                                                args, kwargs)
+
+        if (len(args) or len(kwargs)) and not src_nbunch \
+                and not dst_nbunch and not self._graph.is_multigraph():
+            predicate = self._anm._compile_edge_filter(self._overlay_id,
+                                                       args, kwargs)
+            edges = None
+            if self._graph is self._anm.overlay_nx_graphs[self._overlay_id]:
+                # indexes cover the full overlay, not subgraphs
+                edges = self._anm._indexed_edges(self._overlay_id, args,
+                                                 kwargs, predicate)
+            if edges is None:
+                edges = (e for e in self._graph.edges_iter()
+                         if predicate(*e))
+            return [NmEdge(self._anm, self._overlay_id, src, dst)
+                    for (src, dst) in edges] + segment_edges
 
 # nbunch may be single node
 
@@ -298,4 +372,37 @@ class OverlayBase(object):
         else:
             result = (NmEdge(self._anm, self._overlay_id, src,
                                   dst) for (src, dst) in valid_edges)
-        return list(result)
+        return list(result) + segment_edges
+
+    def _segment_edges(self, src_nbunch, dst_nbunch, args, kwargs):
+        """Edges for pairs of members adjacent over a segment, from
+        src_nbunch to dst_nbunch (a node or nodes, default all), for
+        segments with attributes matching args and kwargs. Pairs share the
+        attributes of their segment, so each segment is only tested once"""
+
+        src_ids = dst_ids = None
+        if src_nbunch is not None:
+            try:
+                src_ids = [src_nbunch.node_id]
+            except AttributeError:
+                src_ids = [n.node_id for n in src_nbunch]
+        if dst_nbunch:
+            try:
+                dst_ids = set([dst_nbunch.node_id])
+            except AttributeError:
+                dst_ids = set(n.node_id for n in dst_nbunch)
+
+        predicate = None
+        if len(args) or len(kwargs):
+            def predicate(data):
+                """Filter based on args and kwargs"""
+
+                return all(data.get(key) for key in args) \
+                    and all(data.get(key) == val for (key, val) in
+                            kwargs.items())
+
+        pairs = self._anm._segment_pairs(self._overlay_id, self._graph,
+                                         src_ids, predicate)
+        return [NmEdge(self._anm, self._overlay_id, src, dst)
+                for (src, dst) in pairs
+                if dst_ids is None or dst in dst_ids]
@@ -0,0 +1,126 @@
+try:
+    import numpy
+except ImportError:
+    numpy = None  # optional: without it, bulk access reads the dicts
+
+# NumPy kind of the Python types a column can hold: values are read back
+# from the column as the same type
+PYTHON_KINDS = {bool: 'b', int: 'i', long: 'i', float: 'f'}
+
+
+def value_kind(values):
+    """Returns the NumPy kind ('b', 'i' or 'f') shared by the Python values,
+    or None if they are of several kinds, or not bool, int or float"""
+
+    kinds = set(PYTHON_KINDS.get(type(value)) for value in values)
+    if len(kinds) != 1:
+        return None
+    return kinds.pop()
+
+
+class AttributeColumns(object):
+
+    """Numeric attributes of a fixed set of items (node ids, or (src, dst)
+    edges) held as NumPy arrays, indexed by a dense row per item.
+    A column only holds values of one Python type (bool, int or float),
+    so values read from it are those of the data dicts. Columns are kept
+    in step with the dicts, which serialisation and direct readers use:
+    a column is dropped (rebuilt on next use) rather than allowed to go
+    stale."""
+
+    def __init__(self, items):
+        self.items = list(items)
+        self.rows = dict((item, row) for (row, item)
+                         in enumerate(self.items))
+        # attr -> (values, present), or None if attr has non-numeric values
+        self.columns = {}
+
+    def __len__(self):
+        return len(self.items)
+
+    def column(self, attr, getter):
+        """Returns (values, present) arrays for attr, built with
+        getter(item) on first use. None if attr has no values, or values
+        of several types or non-numeric types"""
+
+        try:
+            return self.columns[attr]
+        except KeyError:
+            pass
+
+        values = [getter(item) for item in self.items]
+        present = numpy.array([value is not None for value in values],
+                              dtype=bool)
+        data = [value for value in values if value is not None]
+        kind = value_kind(data)
+        if kind is not None:
+            data = numpy.array(data)
+        if kind is None or data.dtype.kind != kind:
+            column = None  # eg ints too large for int64
+        else:
+            column = numpy.zeros(len(values), dtype=data.dtype)
+            column[present] = data
+            column = (column, present)
+        self.columns[attr] = column
+        return column
+
+    def rows_for(self, items):
+        """Returns a row array for items, or None if any is not stored"""
+
+        try:
+            return numpy.array([self.rows[item] for item in items],
+                               dtype=int)
+        except KeyError:
+            return None
+
+    def set_values(self, attr, rows, values):
+        """Sets attr to Python values (a scalar, or one per row) for rows,
+        if the column is built. The column is dropped if rows is None
+        (items not stored) or values aren't of the type it holds"""
+
+        if attr not in self.columns:
+            return  # built on next read
+        column = self.columns[attr]
+        if column is None or rows is None:
+            del self.columns[attr]
+            return
+
+        (column, present) = column
+        kind = value_kind(values if isinstance(values, list) else [values])
+        if kind == column.dtype.kind:
+            values = numpy.asarray(values)
+        if kind != column.dtype.kind or values.dtype.kind != kind:
+            del self.columns[attr]  # rebuilt on next read
+            return
+        column[rows] = values
+        present[rows] = True
+
+    def value(self, attr, item):
+        """Returns attr of item as its Python value. Raises KeyError if
+        the column isn't built, or item isn't stored or has no value"""
+
+        column = self.columns[attr]
+        if column is None:
+            raise KeyError(attr)
+        row = self.rows[item]
+        (values, present) = column
+        if not present[row]:
+            raise KeyError(item)
+        return values[row].item()
+
+    def update(self, attr, items, getter):
+        """Refreshes attr for items from getter(item)"""
+
+        if attr not in self.columns:
+            return
+        for item in items:
+            row = self.rows.get(item)
+            if row is None:
+                continue  # removed, or added directly: caught by size check
+            value = getter(item)
+            if value is None:
+                column = self.columns.get(attr)
+                if column is not None:
+                    column[1][row] = False
+                continue
+            self.set_values(attr, row, value)
@@ -11,22 +11,52 @@ class NmEdge(object):
 
     """API to access link in network"""
 
-    def __init__(
-        self,
+    __slots__ = ('anm', 'overlay_id', 'src_id', 'dst_id', '_log')
+
+    def __new__(
+        cls,
         anm,
         overlay_id,
         src_id,
         dst_id,
     ):
+        try:
+            return anm._edge_handles[overlay_id][src_id][dst_id]
+        except KeyError:
+            pass
 
+        self = object.__new__(cls)
         object.__setattr__(self, 'anm', anm)
         object.__setattr__(self, 'overlay_id', overlay_id)
         object.__setattr__(self, 'src_id', src_id)
         object.__setattr__(self, 'dst_id', dst_id)
-        logger = logging.getLogger("ANK")
+        object.__setattr__(self, '_log', None)
+        graph = anm._overlays.get(overlay_id)
+        if graph is not None and graph.has_edge(src_id, dst_id):
+            # pairs expanded from segments aren't interned, as there can
+            # be many more of them than edges
+            anm._edge_handles.setdefault(overlay_id, {}).setdefault(
+                src_id, {})[dst_id] = self
+        return self
+
+    def __getnewargs__(self):
+        return (self.anm, self.overlay_id, self.src_id, self.dst_id)
+
+    def __getstate__(self):
+        # state is fully described by __getnewargs__
+        return None
+
+    @property
+    def log(self):
+        """Logger for this edge, created on first use"""
+
         logstring = "Interface: %s" % str(self)
-        logger = CustomAdapter(logger, {'item': logstring})
-        object.__setattr__(self, 'log', logger)
+        logger = self._log
+        if logger is None or logger.extra['item'] != logstring:
+            logger = CustomAdapter(logging.getLogger("ANK"),
+                                   {'item': logstring})
+            object.__setattr__(self, '_log', logger)
+        return logger
 
     def __key(self):
         """Note: key doesn't include overlay_id to allow fast cross-layer comparisons"""
@@ -58,18 +88,22 @@ class NmEdge(object):
     def __getitem__(self, key):
         """"""
 
-        from autonetkit.anm.graph import NmGraph
-        overlay = NmGraph(self.anm, key)
-        return overlay.edge(self)
+        return self.anm[key].edge(self)
 
     def raw_interfaces(self):
         return self._interfaces
 
     def __lt__(self, other):
-        """"""
+        """Sorts on src then dst node (see NmNode.__lt__)"""
+
+        return self._sort_key() < other._sort_key()
+
+    def _sort_key(self):
+        """(src, dst) node sort keys for this edge"""
 
-        return (self.src.node_id, self.dst.node_id) \
-            < (other.src.node_id, other.dst.node_id)
+        node_sort_key = self.anm._node_sort_key
+        return (node_sort_key(self.overlay_id, self.src_id),
+                node_sort_key(self.overlay_id, self.dst_id))
 
     @property
     def src(self):
@@ -105,18 +139,26 @@ class NmEdge(object):
                            self.dst_id, dst_int_id)
 
     def dump(self):
-        return str(self._graph[self.src_id][self.dst_id])
+        return str(self._data)
 
     def __nonzero__(self):
         """Allows for checking if edge exists
         """
 
-        return self._graph.has_edge(self.src_id, self.dst_id)
+        return self._graph.has_edge(self.src_id, self.dst_id) \
+            or self.anm._segment_of_pair(self.overlay_id, self.src_id,
+                                         self.dst_id) is not None
 
     def bind_interface(self, node, interface):
         """Bind this edge to specified index"""
 
+        if not self._graph.has_edge(self.src_id, self.dst_id):
+            # pair over a segment: store it as an edge to bind it
+            self.anm._store_segment_edge(self.overlay_id, self.src_id,
+                                         self.dst_id)
         self._interfaces[node.id] = interface
+        # _interfaces may be shared with edges in other overlays
+        self.anm._invalidate_bindings(None, [self.src_id, self.dst_id])
 
     def interfaces(self):
 
@@ -132,6 +174,17 @@ class NmEdge(object):
 
         return self.anm.overlay_nx_graphs[self.overlay_id]
 
+    @property
+    def _data(self):
+        """Return data dict for the edge: the stored edge, or for a pair
+        of members over a segment, their view of the segment data"""
+
+        try:
+            return self._graph[self.src_id][self.dst_id]
+        except KeyError:
+            return self.anm._segment_edge_data(self.overlay_id,
+                                               self.src_id, self.dst_id)
+
     def get(self, key):
         """For consistency, edge.get(key) is neater than getattr(edge, key)"""
 
@@ -146,9 +199,36 @@ class NmEdge(object):
     def __getattr__(self, key):
         """Returns edge property"""
 
-        return self._graph[self.src_id][self.dst_id].get(key)
+        if key in self.anm.columnar_edge_attrs:
+            try:
+                return self.anm._edge_column_value(self.overlay_id,
+                                                   self.src_id,
+                                                   self.dst_id, key)
+            except KeyError:
+                pass  # column not built: read the edge data
+
+        try:
+            return self._graph[self.src_id][self.dst_id].get(key)
+        except KeyError:
+            # pair over a segment: read from the segment
+            return self.anm._segment_edge_data(self.overlay_id,
+                                               self.src_id,
+                                               self.dst_id).get(key)
 
     def __setattr__(self, key, val):
-        """Sets edge property"""
+        """Sets edge property. A pair over a segment is stored as an edge
+        first, so only this pair is changed"""
 
-        self._graph[self.src_id][self.dst_id][key] = val
+        try:
+            data = self._graph[self.src_id][self.dst_id]
+        except KeyError:
+            data = self.anm._store_segment_edge(self.overlay_id,
+                                                self.src_id, self.dst_id)
+        data[key] = val
+        self.anm._index_edge_attr(self.overlay_id, self.src_id,
+                                  self.dst_id, key)
+        if key == '_interfaces':
+            self.anm._invalidate_bindings(self.overlay_id,
+                                          [self.src_id, self.dst_id])
+        self.anm._record(self.overlay_id, 'set', 'edge',
+                         (self.src_id, self.dst_id), key)
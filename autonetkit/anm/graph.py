@@ -1,9 +1,11 @@
 import autonetkit.log as log
-from autonetkit.ank_utils import unwrap_edges, unwrap_nodes
+from autonetkit.ank_utils import SubgraphView, unwrap_edges
 from autonetkit.anm.base import OverlayBase
+from autonetkit.anm.columns import numpy
 from autonetkit.anm.edge import NmEdge
-from autonetkit.anm.interface import NmInterface
+from autonetkit.anm.interface import NmInterface, SharedInterfaceData
 from autonetkit.anm.node import NmNode
+from autonetkit.anm.segment import NmSegment
 
 
 class NmGraph(OverlayBase):
@@ -26,6 +28,16 @@ class NmGraph(OverlayBase):
         """"""
 
         self._anm.overlay_nx_graphs[self._overlay_id] = graph
+        self._anm._overlay_handles.pop(self._overlay_id, None)
+        self._anm._invalidate_handles(self._overlay_id)
+        self._anm._invalidate_label_index(self._overlay_id)
+        self._anm._invalidate_bindings(self._overlay_id)
+        self._anm._invalidate_segments(self._overlay_id)
+        self._anm._invalidate_edge_index(self._overlay_id)
+        self._anm._invalidate_attr_index(self._overlay_id)
+        self._anm._invalidate_phy_attrs(self._overlay_id)
+        self._anm._invalidate_sort_keys()
+        self._anm._record(self._overlay_id, 'set', 'overlay')
 
     # these work similar to their nx counterparts: just need to strip the
     # node_id
@@ -48,35 +60,85 @@ class NmGraph(OverlayBase):
         except AttributeError:
             pass  # already a list
 
-        if not update:
+        # input->phy copies the input interface tables
+        sources = set(getattr(n, 'overlay_id', None) for n in nbunch)
+        interfaces_from = None
+        if sources == set(['input']):
+            interfaces_from = 'input'
 
-# filter out existing nodes
+        self.add_nodes_bulk(self._unwrap_node_data(nbunch, retain), update,
+                            interfaces_from, **kwargs)
 
-            nbunch = (n for n in nbunch if n not in self._graph)
+    @staticmethod
+    def _unwrap_node_data(nbunch, retain):
+        """Returns (node_id, data) for nodes in nbunch, with data the
+        retained keys. Plain attributes are read straight from the source
+        graph, rather than through NmNode.__getattr__"""
 
-        nbunch = list(nbunch)
-        node_ids = list(nbunch)  # before appending retain data
-
-        if len(retain):
-            add_nodes = []
+        nodes = []
+        if not len(retain):
             for node in nbunch:
+                nodes.append((getattr(node, 'node_id', node), {}))
+            return nodes
+
+        # properties such as label and asn are computed, so need the node
+        computed = [key for key in retain if hasattr(NmNode, key)]
+        stored = [key for key in retain if key not in computed]
+        for node in nbunch:
+            if not isinstance(node, NmNode):
                 data = dict((key, node.get(key)) for key in retain)
-                add_nodes.append((node.node_id, data))
-            nbunch = add_nodes
-        else:
+                nodes.append((node.node_id, data))
+                continue
             try:
-                # only store the id in overlay
-                nbunch = [n.node_id for n in nbunch]
-            except AttributeError:
-                pass  # use nbunch directly as the node IDs
-
-        self._graph.add_nodes_from(nbunch, **kwargs)
-        for node in self._graph.nodes():
-            node_data = self._graph.node[node]
-            if "label" not in node_data:
-                node_data["label"] = str(node)  # use node id
-
-        self._init_interfaces(node_ids)
+                node_data = node._graph.node[node.node_id]
+            except KeyError:
+                node_data = {}  # not in its overlay: retains as None
+            data = dict((key, node_data.get(key)) for key in stored)
+            for key in computed:
+                data[key] = node.get(key)
+            nodes.append((node.node_id, data))
+        return nodes
+
+    def add_nodes_bulk(
+        self,
+        nodes,
+        update=False,
+        interfaces_from=None,
+        **kwargs
+    ):
+        """Adds nodes from (node_id, data) pairs in one pass, eg when
+        building an overlay from another. Existing nodes are skipped, or
+        have kwargs and data merged in if update is set.
+        Only the nodes added or updated default their label to their id.
+        When building phy, nodes without phy interfaces copy their
+        interface table from the overlay interfaces_from, eg 'input'.
+        Returns the node ids added or updated."""
+
+        graph = self._graph
+        node_data = graph.node
+        node_ids = []
+        for (node_id, data) in nodes:
+            if node_id in node_data:
+                if not update:
+                    continue
+                node_data[node_id].update(kwargs)
+                node_data[node_id].update(data)
+            else:
+                attr_dict = dict(kwargs)
+                attr_dict.update(data)
+                graph.add_node(node_id, attr_dict)
+            if 'label' not in node_data[node_id]:
+                node_data[node_id]['label'] = str(node_id)  # use node id
+            node_ids.append(node_id)
+
+        self._init_interfaces(node_ids, interfaces_from)
+        self._anm._index_node_labels(self._overlay_id, node_ids)
+        self._anm._index_node_attrs(self._overlay_id, node_ids)
+        self._anm._invalidate_phy_attrs(self._overlay_id, node_ids)
+        self._anm._invalidate_sort_keys(node_ids)
+        for node_id in node_ids:
+            self._anm._record(self._overlay_id, 'add', 'node', node_id)
+        return node_ids
 
     def add_node(
         self,
@@ -105,83 +167,83 @@ class NmGraph(OverlayBase):
             kwargs.update(data)  # also use the retained data
         self._graph.add_node(node_id, kwargs)
         self._init_interfaces([node_id])
+        self._anm._index_node_labels(self._overlay_id, [node_id])
+        self._anm._index_node_attrs(self._overlay_id, [node_id])
+        self._anm._invalidate_phy_attrs(self._overlay_id, [node_id])
+        self._anm._invalidate_sort_keys([node_id])
+        self._anm._record(self._overlay_id, 'add', 'node', node_id)
 
         return NmNode(self.anm, self._overlay_id, node_id)
 
-    def _init_interfaces(self, nbunch=None):
-        """Initialises interfaces"""
-        # TODO: this needs a major refactor!
-
-        # store the original bunch to check if going input->phy
-        if nbunch is not None:
-            nbunch = list(nbunch)  # listify generators
-
-        original_nbunch = {}
-
-        if nbunch is None:
-            nbunch = [n for n in self._graph.nodes()]
-
-        try:
-            previous = list(nbunch)
-            nbunch = list(unwrap_nodes(nbunch))
-        except AttributeError:
-            pass  # don't need to unwrap
-        else:
-            # record a dict of the new nbunch to the original
-            for index, element in enumerate(nbunch):
-                previous_element = previous[index]
-                if previous_element is not None:
-                    original_nbunch[element] = previous[index]
-
-        phy_graph = self._anm.overlay_nx_graphs['phy']
+    def _init_interfaces(self, node_ids=None, interfaces_from=None):
+        """Initialises interfaces of node_ids (default all nodes) in one
+        pass: shared with the parent overlay, keyed from phy, copied from
+        interfaces_from when building phy, or else loopback only"""
+
+        node_data = self._graph.node
+        if node_ids is None:
+            node_ids = node_data.keys()
+
+        overlay_graphs = self._anm.overlay_nx_graphs
+        phy_data = overlay_graphs['phy'].node
+        parent_data = {}
+        parent_id = self._anm._overlay_parents.get(self._overlay_id)
+        if parent_id is not None:
+            parent_data = overlay_graphs[parent_id].node
+        source_data = None
+        if self._overlay_id == 'phy' and interfaces_from is not None:
+            source_data = overlay_graphs[interfaces_from].node
+
+        # all interfaces start with the same attributes: share them
+        # copy-on-write, rather than one dict per interface per overlay
+        interface_data = SharedInterfaceData(description=None,
+                                             type='physical')
 
         initialised_nodes = []
-        for node in nbunch:
-            try:
-                phy_interfaces = phy_graph.node[node]['_interfaces']
-                interface_data = {'description': None,
-                                  'type': 'physical'}
-
-                # need to do dict() to copy, otherwise all point to same memory
-                # location -> clobber
-
-                data = dict((key, dict(interface_data)) for key in
-                            phy_interfaces)
-                self._graph.node[node]['_interfaces'] = data
-            except KeyError:
-                # TODO: split this off into seperate function
-                # test if adding from input graph
-                # Note: this has to be done on a node-by-node basis
-                # as ANK allows adding nodes from multiple graphs at once
-                # TODO: warn if adding from multiple overlays at onc
-                if self._overlay_id == "phy" and len(original_nbunch):
-                        # see if adding from input->phy,
-                        # overlay nodes were provided as input
-                        original_node = original_nbunch[node]
-                        if original_node.overlay_id == "input":
-                            # are doing input->phy
-                            # copy the
-                            original_interfaces = original_node.get(
-                                "_interfaces")
-                            if original_interfaces is not None:
-                                # Initialise with the keys
-                                int_data = {k: {"description": v.get("description"), "type": v.get("type")}
-                                            for k, v in original_interfaces.items()}
-                                self._graph.node[node][
-                                    '_interfaces'] = int_data
-
-                else:
-                    # no counterpart in physical graph, initialise
-                    # Can't do node log becaue node doesn't exist yet
-                    self._graph.node[node]['_interfaces'] = \
-                        {0: {'description': 'loopback', 'type': 'loopback'}}
-                    initialised_nodes.append(node)
+        for node_id in node_ids:
+            data = node_data[node_id]
+            parent_interfaces = parent_data.get(node_id, {}).get(
+                '_interfaces')
+            if parent_interfaces is not None:
+                data['_interfaces'] = self._share_interfaces(
+                    parent_interfaces)
+                continue
+
+            phy_interfaces = phy_data.get(node_id, {}).get('_interfaces')
+            if phy_interfaces is not None:
+                data['_interfaces'] = dict.fromkeys(phy_interfaces,
+                                                    interface_data)
+            elif source_data is not None:
+                # building phy: initialise with the source keys and types
+                source_interfaces = source_data.get(node_id, {}).get(
+                    '_interfaces')
+                if source_interfaces is not None:
+                    data['_interfaces'] = dict(
+                        (key, {'description': value.get('description'),
+                               'type': value.get('type')})
+                        for (key, value) in source_interfaces.items())
+            else:
+                # no counterpart in physical graph, initialise
+                data['_interfaces'] = {0: {'description': 'loopback',
+                                           'type': 'loopback'}}
+                initialised_nodes.append(node_id)
 
         if len(initialised_nodes):
             initialised_nodes = [NmNode(self.anm, self._overlay_id, n) for n in initialised_nodes]
             initialised_nodes = sorted([str(n) for n in initialised_nodes])
             self.log.debug("Initialised interfaces for %s" % ", ".join(initialised_nodes))
 
+    @staticmethod
+    def _share_interfaces(interfaces):
+        """Returns a new interface dict sharing the interface attributes
+        of interfaces copy-on-write. Interfaces in the source become
+        copy-on-write too, so neither sees the other's later changes."""
+
+        for (interface_id, data) in interfaces.items():
+            if not isinstance(data, SharedInterfaceData):
+                interfaces[interface_id] = SharedInterfaceData(data)
+        return dict(interfaces)
+
     def allocate_interfaces(self):
         """allocates edges to interfaces"""
 
@@ -254,7 +316,26 @@ class NmGraph(OverlayBase):
         if isinstance(node_id, NmNode):
             node_id = node_id.node_id
 
+        # edges of neighbors are removed too
+        neighbors = self._graph.neighbors(node_id)
+        self._anm._invalidate_handles(self._overlay_id, [node_id])
         self._graph.remove_node(node_id)
+        for data in self._anm._member_segments(self._overlay_id, node_id):
+            del data['_interfaces'][node_id]
+        self._anm._invalidate_segments(self._overlay_id)
+        self._anm._invalidate_bindings(self._overlay_id,
+                                       [node_id] + neighbors)
+        self._anm._invalidate_edge_index(self._overlay_id)
+        self._anm._index_node_attrs(self._overlay_id, [])  # resize
+        self._anm._invalidate_phy_attrs(self._overlay_id, [node_id])
+        self._anm._invalidate_sort_keys([node_id])
+        for neighbor in neighbors:
+            self._anm._record(self._overlay_id, 'remove', 'edge',
+                              (node_id, neighbor))
+        self._anm._record(self._overlay_id, 'remove', 'node', node_id)
+        if self._overlay_id == 'phy':
+            # other overlays fall back to their own labels for this node
+            self._anm._invalidate_label_index()
 
     def add_edge(
         self,
@@ -281,7 +362,25 @@ class NmGraph(OverlayBase):
             ebunch = unwrap_edges(ebunch)
         except AttributeError:
             pass  # don't need to unwrap
+        ebunch = list(ebunch)
+        if self._anm._segments(self._overlay_id):
+            for edge in ebunch:
+                (src, dst) = edge[:2]
+                if self._graph.has_edge(src, dst):
+                    continue
+                # pair over a segment: the segment keeps a list of these
+                data = self._anm._segment_of_pair(self._overlay_id, src,
+                                                  dst)
+                if data is not None:
+                    data.setdefault('_removed', []).append([src, dst])
         self._graph.remove_edges_from(ebunch)
+        self._anm._invalidate_handles(self._overlay_id, ebunch=ebunch)
+        self._anm._invalidate_bindings(self._overlay_id,
+                                       (n for e in ebunch for n in e[:2]))
+        self._anm._invalidate_edge_index(self._overlay_id)
+        for edge in ebunch:
+            self._anm._record(self._overlay_id, 'remove', 'edge',
+                              tuple(edge[:2]))
 
     def add_edges(self, *args, **kwargs):
         """Adds a set of edges. Alias for add_edges_from"""
@@ -312,55 +411,164 @@ class NmGraph(OverlayBase):
         except AttributeError:
             pass  # already a list
 
-        retain.append('_interfaces')
-        try:
-            if len(retain):
-                add_edges = []
-                for edge in ebunch:
-                    data = dict((key, edge.get(key)) for key in retain)
-                    add_edges.append((edge.src.node_id,
-                                      edge.dst.node_id, data))
-                ebunch = add_edges
+        retain = list(retain) + ['_interfaces']
+        ebunch_out = []
+        for edge in ebunch:
+            if isinstance(edge, NmEdge):
+                # read the retained keys straight from the source graph
+                try:
+                    edge_data = edge._graph[edge.src_id][edge.dst_id]
+                except KeyError:
+                    edge_data = edge._data  # pair over a segment
+                data = dict((key, edge_data.get(key)) for key in retain)
+                ebunch_out.append((edge.src_id, edge.dst_id, data))
+                continue
+
+            (src, dst) = edge
+
+            # TODO: check this works across nodes, etc
+
+            # adding an edge explictly from interface to interface
+            # Note: can't add an edge from node <-> interface in API
+            # if no interface is set, will bind to interface 0 (loopback zero)
+
+            if isinstance(src, NmInterface) \
+                and isinstance(dst, NmInterface):
+                _interfaces = {src.node_id: src.interface_id,
+                               dst.node_id: dst.interface_id}
+                ebunch_out.append((src.node_id, dst.node_id,
+                                   {'_interfaces': _interfaces}))
             else:
-                ebunch = [(e.src.node_id, e.dst.node_id, {}) for e in
-                          ebunch]
-        except AttributeError:
-            ebunch_out = []
-            for (src, dst) in ebunch:
-
-                # TODO: check this works across nodes, etc
-
-                # adding an edge explictly from interface to interface
-                # Note: can't add an edge from node <-> interface in API
-                # if no interface is set, will bind to interface 0 (loopback zero)
-
-                if isinstance(src, NmInterface) \
-                    and isinstance(dst, NmInterface):
-                    _interfaces = {src.node_id: src.interface_id,
-                                   dst.node_id: dst.interface_id}
-                    ebunch_out.append((src.node_id, dst.node_id,
-                                       {'_interfaces': _interfaces}))
-                else:
-                    try:
-                        src_id = src.node_id
-                    except AttributeError:
-                        src_id = src  # use directly
-                    try:
-                        dst_id = dst.node_id
-                    except AttributeError:
-                        dst_id = dst  # use directly
-                    ebunch_out.append((src_id, dst_id, {'_interfaces': {}}))
-
-            ebunch = ebunch_out
-
-        ebunch = [(src, dst, data) for (src, dst, data) in ebunch
-                  if src in self._graph and dst in self._graph]
+                src_id = getattr(src, 'node_id', src)  # or use directly
+                dst_id = getattr(dst, 'node_id', dst)
+                ebunch_out.append((src_id, dst_id, {'_interfaces': {}}))
+
+        self.add_edges_bulk(ebunch_out, bidirectional, **kwargs)
+
+    def add_edges_bulk(
+        self,
+        edges,
+        bidirectional=False,
+        **kwargs
+    ):
+        """Adds edges from (src_id, dst_id, data) tuples in one pass.
+        As for add_edges_from, edges are only added if both src and dst
+        are in the overlay. Returns the (src_id, dst_id, data) added."""
+
+        node_data = self._graph.node
+        edges = [(src, dst, data) for (src, dst, data) in edges
+                 if src in node_data and dst in node_data]
         if bidirectional:
-            ebunch += [(dst, src, data) for (src, dst, data) in ebunch
-                       if src in self._graph and dst in self._graph]
+            edges += [(dst, src, data) for (src, dst, data) in edges]
 
-        self._graph.add_edges_from(ebunch, **kwargs)
-        #TODO: return edges added?
+        self._graph.add_edges_from(edges, **kwargs)
+        self._anm._invalidate_bindings(self._overlay_id,
+                                       (n for e in edges for n in e[:2]))
+        self._anm._invalidate_edge_index(self._overlay_id)
+        for (src, dst, _) in edges:
+            self._anm._record(self._overlay_id, 'add', 'edge', (src, dst))
+        return edges
+
+    def add_segment(
+        self,
+        segment_id,
+        interfaces,
+        group_attr=None,
+        **kwargs
+    ):
+        """Adds a multipoint segment joining interfaces (NmInterfaces, or
+        (node_id, interface_id) pairs), rather than a full mesh of edges
+        between their nodes. See NmSegment.
+        Interfaces of nodes not in the overlay are skipped, and the
+        segment is only added if some of its members are adjacent.
+        If group_attr is set, members with the same value of it are not
+        adjacent, eg "asn" for eBGP sessions across an exchange.
+        kwargs are set as attributes of the segment.
+        Returns the NmSegment added, or None"""
+
+        members = {}
+        for interface in interfaces:
+            try:
+                members[interface.node_id] = interface.interface_id
+            except AttributeError:
+                (node_id, interface_id) = interface
+                members[node_id] = interface_id
+
+        data = dict(kwargs)
+        data['_interfaces'] = members
+        if group_attr:
+            data['_groups'] = dict((node_id, NmNode(self._anm,
+                                   self._overlay_id, node_id).get(group_attr))
+                                   for node_id in members
+                                   if node_id in self._graph)
+        return self._add_segment(segment_id, data)
+
+    def add_segments_from(self, segments, retain=None, **kwargs):
+        """Adds segments (NmSegments of another overlay), joining the same
+        interfaces of nodes in this overlay. Keys in retain are copied
+        from the segment attributes, and kwargs are set.
+        Returns the NmSegments added"""
+
+        if not retain:
+            retain = []
+        try:
+            retain.lower()
+            retain = [retain]  # was a string, put into list
+        except AttributeError:
+            pass  # already a list
+
+        added = []
+        for segment in segments:
+            src_data = segment._data
+            data = dict((key, src_data.get(key)) for key in retain)
+            data.update(kwargs)
+            data['_interfaces'] = src_data['_interfaces']  # copied on add
+            if '_groups' in src_data:
+                data['_groups'] = src_data['_groups']
+            if '_removed' in src_data:
+                data['_removed'] = [list(pair)
+                                    for pair in src_data['_removed']]
+            segment = self._add_segment(segment.segment_id, data)
+            if segment is not None:
+                added.append(segment)
+        return added
+
+    def _add_segment(self, segment_id, data):
+        """Stores segment data, restricted to members in the overlay.
+        Returns the NmSegment, or None if no members are adjacent"""
+
+        graph = self._graph
+        data['_interfaces'] = dict((node_id, interface_id)
+                                   for (node_id, interface_id)
+                                   in data['_interfaces'].items()
+                                   if node_id in graph)
+        if '_groups' in data:
+            data['_groups'] = dict((node_id, data['_groups'].get(node_id))
+                                   for node_id in data['_interfaces'])
+            groups = set(data['_groups'].values())
+        else:
+            groups = data['_interfaces']
+        if len(data['_interfaces']) < 2 or len(groups) < 2:
+            log.debug('Not adding segment %s in %s: no adjacent members'
+                      % (segment_id, self._overlay_id))
+            return None
+
+        graph.graph.setdefault('_segments', {})[segment_id] = data
+        self._anm._invalidate_segments(self._overlay_id)
+        self._anm._record(self._overlay_id, 'add', 'segment', segment_id)
+        return NmSegment(self._anm, self._overlay_id, segment_id)
+
+    def remove_segment(self, segment_id):
+        """Removes a segment from the overlay"""
+
+        segment_id = getattr(segment_id, 'segment_id', segment_id)
+        segments = self._graph.graph.get('_segments', {})
+        del segments[segment_id]
+        if not segments:
+            del self._graph.graph['_segments']
+        self._anm._invalidate_segments(self._overlay_id)
+        self._anm._record(self._overlay_id, 'remove', 'segment',
+                          segment_id)
 
     def update(self, nbunch=None, **kwargs):
         """Sets property defined in kwargs to all nodes in nbunch"""
@@ -377,10 +585,167 @@ class NmGraph(OverlayBase):
             for (key, value) in kwargs.items():
                 node.set(key, value)
 
+    @staticmethod
+    def _bulk_values(values, count):
+        """Returns values as a list of count values: a scalar is repeated"""
+
+        tolist = getattr(values, 'tolist', None)
+        if tolist is not None:
+            values = tolist()  # NumPy array: store plain python values
+        if isinstance(values, basestring) or not hasattr(values,
+                                                         '__iter__'):
+            return [values] * count
+        values = list(values)
+        if len(values) != count:
+            raise ValueError("Have %s values for %s items" % (len(values),
+                                                             count))
+        return values
+
+    @staticmethod
+    def _column_values(attr, values, present, default):
+        """Returns values of a column, with default where not present"""
+
+        if present.all():
+            return values
+        if default is None:
+            raise ValueError("%s is unset for some items: set default"
+                             % attr)
+        return numpy.where(present, values, default)
+
+    @staticmethod
+    def _listed_values(attr, values, default):
+        """Returns values read one by one, with default for None, as a
+        NumPy array or, if NumPy isn't installed, a list"""
+
+        if default is not None:
+            values = [default if value is None else value
+                      for value in values]
+        elif any(value is None for value in values):
+            raise ValueError("%s is unset for some items: set default"
+                             % attr)
+        if numpy is None:
+            return values
+        return numpy.array(values)
+
+    def get_node_attrs(self, attr, nbunch=None, default=None):
+        """Returns attr of the nodes in nbunch (default all nodes, in
+        graph order) as a NumPy array, or a list if NumPy isn't
+        installed. Missing values are default: a ValueError is raised
+        for missing values if default isn't set.
+        Columnar attributes (see anm.columnar_attributes) are sliced from
+        their column, other attributes are read from each node.
+
+        >>> g_graphics.get_node_attrs("x").min()
+        """
+
+        found = self._anm._node_column(self._overlay_id, attr)
+        if found is not None:
+            (columns, (values, present)) = found
+            if nbunch is None:
+                rows = numpy.arange(len(columns))
+            else:
+                rows = columns.rows_for(getattr(n, 'node_id', n)
+                                        for n in nbunch)
+            if rows is not None:
+                return self._column_values(attr, values[rows],
+                                           present[rows], default)
+
+        if nbunch is None:
+            node_ids = self._graph.nodes()
+        else:
+            node_ids = [getattr(n, 'node_id', n) for n in nbunch]
+        getter = self._anm._node_attr_getter(self._overlay_id, attr)
+        return self._listed_values(attr, [getter(node_id) for node_id
+                                          in node_ids], default)
+
+    def set_node_attrs(self, attr, values, nbunch=None):
+        """Sets attr of the nodes in nbunch (default all nodes, in graph
+        order) to values: a scalar, or one value per node, eg an array
+        from get_node_attrs. Nodes not in the overlay are skipped.
+        Unlike node.asn, asn is set on this overlay only."""
+
+        node_data = self._graph.node
+        if nbunch is None:
+            node_ids = list(node_data)
+        else:
+            node_ids = [getattr(n, 'node_id', n) for n in nbunch]
+        values = self._bulk_values(values, len(node_ids))
+
+        items = [(node_id, value) for (node_id, value)
+                 in zip(node_ids, values) if node_id in node_data]
+        for (node_id, value) in items:
+            node_data[node_id][attr] = value
+
+        node_ids = [node_id for (node_id, _) in items]
+        columns = self._anm._node_columns.get(self._overlay_id)
+        if columns is not None and attr in columns.columns:
+            columns.set_values(attr, columns.rows_for(node_ids),
+                               [value for (_, value) in items])
+        self._anm._node_attrs_set(self._overlay_id, node_ids, [attr],
+                                  columns=False)
+
+    def get_edge_attrs(self, attr, ebunch=None, default=None):
+        """As for get_node_attrs, for the edges in ebunch (default all
+        edges, in edges() order). Columnar edge attributes are set by
+        anm.columnar_edge_attributes"""
+
+        if ebunch is not None:
+            ebunch = [(e.src_id, e.dst_id) if isinstance(e, NmEdge)
+                      else tuple(e[:2]) for e in ebunch]
+
+        found = self._anm._edge_column(self._overlay_id, attr)
+        if found is not None:
+            (columns, (values, present)) = found
+            if ebunch is None:
+                rows = numpy.arange(len(columns))
+            else:
+                rows = self._anm._edge_rows(self._overlay_id, columns,
+                                            ebunch)
+            if rows is not None:
+                return self._column_values(attr, values[rows],
+                                           present[rows], default)
+
+        graph = self._graph
+        if ebunch is None:
+            ebunch = graph.edges()
+        values = []
+        for (src, dst) in ebunch:
+            try:
+                values.append(graph[src][dst].get(attr))
+            except KeyError:
+                values.append(None)
+        return self._listed_values(attr, values, default)
+
+    def set_edge_attrs(self, attr, values, ebunch=None):
+        """As for set_node_attrs, for the edges in ebunch (default all
+        edges, in edges() order)"""
+
+        graph = self._graph
+        if ebunch is None:
+            ebunch = graph.edges()
+        else:
+            ebunch = [(e.src_id, e.dst_id) if isinstance(e, NmEdge)
+                      else tuple(e[:2]) for e in ebunch]
+        values = self._bulk_values(values, len(ebunch))
+
+        items = [(edge, value) for (edge, value) in zip(ebunch, values)
+                 if graph.has_edge(*edge)]
+        for ((src, dst), value) in items:
+            graph[src][dst][attr] = value
+
+        edges = [edge for (edge, _) in items]
+        columns = self._anm._edge_columns.get(self._overlay_id)
+        if columns is not None and attr in columns.columns:
+            columns.set_values(attr, self._anm._edge_rows(
+                self._overlay_id, columns, edges),
+                [value for (_, value) in items])
+        self._anm._edge_attrs_set(self._overlay_id, edges, [attr],
+                                  columns=False)
+
     def subgraph(self, nbunch, name=None):
         """"""
 
         nbunch = (n.node_id for n in nbunch)  # only store the id in overlay
         from autonetkit.anm.subgraph import OverlaySubgraph
         return OverlaySubgraph(self._anm, self._overlay_id,
-                               self._graph.subgraph(nbunch), name)
+                               SubgraphView(self._graph, nbunch), name)
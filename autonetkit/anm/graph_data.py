@@ -31,6 +31,7 @@ class NmGraphData(object):
 
     def __setattr__(self, key, val):
         self._graph.graph[key] = val
+        self.anm._record(self.overlay_id, 'set', 'graph', key=key)
 
     def __getitem__(self, key):
         """"""
@@ -41,3 +42,4 @@ class NmGraphData(object):
         """"""
 
         self._graph.graph[key] = val
+        self.anm._record(self.overlay_id, 'set', 'graph', key=key)
@@ -4,23 +4,60 @@ import autonetkit.log as log
 from autonetkit.log import CustomAdapter
 
 
+class SharedInterfaceData(dict):
+
+    """Interface attributes shared copy-on-write between interfaces, eg
+    the initial attributes of every interface in an overlay.
+    NmInterface.__setattr__ replaces it with a copy before writing, so
+    don't modify it in place."""
+
+    __slots__ = ()
+
+
 class NmInterface(object):
 
-    def __init__(
-        self,
+    __slots__ = ('anm', 'overlay_id', 'node_id', 'interface_id', '_log')
+
+    def __new__(
+        cls,
         anm,
         overlay_id,
         node_id,
         interface_id,
     ):
+        try:
+            return anm._interface_handles[overlay_id][node_id][interface_id]
+        except KeyError:
+            pass
+
+        self = object.__new__(cls)
         object.__setattr__(self, 'anm', anm)
         object.__setattr__(self, 'overlay_id', overlay_id)
         object.__setattr__(self, 'node_id', node_id)
         object.__setattr__(self, 'interface_id', interface_id)
-        logger = logging.getLogger("ANK")
+        object.__setattr__(self, '_log', None)
+        anm._interface_handles.setdefault(overlay_id, {}).setdefault(
+            node_id, {})[interface_id] = self
+        return self
+
+    def __getnewargs__(self):
+        return (self.anm, self.overlay_id, self.node_id, self.interface_id)
+
+    def __getstate__(self):
+        # state is fully described by __getnewargs__
+        return None
+
+    @property
+    def log(self):
+        """Logger for this interface, created on first use"""
+
         logstring = "Interface: %s" % str(self)
-        logger = CustomAdapter(logger, {'item': logstring})
-        object.__setattr__(self, 'log', logger)
+        logger = self._log
+        if logger is None or logger.extra['item'] != logstring:
+            logger = CustomAdapter(logging.getLogger("ANK"),
+                                   {'item': logstring})
+            object.__setattr__(self, '_log', logger)
+        return logger
 
     def __key(self):
         """Note: key doesn't include overlay_id to allow fast cross-layer comparisons"""
@@ -63,17 +100,20 @@ class NmInterface(object):
         return len(interface) > 0  # if interface data set
 
     def __lt__(self, other):
+        """Sorts on node (see NmNode.__lt__) then interface id"""
 
-        # TODO: check how is comparing the nodes
-
-        return (self.node, self.interface_id) < (other.node,
-                                                 other.interface_id)
+        node_sort_key = self.anm._node_sort_key
+        return (node_sort_key(self.overlay_id, self.node_id),
+                self.interface_id) \
+            < (node_sort_key(other.overlay_id, other.node_id),
+               other.interface_id)
 
     @property
     def is_bound(self):
         """Returns if this interface is bound to an edge on this layer"""
 
-        return len(self.edges()) > 0
+        return self.anm._interface_bound(self.overlay_id, self.node_id,
+                                         self.interface_id)
 
     def __str__(self):
         return self.__repr__()
@@ -207,9 +247,17 @@ class NmInterface(object):
         """Sets interface property"""
 
         try:
-            self._interface[key] = val
+            interface = self._interface
+            if isinstance(interface, SharedInterfaceData):
+                # copy on write
+                interface = dict(interface)
+                self._node['_interfaces'][self.interface_id] = interface
+            interface[key] = val
         except KeyError, e:
             log.warning(e)
+        else:
+            self.anm._record(self.overlay_id, 'set', 'interface',
+                             (self.node_id, self.interface_id), key)
 
             # self.set(key, val)
 
@@ -219,16 +267,27 @@ class NmInterface(object):
 
         return self.__setattr__(key, val)
 
-    def edges(self):
+    def edges(self, segments=True):
         """Returns all edges from node that have this interface ID
-        This is the convention for binding an edge to an interface"""
-
-        # edges have _interfaces stored as a dict of {node_id: interface_id, }
-
-        valid_edges = [e for e in self.node.edges() if self.node_id
-                       in e._interfaces and e._interfaces[self.node_id]
-                       == self.interface_id]
-        return list(valid_edges)
+        This is the convention for binding an edge to an interface.
+        Uses the binding index held by the NetworkModel.
+        Pairs over the segments the interface is a member of are
+        included unless segments is False"""
+
+        from autonetkit.anm.edge import NmEdge
+        edges = self.anm._interface_edges(self.overlay_id, self.node_id,
+                                          self.interface_id, segments)
+        return [NmEdge(self.anm, self.overlay_id, src, dst)
+                for (src, dst) in edges]
+
+    def segments(self):
+        """Returns the segments the interface is bound to a pair over,
+        without expanding them"""
+
+        from autonetkit.anm.segment import NmSegment
+        return [NmSegment(self.anm, self.overlay_id, segment_id)
+                for segment_id in self.anm._interface_segments(
+                    self.overlay_id, self.node_id, self.interface_id)]
 
     def neighbors(self):
         """Returns interfaces on nodes that are linked to this interface
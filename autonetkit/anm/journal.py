@@ -0,0 +1,67 @@
+from collections import namedtuple
+
+# action is one of 'add', 'remove', 'set'.
+# kind is one of 'overlay', 'graph', 'node', 'edge', 'interface', 'segment',
+# with item:
+# overlay, graph: None
+# node: node_id
+# edge: (src_id, dst_id)
+# interface: (node_id, interface_id)
+# segment: segment_id
+# key is the attribute set, or None for add/remove
+Change = namedtuple('Change', ['overlay_id', 'action', 'kind', 'item',
+                               'key'])
+
+
+class MutationJournal(object):
+
+    """Append-only record of changes made to a NetworkModel through its API.
+    Checkpoints are positions in the journal, so are cheap to take and
+    compare."""
+
+    def __init__(self):
+        self._changes = []
+
+    def __len__(self):
+        return len(self._changes)
+
+    def __repr__(self):
+        return 'Journal of %s changes' % len(self._changes)
+
+    def record(self, overlay_id, action, kind, item=None, key=None):
+        """Appends a change"""
+
+        self._changes.append(Change(overlay_id, action, kind, item, key))
+
+    def checkpoint(self):
+        """Returns a checkpoint for the current position in the journal"""
+
+        return len(self._changes)
+
+    def changes_since(self, checkpoint=0, overlay_id=None, kind=None):
+        """Returns changes made after checkpoint, in the order made,
+        optionally only those for overlay_id and/or of kind"""
+
+        changes = self._changes[checkpoint:]
+        if overlay_id is not None:
+            changes = [c for c in changes if c.overlay_id == overlay_id]
+        if kind is not None:
+            changes = [c for c in changes if c.kind == kind]
+        return changes
+
+    def changed_overlays(self, checkpoint=0):
+        """Returns the set of overlays changed after checkpoint"""
+
+        return set(c.overlay_id for c in self._changes[checkpoint:])
+
+    def changed_items(self, checkpoint=0, overlay_id=None, kind='node'):
+        """Returns the set of items (eg node_ids) of kind changed after
+        checkpoint"""
+
+        return set(c.item for c in self.changes_since(checkpoint,
+                   overlay_id, kind))
+
+    def clear(self):
+        """Discards all changes. Existing checkpoints are invalidated"""
+
+        self._changes = []
@@ -2,16 +2,82 @@ import time
 
 import autonetkit.log as log
 import networkx as nx
+from autonetkit.ank_utils import (InterfaceIdAllocator, SubgraphView,
+                                  natural_sort_key)
+from autonetkit.anm.columns import AttributeColumns, numpy
+from autonetkit.anm.edge import NmEdge
 from autonetkit.anm.graph import NmGraph
+from autonetkit.anm.node import NmNode
+from autonetkit.anm.segment import member_pairs, members_adjacent, pair_data
 
 class NetworkModel(object):
 
     """"""
 
+    # phy attributes read across overlays, eg by NmNode.asn and is_router()
+    cached_phy_attrs = ('asn', 'device_type')
+
     def __init__(self):
         """"""
 
         self._overlays = {}
+        # overlay_id -> (builder, dependencies) for overlays built on first
+        # access rather than up front
+        self._overlay_builders = {}
+        # overlay_id -> parent overlay_id for overlays whose interfaces are
+        # derived copy-on-write from it
+        self._overlay_parents = {}
+        # overlay_id -> overlay_id of the overlay it is a view of
+        self._overlay_views = {}
+        # overlay_id -> overlay_id it is derived from, for internal overlays
+        # only used to build others: not listed by overlays(), and dropped
+        # when the overlay they are derived from is replaced
+        self._internal_overlays = {}
+        # one NmGraph per overlay, returned by anm[overlay_id]
+        self._overlay_handles = {}
+        # interned handles per overlay: {node_id: NmNode},
+        # {src_id: {dst_id: NmEdge}} and {node_id: {interface_id:
+        # NmInterface}}, dropped as the items are removed
+        self._node_handles = {}
+        self._edge_handles = {}
+        self._interface_handles = {}
+        # (overlay_id, node_id) -> InterfaceIdAllocator
+        self._interface_allocators = {}
+        # label -> [node_id, ...] per overlay, built on first lookup
+        self._label_indexes = {}
+        self._label_index_sizes = {}
+        # node_id -> {interface_id: [dst, ...]} per overlay, built per node
+        self._binding_indexes = {}
+        # (segments, node_id -> [segment_id, ...]) per overlay, for the
+        # multipoint segments held in the overlay graph data
+        self._segment_indexes = {}
+        # opt-in attribute indexes: {attr: {value: set(node_ids)}} per
+        # overlay, built on first filter on an indexed attribute
+        self.indexed_attrs = set()
+        self._attr_indexes = {}
+        self._attr_index_sizes = {}
+        self._node_orders = {}
+        # as above for edges: {attr: {value: set((src, dst))}} per overlay,
+        # dropped when edges are added or removed
+        self.indexed_edge_attrs = set()
+        self._edge_indexes = {}
+        self._edge_orders = {}
+        # opt-in columnar store: numeric attributes held as NumPy arrays per
+        # overlay, read by bulk get and node and edge attribute access.
+        # Needs NumPy, else these read the node and edge data directly
+        self.columnar_attrs = set()
+        self._node_columns = {}
+        self.columnar_edge_attrs = set()
+        self._edge_columns = {}
+        # {attr: {node_id: value}} for cached_phy_attrs of phy nodes,
+        # filled on first read and dropped as phy nodes change
+        self._phy_attrs = {}
+        # node_id -> label built from label_attrs of the phy node
+        self._node_labels = {}
+        # node_id -> {overlay_id: sort key}, dropped when asn or label change
+        self._sort_keys = {}
+        # optional MutationJournal, see enable_journal
+        self.journal = None
         self.add_overlay('phy')
         self.add_overlay('graphics')
 
@@ -36,8 +102,45 @@ class NetworkModel(object):
         return self._overlays
 
     def has_overlay(self, overlay_id):
-        """"""
+        """Returns whether overlay_id exists, building it first if it has
+        a registered builder"""
+
+        return overlay_id in self._overlays \
+            or self._build_overlay(overlay_id)
+
+    def add_overlay_builder(self, overlay_id, builder, dependencies=None):
+        """Registers builder(anm) to create overlay_id on first access
+        through anm[overlay_id] or has_overlay, rather than now.
+        The overlays in dependencies are built first."""
+
+        self._overlay_builders[overlay_id] = (builder,
+                                              list(dependencies or []))
+
+    def build_overlays(self, overlay_ids=None):
+        """Builds registered overlays that have not yet been accessed,
+        eg before exporting every overlay for visualisation.
+        Builds all pending overlays if overlay_ids is not set."""
+
+        if overlay_ids is None:
+            overlay_ids = sorted(self._overlay_builders)
+        for overlay_id in overlay_ids:
+            self._build_overlay(overlay_id)
+
+    def _build_overlay(self, overlay_id):
+        """Runs the registered builder for overlay_id, if not yet run.
+        Returns whether the overlay exists afterwards."""
 
+        try:
+            # removed before building, so the builder can check for
+            # (or add) the overlay itself
+            (builder, dependencies) = self._overlay_builders.pop(overlay_id)
+        except KeyError:
+            return overlay_id in self._overlays
+
+        for dependency in dependencies:
+            self._build_overlay(dependency)
+        log.debug('Building overlay %s on first access' % overlay_id)
+        builder(self)
         return overlay_id in self._overlays
 
     def dump(self):
@@ -100,16 +203,30 @@ class NetworkModel(object):
             data = json.load(filehandle)
             for (overlay_id, graph_data) in data.items():
 
+                self._drop_internal_overlays(overlay_id)
                 self._overlays[overlay_id] = \
                     ank_json.ank_json_loads(graph_data)
 
+        self._overlay_builders = {}
+        self._overlay_handles = {}
+        self._overlay_views = {}  # views are restored as copies
+        self._invalidate_handles()
+        for overlay_id in data:
+            self._record(overlay_id, 'set', 'overlay')
+        self._invalidate_label_index()
+        self._invalidate_bindings()
+        self._invalidate_segments()
+        self._invalidate_attr_index()
+        self._invalidate_edge_index()
+        self._invalidate_phy_attrs('phy')
+        self._invalidate_sort_keys()
         ank_json.rebind_interfaces(self)
 
     @property
     def _phy(self):
         """"""
 
-        return NmGraph(self, 'phy')
+        return self['phy']
 
     def initialise_graph(self, graph):
         """Sets input graph. Converts to undirected.
@@ -137,8 +254,19 @@ class NetworkModel(object):
         directed=False,
         multi_edge=False,
         retain=None,
+        parent=None,
+        derived_from=None,
     ):
-        """Adds overlay graph of name name"""
+        """Adds overlay graph of name name.
+        If parent is set, nodes added to the overlay start with the
+        interface attributes of the same node in the parent overlay,
+        shared copy-on-write, rather than empty interfaces.
+        Node attributes are not inherited: nodes only have the attributes
+        retained or set on them, as for other overlays.
+        If derived_from is set, the overlay is internal: it is built from
+        overlay derived_from to derive other overlays from, so isn't
+        listed by overlays() (and so isn't exported or saved), and is
+        removed when derived_from is replaced."""
 
         if graph:
             if not directed and graph.is_directed():
@@ -156,8 +284,29 @@ class NetworkModel(object):
             else:
                 graph = nx.Graph()
 
+        self._drop_internal_overlays(name)
         self._overlays[name] = graph
-        overlay = NmGraph(self, name)
+        self._overlay_builders.pop(name, None)
+        self._overlay_handles.pop(name, None)
+        self._invalidate_handles(name)
+        if parent is not None:
+            self._overlay_parents[name] = parent
+        else:
+            self._overlay_parents.pop(name, None)
+        if derived_from is not None:
+            self._internal_overlays[name] = derived_from
+        else:
+            self._internal_overlays.pop(name, None)
+        self._drop_views(name)
+        self._invalidate_label_index(name)
+        self._invalidate_bindings(name)
+        self._invalidate_segments(name)
+        self._invalidate_attr_index(name)
+        self._invalidate_edge_index(name)
+        self._invalidate_phy_attrs(name)
+        self._invalidate_sort_keys()
+        self._record(name, 'add', 'overlay')
+        overlay = self[name]
         overlay.allocate_interfaces()
         if nodes:
             retain = retain or []  # default is an empty list
@@ -165,10 +314,113 @@ class NetworkModel(object):
 
         return overlay
 
+    def add_overlay_view(self, name, overlay_id, nodes):
+        """Adds overlay name as a view of overlay_id restricted to nodes,
+        rather than a copy of it: nodes, edges and segments, and their
+        data and interfaces, are those of overlay_id between nodes of the
+        view. Attributes set through either overlay are seen in both.
+        Nodes and edges can't be added to or removed from the view, but
+        edges added to overlay_id between its nodes appear in it."""
+
+        self[overlay_id]  # builds it, if registered
+        overlay_id = self._overlay_views.get(overlay_id, overlay_id)
+        nodes = [getattr(n, 'node_id', n) for n in nodes]
+
+        self._drop_internal_overlays(name)
+        self._overlays[name] = SubgraphView(self._overlays[overlay_id],
+                                            nodes)
+        self._overlay_builders.pop(name, None)
+        self._overlay_handles.pop(name, None)
+        self._invalidate_handles(name)
+        self._overlay_parents.pop(name, None)
+        self._internal_overlays.pop(name, None)
+        self._drop_views(name)
+        self._overlay_views[name] = overlay_id
+        self._invalidate_label_index(name)
+        self._invalidate_bindings(name)
+        self._invalidate_segments(name)
+        self._invalidate_attr_index(name)
+        self._invalidate_edge_index(name)
+        self._invalidate_sort_keys()
+        self._record(name, 'add', 'overlay')
+        return self[name]
+
+    def _drop_views(self, name):
+        """Forgets that name is a view, and views of name, as it is
+        replaced: views of it keep the graph they were added on"""
+
+        self._overlay_views.pop(name, None)
+        for view_id in [view_id for (view_id, overlay_id)
+                        in self._overlay_views.items()
+                        if overlay_id == name]:
+            del self._overlay_views[view_id]
+
+    def _drop_internal_overlays(self, name):
+        """Removes the internal overlays derived from name, as it is
+        replaced: they are rebuilt by whatever derives overlays from them.
+        Overlays already derived from them keep their interfaces"""
+
+        for overlay_id in [overlay_id for (overlay_id, source_id)
+                           in self._internal_overlays.items()
+                           if source_id == name]:
+            self._drop_internal_overlays(overlay_id)
+            self._invalidate_handles(overlay_id)
+            del self._overlays[overlay_id]
+            del self._internal_overlays[overlay_id]
+            self._overlay_handles.pop(overlay_id, None)
+            self._overlay_parents.pop(overlay_id, None)
+            self._drop_views(overlay_id)
+            for (child_id, parent_id) in self._overlay_parents.items():
+                if parent_id == overlay_id:
+                    del self._overlay_parents[child_id]
+            self._invalidate_label_index(overlay_id)
+            self._invalidate_bindings(overlay_id)
+            self._invalidate_segments(overlay_id)
+            self._invalidate_attr_index(overlay_id)
+            self._invalidate_edge_index(overlay_id)
+            self._record(overlay_id, 'remove', 'overlay')
+
+    def _shared_overlays(self, overlay_id):
+        """Returns overlay_id, and the overlays sharing its graph data:
+        the overlay it is a view of, and their views"""
+
+        if not self._overlay_views:
+            return [overlay_id]
+        root_id = self._overlay_views.get(overlay_id, overlay_id)
+        views = [view_id for (view_id, view_root_id)
+                 in self._overlay_views.items() if view_root_id == root_id]
+        if not views:
+            return [overlay_id]
+        return [root_id] + views
+
     def overlays(self):
-        """"""
+        """Returns the overlay ids, other than internal overlays (see
+        add_overlay)"""
 
-        return self._overlays.keys()
+        return [overlay_id for overlay_id in self._overlays
+                if overlay_id not in self._internal_overlays]
+
+    def enable_journal(self):
+        """Starts recording changes made through the ANM API, eg node,
+        edge, interface and overlay data set, and nodes and edges added or
+        removed. Returns the journal, to take checkpoints and query changes
+        since them."""
+
+        from autonetkit.anm.journal import MutationJournal
+        if self.journal is None:
+            self.journal = MutationJournal()
+        return self.journal
+
+    def disable_journal(self):
+        """Stops recording changes, discarding the journal"""
+
+        self.journal = None
+
+    def _record(self, overlay_id, action, kind, item=None, key=None):
+        """Records a change in the journal, if enabled"""
+
+        if self.journal is not None:
+            self.journal.record(overlay_id, action, kind, item, key)
 
     def devices(self, *args, **kwargs):
         """"""
@@ -176,9 +428,14 @@ class NetworkModel(object):
         return self._phy.filter(*args, **kwargs)
 
     def __getitem__(self, key):
-        """"""
+        """Returns the NmGraph for overlay key, reused between calls"""
 
-        return NmGraph(self, key)
+        try:
+            return self._overlay_handles[key]
+        except KeyError:
+            overlay = NmGraph(self, key)  # raises OverlayNotFound
+            self._overlay_handles[key] = overlay
+            return overlay
 
     def node_label(self, node):
         """Returns node label from physical graph"""
@@ -189,10 +446,18 @@ class NetworkModel(object):
         """"""
 
         def custom_label(node):
-            return self.label_seperator.join(str(self._overlays['phy'
-                ].node[node.node_id].get(val)) for val in
-            self.label_attrs if self._overlays['phy'
-            ].node[node.node_id].get(val) is not None)
+            try:
+                return self._node_labels[node.node_id]
+            except KeyError:
+                pass
+
+            # raises KeyError if not in phy, so not cached
+            node_data = self._overlays['phy'].node[node.node_id]
+            label = self.label_seperator.join(str(node_data.get(val))
+                for val in self.label_attrs
+                if node_data.get(val) is not None)
+            self._node_labels[node.node_id] = label
+            return label
 
         self.node_label = custom_label
 
@@ -207,3 +472,929 @@ class NetworkModel(object):
 
         self.label_seperator = seperator
         self.label_attrs = label_attrs
+        self._node_labels = {}
+        self._invalidate_label_index()
+        self._invalidate_sort_keys()
+
+    def _label_key(self, overlay_id, node_id):
+        """Label of node_id in overlay, as used by the label index"""
+
+        node = NmNode(self, overlay_id, node_id)
+        try:
+            return str(node)
+        except UnicodeEncodeError:
+            return repr(node)
+
+    def _build_label_index(self, overlay_id):
+        """Builds the label -> node_id index for overlay"""
+
+        index = {}
+        graph = self._overlays[overlay_id]
+        for node_id in graph:
+            label = self._label_key(overlay_id, node_id)
+            index.setdefault(label, []).append(node_id)
+
+        self._label_indexes[overlay_id] = index
+        self._label_index_sizes[overlay_id] = len(graph)
+        return index
+
+    def _invalidate_label_index(self, overlay_id=None):
+        """Drops label index for overlay (or all overlays if None),
+        rebuilt on next lookup"""
+
+        if overlay_id is None:
+            self._label_indexes = {}
+            self._label_index_sizes = {}
+            return
+
+        for overlay_id in self._shared_overlays(overlay_id):
+            self._label_indexes.pop(overlay_id, None)
+            self._label_index_sizes.pop(overlay_id, None)
+
+    def _index_node_labels(self, overlay_id, nbunch):
+        """Adds current labels of node ids in nbunch to label index(es).
+        Labels come from the phy overlay, so adding or relabelling a
+        phy node updates the index of every overlay containing it."""
+
+        if overlay_id == 'phy':
+            overlay_ids = self._label_indexes.keys()
+        elif overlay_id in self._label_indexes:
+            overlay_ids = [overlay_id]
+        else:
+            return  # index not yet built
+
+        nbunch = list(nbunch)
+        for index_overlay_id in overlay_ids:
+            index = self._label_indexes[index_overlay_id]
+            graph = self._overlays[index_overlay_id]
+            for node_id in nbunch:
+                if node_id not in graph:
+                    continue
+                label = self._label_key(index_overlay_id, node_id)
+                node_ids = index.setdefault(label, [])
+                if node_id not in node_ids:
+                    node_ids.append(node_id)
+            if index_overlay_id == overlay_id:
+                self._label_index_sizes[overlay_id] = len(graph)
+
+    def _label_lookup(self, overlay_id, label, graph=None):
+        """Returns the node_id with label in overlay, or None.
+        graph restricts the search, eg to an OverlaySubgraph"""
+
+        overlay_graph = self._overlays[overlay_id]
+        if graph is None:
+            graph = overlay_graph
+
+        index = self._label_indexes.get(overlay_id)
+        if index is None:
+            index = self._build_label_index(overlay_id)
+
+        while True:
+            for node_id in index.get(label, ()):
+                # entries can be stale if a node has since been relabelled
+                # or removed
+                if (node_id in graph and
+                        self._label_key(overlay_id, node_id) == label):
+                    return node_id
+
+            if self._label_index_sizes.get(overlay_id) == len(overlay_graph):
+                return None
+
+            # nodes added directly to the NetworkX graph (eg by ank.split)
+            index = self._build_label_index(overlay_id)
+
+    def _phy_attr(self, node_id, attr):
+        """Returns attr (one of cached_phy_attrs) of node_id in the phy
+        overlay, or None if not set.
+        Raises KeyError if node_id is not in phy."""
+
+        try:
+            return self._phy_attrs[attr][node_id]
+        except KeyError:
+            pass
+
+        graph = self._overlays['phy']
+        values = self._phy_attrs.get(attr)
+        if values is None:
+            values = dict((n, data.get(attr)) for (n, data)
+                          in graph.nodes_iter(data=True))
+            self._phy_attrs[attr] = values
+        if node_id not in values:
+            # nodes added directly to the NetworkX graph (eg by ank.split)
+            values[node_id] = graph.node[node_id].get(attr)
+        return values[node_id]
+
+    def _invalidate_phy_attrs(self, overlay_id, nbunch=None):
+        """Drops cached phy attributes and node labels for node ids in
+        nbunch (all nodes if None), if overlay_id is phy"""
+
+        if overlay_id != 'phy':
+            return
+        if nbunch is None:
+            self._phy_attrs = {}
+            self._node_labels = {}
+            return
+
+        nbunch = list(nbunch)
+        for values in self._phy_attrs.values():
+            for node_id in nbunch:
+                values.pop(node_id, None)
+        for node_id in nbunch:
+            self._node_labels.pop(node_id, None)
+
+    def _node_sort_key(self, overlay_id, node_id):
+        """Returns the key NmNode sorts on: (asn, natural sort key of
+        label, node_id), computed once per asn or label change"""
+
+        try:
+            return self._sort_keys[node_id][overlay_id]
+        except KeyError:
+            pass
+
+        node = NmNode(self, overlay_id, node_id)
+        key = (node.asn, natural_sort_key(node.label), node_id)
+        self._sort_keys.setdefault(node_id, {})[overlay_id] = key
+        return key
+
+    def _invalidate_sort_keys(self, nbunch=None):
+        """Drops sort keys of node ids in nbunch (all nodes if None),
+        in every overlay"""
+
+        if nbunch is None:
+            self._sort_keys = {}
+            return
+
+        for node_id in nbunch:
+            self._sort_keys.pop(node_id, None)
+
+    def _interface_allocator(self, overlay_id, node_id, interfaces):
+        """Returns the interface id allocator for the interface dict of
+        node_id in overlay, rebuilt if the dict was replaced or resized
+        directly"""
+
+        key = (overlay_id, node_id)
+        allocator = self._interface_allocators.get(key)
+        if allocator is None or not allocator.tracks(interfaces):
+            allocator = InterfaceIdAllocator(interfaces)
+            self._interface_allocators[key] = allocator
+        return allocator
+
+    def _invalidate_bindings(self, overlay_id=None, nbunch=None):
+        """Drops interface binding index entries for node ids in nbunch
+        (all nodes if None) of overlay (all overlays if None).
+        Entries are rebuilt per node on next lookup"""
+
+        if overlay_id is None:
+            overlay_ids = self._binding_indexes.keys()
+        else:
+            overlay_ids = self._shared_overlays(overlay_id)
+
+        if nbunch is None:
+            for index_overlay_id in overlay_ids:
+                self._binding_indexes.pop(index_overlay_id, None)
+            return
+
+        nbunch = list(nbunch)
+        for index_overlay_id in overlay_ids:
+            index = self._binding_indexes.get(index_overlay_id)
+            if index:
+                for node_id in nbunch:
+                    index.pop(node_id, None)
+
+    def _invalidate_handles(self, overlay_id=None, nbunch=None,
+                            ebunch=None):
+        """Drops interned handles of overlay (all overlays if None): for
+        node ids in nbunch, with their interfaces and edges, and for
+        (src, dst) edges in ebunch, or all if both are None.
+        Call before removing nodes from the graph, to find their edges"""
+
+        if overlay_id is None:
+            self._node_handles = {}
+            self._edge_handles = {}
+            self._interface_handles = {}
+            return
+
+        if nbunch is None and ebunch is None:
+            for handles in (self._node_handles, self._edge_handles,
+                            self._interface_handles):
+                handles.pop(overlay_id, None)
+            return
+
+        graph = self._overlays.get(self._overlay_views.get(overlay_id,
+                                                           overlay_id))
+        for handle_overlay_id in self._shared_overlays(overlay_id):
+            node_handles = self._node_handles.get(handle_overlay_id, {})
+            edge_handles = self._edge_handles.get(handle_overlay_id, {})
+            interface_handles = self._interface_handles.get(
+                handle_overlay_id, {})
+            for node_id in nbunch or ():
+                node_handles.pop(node_id, None)
+                interface_handles.pop(node_id, None)
+                edge_handles.pop(node_id, None)
+                if graph is not None and node_id in graph:
+                    for neighbor in nx.all_neighbors(graph, node_id):
+                        edge_handles.get(neighbor, {}).pop(node_id, None)
+            for edge in ebunch or ():
+                (src, dst) = edge[:2]
+                edge_handles.get(src, {}).pop(dst, None)
+                edge_handles.get(dst, {}).pop(src, None)
+
+    def _node_bindings(self, overlay_id, node_id):
+        """Returns {interface_id: [dst, ...]} for edges stored from node_id
+        in overlay, from the binding index"""
+
+        index = self._binding_indexes.setdefault(overlay_id, {})
+        try:
+            return index[node_id]
+        except KeyError:
+            pass
+
+        # edges have _interfaces stored as {node_id: interface_id, }
+        bindings = {}
+        for (dst, data) in self._overlays[overlay_id].adj[node_id].items():
+            try:
+                bound_id = data['_interfaces'][node_id]
+            except (KeyError, TypeError):
+                continue  # not bound on this node
+            bindings.setdefault(bound_id, []).append(dst)
+        index[node_id] = bindings
+        return bindings
+
+    def _interface_edges(self, overlay_id, node_id, interface_id,
+                         segments=True):
+        """Returns (src, dst) for edges from node_id in overlay bound to
+        interface_id, in the same order as node.edges(): stored edges,
+        then (if segments) pairs over the segments the interface is a
+        member of"""
+
+        graph = self._overlays[overlay_id]
+        if node_id not in graph:
+            return []
+
+        bindings = self._node_bindings(overlay_id, node_id)
+        edges = [(node_id, dst) for dst in bindings.get(interface_id, ())]
+        if not segments:
+            return edges
+        for data in self._member_segments(overlay_id, node_id):
+            if data['_interfaces'][node_id] == interface_id:
+                edges += member_pairs(data, graph, node_id)
+        return edges
+
+    def _interface_bound(self, overlay_id, node_id, interface_id):
+        """Returns if interface_id of node_id is bound to an edge in
+        overlay, without expanding the segments it is a member of"""
+
+        graph = self._overlays[overlay_id]
+        if node_id not in graph:
+            return False
+
+        if self._node_bindings(overlay_id, node_id).get(interface_id):
+            return True
+        return bool(self._interface_segments(overlay_id, node_id,
+                                             interface_id))
+
+    def _interface_segments(self, overlay_id, node_id, interface_id):
+        """Returns the ids of segments of overlay that interface_id of
+        node_id is bound to a pair over, without expanding them"""
+
+        graph = self._overlays[overlay_id]
+        if node_id not in graph:
+            return []
+
+        segments = self._segments(overlay_id)
+        result = []
+        for segment_id in self._node_segments(overlay_id, node_id):
+            data = segments[segment_id]
+            if data['_interfaces'][node_id] == interface_id:
+                for _ in member_pairs(data, graph, node_id):
+                    result.append(segment_id)
+                    break
+        return result
+
+    def _segments(self, overlay_id):
+        """Returns {segment_id: data} for the multipoint segments of
+        overlay (see NmSegment), held in the overlay graph data"""
+
+        return self._overlays[overlay_id].graph.get('_segments') or {}
+
+    def _invalidate_segments(self, overlay_id=None):
+        """Drops the segment membership index for overlay (or all
+        overlays if None), rebuilt on next lookup"""
+
+        if overlay_id is None:
+            self._segment_indexes = {}
+            return
+
+        for overlay_id in self._shared_overlays(overlay_id):
+            self._segment_indexes.pop(overlay_id, None)
+
+    def _node_segments(self, overlay_id, node_id):
+        """Returns the ids of segments of overlay that node_id is a
+        member of"""
+
+        segments = self._segments(overlay_id)
+        if not segments:
+            return ()
+
+        cached = self._segment_indexes.get(overlay_id)
+        if cached is None or cached[0] is not segments \
+                or cached[1] != len(segments):
+            index = {}
+            for (segment_id, data) in segments.items():
+                for member in data['_interfaces']:
+                    index.setdefault(member, []).append(segment_id)
+            cached = (segments, len(segments), index)
+            self._segment_indexes[overlay_id] = cached
+        return cached[2].get(node_id, ())
+
+    def _member_segments(self, overlay_id, node_id):
+        """Returns the data of segments of overlay that node_id is a
+        member of"""
+
+        segment_ids = self._node_segments(overlay_id, node_id)
+        if not segment_ids:
+            return []
+        segments = self._segments(overlay_id)
+        return [segments[segment_id] for segment_id in segment_ids]
+
+    def _segment_pairs(self, overlay_id, graph, src_ids=None,
+                       predicate=None):
+        """Yields (src, dst) for members adjacent over a segment of
+        overlay, from src_ids (all members if None), in graph (the
+        overlay or a subgraph of it). If set, predicate(data) selects the
+        segments to expand, from their data"""
+
+        segments = self._segments(overlay_id)
+        if not segments:
+            return
+
+        if src_ids is None:
+            for data in segments.values():
+                if predicate is None or predicate(data):
+                    for pair in member_pairs(data, graph):
+                        yield pair
+            return
+
+        for src in src_ids:
+            seen = set()  # member of several segments with src
+            for data in self._member_segments(overlay_id, src):
+                if predicate is None or predicate(data):
+                    for pair in member_pairs(data, graph, src):
+                        if pair[1] not in seen:
+                            seen.add(pair[1])
+                            yield pair
+
+    def _segment_of_pair(self, overlay_id, src, dst):
+        """Returns the data of a segment of overlay that src and dst
+        are adjacent over, or None"""
+
+        graph = self._overlays[overlay_id]
+        for data in self._member_segments(overlay_id, src):
+            if dst in data['_interfaces'] and dst in graph \
+                    and members_adjacent(data, src, dst,
+                                         graph.is_directed()):
+                return data
+
+    def _segment_edge_data(self, overlay_id, src, dst):
+        """Returns edge data for (src, dst) over a segment of overlay.
+        Raises KeyError if they aren't adjacent over a segment"""
+
+        data = self._segment_of_pair(overlay_id, src, dst)
+        if data is None:
+            raise KeyError((src, dst))
+        return pair_data(data, src, dst)
+
+    def _store_segment_edge(self, overlay_id, src, dst):
+        """Stores the member pair (src, dst) of a segment of overlay as
+        an edge, eg to set attributes for only that pair.
+        Returns the edge data"""
+
+        # stored on the overlay a view is of
+        graph = self._overlays[self._overlay_views.get(overlay_id,
+                                                       overlay_id)]
+        graph.add_edge(src, dst, attr_dict=self._segment_edge_data(
+            overlay_id, src, dst))
+        self._invalidate_bindings(overlay_id, [src, dst])
+        self._invalidate_edge_index(overlay_id)
+        self._record(overlay_id, 'add', 'edge', (src, dst))
+        return graph[src][dst]
+
+    def index_attributes(self, *attrs):
+        """Opts in to indexing node attributes attrs on every overlay.
+        nodes() and filter() on an indexed attribute then only visit the
+        matching nodes.
+
+        >>> anm.index_attributes("host", "platform")
+        """
+
+        self.indexed_attrs.update(attrs)
+
+    def _invalidate_attr_index(self, overlay_id=None):
+        """Drops attribute indexes for overlay (or all overlays if None),
+        rebuilt on next filter"""
+
+        if overlay_id is None:
+            self._attr_indexes = {}
+            self._attr_index_sizes = {}
+            self._node_orders = {}
+            self._node_columns = {}
+            return
+
+        for overlay_id in self._shared_overlays(overlay_id):
+            self._attr_indexes.pop(overlay_id, None)
+            self._attr_index_sizes.pop(overlay_id, None)
+            self._node_orders.pop(overlay_id, None)
+            self._node_columns.pop(overlay_id, None)
+
+    def _node_attr_getter(self, overlay_id, attr):
+        """Returns function node_id -> getattr(node, attr).
+        Plain attributes are read from the node data directly,
+        without creating a node handle or logging misses"""
+
+        if hasattr(NmNode, attr):
+            # property or method, eg asn falls back to phy
+            return lambda node_id: getattr(NmNode(self, overlay_id,
+                                                  node_id), attr)
+
+        node_data = self._overlays[overlay_id].node
+
+        def getter(node_id):
+            try:
+                return node_data[node_id].get(attr)
+            except KeyError:
+                return None
+        return getter
+
+    def _compile_node_filter(self, overlay_id, args, kwargs):
+        """Returns predicate node_id -> bool, equivalent to testing
+        getattr(node, key) for args, and == val for kwargs"""
+
+        arg_getters = [self._node_attr_getter(overlay_id, key)
+                       for key in args]
+        kwarg_getters = [(self._node_attr_getter(overlay_id, key), val)
+                         for (key, val) in kwargs.items()]
+
+        def predicate(node_id):
+            return all(getter(node_id) for getter in arg_getters) \
+                and all(getter(node_id) == val for (getter, val)
+                        in kwarg_getters)
+        return predicate
+
+    def _attr_index(self, overlay_id, attr):
+        """Returns {value: set(node_ids)} for attr in overlay.
+        None if attr isn't indexed, or has unhashable values"""
+
+        if attr not in self.indexed_attrs:
+            return None
+
+        graph = self._overlays[overlay_id]
+        if self._attr_index_sizes.get(overlay_id, len(graph)) != len(graph):
+            # nodes added or removed directly on the NetworkX graph
+            self._invalidate_attr_index(overlay_id)
+
+        indexes = self._attr_indexes.setdefault(overlay_id, {})
+        try:
+            return indexes[attr]
+        except KeyError:
+            pass
+
+        index = {}
+        getter = self._node_attr_getter(overlay_id, attr)
+        try:
+            for node_id in graph:
+                index.setdefault(getter(node_id), set()).add(node_id)
+        except TypeError:
+            index = None  # unhashable values: filter by scanning
+
+        indexes[attr] = index
+        self._attr_index_sizes[overlay_id] = len(graph)
+        return index
+
+    def _index_node_attrs(self, overlay_id, nbunch, attrs=None,
+                          columns=True):
+        """Adds current values of attrs (all indexed attributes if None)
+        for node ids in nbunch to the attribute indexes of overlay, and
+        to its columnar attributes unless columns is False.
+        asn falls back to phy, so an asn set on phy is reindexed on
+        every overlay."""
+
+        if len(self._shared_overlays(overlay_id)) > 1:
+            # data is shared with views: rebuilt on next use, for each
+            self._invalidate_attr_index(overlay_id)
+            return
+
+        if attrs is None:
+            self._node_orders.pop(overlay_id, None)  # nodes added
+            self._node_columns.pop(overlay_id, None)
+        else:
+            self._update_node_columns(overlay_id, nbunch, attrs, columns)
+
+        overlay_ids = [overlay_id]
+        if overlay_id == 'phy' and (attrs is None or 'asn' in attrs):
+            overlay_ids = self._attr_indexes.keys()
+
+        nbunch = [getattr(n, 'node_id', n) for n in nbunch]
+        for index_overlay_id in overlay_ids:
+            indexes = self._attr_indexes.get(index_overlay_id)
+            if not indexes:
+                continue  # not yet built
+
+            graph = self._overlays[index_overlay_id]
+            if index_overlay_id == overlay_id:
+                index_attrs = attrs or indexes.keys()
+            else:
+                index_attrs = ['asn']
+            for attr in index_attrs:
+                index = indexes.get(attr)
+                if index is None:
+                    continue
+                getter = self._node_attr_getter(index_overlay_id, attr)
+                try:
+                    for node_id in nbunch:
+                        if node_id in graph:
+                            index.setdefault(getter(node_id),
+                                             set()).add(node_id)
+                except TypeError:
+                    indexes[attr] = None  # unhashable value
+            if index_overlay_id == overlay_id:
+                self._attr_index_sizes[overlay_id] = len(graph)
+
+    def _node_order(self, overlay_id):
+        """Returns {node_id: position} in overlay graph iteration order"""
+
+        graph = self._overlays[overlay_id]
+        try:
+            (size, order) = self._node_orders[overlay_id]
+        except KeyError:
+            pass
+        else:
+            if size == len(graph):
+                return order
+
+        order = dict((node_id, position) for (position, node_id)
+                     in enumerate(graph))
+        self._node_orders[overlay_id] = (len(graph), order)
+        return order
+
+    def _indexed_nodes(self, overlay_id, args, kwargs, predicate):
+        """Returns node_ids in overlay matching predicate, using the most
+        selective attribute index for args/kwargs. Results are in graph
+        iteration order. None if no indexed attribute is filtered on"""
+
+        candidates = None
+        for key in args:
+            index = self._attr_index(overlay_id, key)
+            if index is None:
+                continue
+            matches = set()
+            for (value, node_ids) in index.items():
+                if value:
+                    matches.update(node_ids)
+            if candidates is None or len(matches) < len(candidates):
+                candidates = matches
+
+        for (key, val) in kwargs.items():
+            index = self._attr_index(overlay_id, key)
+            if index is None:
+                continue
+            try:
+                matches = index.get(val, ())
+            except TypeError:
+                continue  # unhashable value
+            if candidates is None or len(matches) < len(candidates):
+                candidates = matches
+
+        if candidates is None:
+            return None
+
+        graph = self._overlays[overlay_id]
+        # entries can be stale: verify against current values
+        node_ids = [n for n in candidates if n in graph and predicate(n)]
+        if len(node_ids) > 1:
+            order = self._node_order(overlay_id)
+            node_ids.sort(key=order.get)
+        return node_ids
+
+    def index_edge_attributes(self, *attrs):
+        """Opts in to indexing edge attributes attrs on every overlay,
+        used by edges() to find edges by attribute value.
+
+        >>> anm.index_edge_attributes("type")
+        """
+
+        self.indexed_edge_attrs.update(attrs)
+
+    def _invalidate_edge_index(self, overlay_id=None):
+        """Drops edge attribute indexes for overlay (or all overlays if
+        None), rebuilt on next edges() query"""
+
+        if overlay_id is None:
+            self._edge_indexes = {}
+            self._edge_orders = {}
+            self._edge_columns = {}
+            return
+
+        for overlay_id in self._shared_overlays(overlay_id):
+            self._edge_indexes.pop(overlay_id, None)
+            self._edge_orders.pop(overlay_id, None)
+            self._edge_columns.pop(overlay_id, None)
+
+    def _compile_edge_filter(self, overlay_id, args, kwargs):
+        """Returns predicate (src, dst) -> bool, equivalent to testing
+        getattr(edge, key) for args, and == val for kwargs"""
+
+        graph = self._overlays[overlay_id]
+
+        def getter(attr):
+            if hasattr(NmEdge, attr):
+                return lambda src, dst: getattr(NmEdge(self, overlay_id,
+                                                       src, dst), attr)
+            return lambda src, dst: graph[src][dst].get(attr)
+
+        arg_getters = [getter(key) for key in args]
+        kwarg_getters = [(getter(key), val) for (key, val)
+                         in kwargs.items()]
+
+        def predicate(src, dst):
+            return all(get(src, dst) for get in arg_getters) \
+                and all(get(src, dst) == val for (get, val)
+                        in kwarg_getters)
+        return predicate
+
+    def _edge_order(self, overlay_id):
+        """Returns {(src, dst): position} in edges_iter() order"""
+
+        try:
+            return self._edge_orders[overlay_id]
+        except KeyError:
+            graph = self._overlays[overlay_id]
+            order = dict((edge, position) for (position, edge)
+                         in enumerate(graph.edges_iter()))
+            self._edge_orders[overlay_id] = order
+            return order
+
+    def _edge_attr_index(self, overlay_id, attr):
+        """Returns {value: set((src, dst))} for edge attr in overlay.
+        None if attr isn't indexed, or has unhashable values"""
+
+        graph = self._overlays[overlay_id]
+        if (attr not in self.indexed_edge_attrs or hasattr(NmEdge, attr)
+                or graph.is_multigraph()):
+            return None
+
+        indexes = self._edge_indexes.setdefault(overlay_id, {})
+        try:
+            return indexes[attr]
+        except KeyError:
+            pass
+
+        index = {}
+        try:
+            for (src, dst, data) in graph.edges_iter(data=True):
+                index.setdefault(data.get(attr), set()).add((src, dst))
+        except TypeError:
+            index = None  # unhashable values: filter by scanning
+
+        indexes[attr] = index
+        return index
+
+    def _index_edge_attr(self, overlay_id, src, dst, attr):
+        """Adds the current value of attr for edge (src, dst) to the
+        edge index of overlay"""
+
+        if len(self._shared_overlays(overlay_id)) > 1:
+            # data is shared with views: rebuilt on next use, for each
+            self._invalidate_edge_index(overlay_id)
+            return
+
+        columns = self._edge_columns.get(overlay_id)
+        if columns is not None and attr in columns.columns:
+            self._update_edge_column(overlay_id, columns, src, dst, attr)
+
+        index = self._edge_indexes.get(overlay_id, {}).get(attr)
+        if index is None:
+            return  # not indexed or not yet built
+
+        order = self._edge_order(overlay_id)
+        graph = self._overlays[overlay_id]
+        if (src, dst) not in order:
+            if graph.is_directed() or (dst, src) not in order:
+                # edge added directly on the NetworkX graph
+                self._invalidate_edge_index(overlay_id)
+                return
+            (src, dst) = (dst, src)  # as stored by edges_iter()
+
+        try:
+            index.setdefault(graph[src][dst].get(attr), set()).add((src,
+                                                                    dst))
+        except TypeError:
+            self._edge_indexes[overlay_id][attr] = None  # unhashable value
+
+    def _indexed_edges(self, overlay_id, args, kwargs, predicate):
+        """Returns (src, dst) in overlay matching predicate, using the most
+        selective edge attribute index for args/kwargs. Results are in
+        edges_iter() order. None if no indexed attribute is filtered on"""
+
+        candidates = None
+        for key in args:
+            index = self._edge_attr_index(overlay_id, key)
+            if index is None:
+                continue
+            matches = set()
+            for (value, edges) in index.items():
+                if value:
+                    matches.update(edges)
+            if candidates is None or len(matches) < len(candidates):
+                candidates = matches
+
+        for (key, val) in kwargs.items():
+            index = self._edge_attr_index(overlay_id, key)
+            if index is None:
+                continue
+            try:
+                matches = index.get(val, ())
+            except TypeError:
+                continue  # unhashable value
+            if candidates is None or len(matches) < len(candidates):
+                candidates = matches
+
+        if candidates is None:
+            return None
+
+        graph = self._overlays[overlay_id]
+        # entries can be stale: verify against current values
+        edges = [(src, dst) for (src, dst) in candidates
+                 if graph.has_edge(src, dst) and predicate(src, dst)]
+        if len(edges) > 1:
+            order = self._edge_order(overlay_id)
+            edges.sort(key=order.get)
+        return edges
+
+    def columnar_attributes(self, *attrs):
+        """Opts in to holding numeric node attributes attrs as NumPy
+        arrays on every overlay. A column is built by the first
+        get_node_attrs, then node.attr is read from it and the setters
+        write to it as well as to the node data. Needs NumPy.
+
+        >>> anm.columnar_attributes("x", "y")
+        """
+
+        self.columnar_attrs.update(attrs)
+
+    def columnar_edge_attributes(self, *attrs):
+        """As for columnar_attributes, for edge attributes attrs, eg
+        ospf_cost"""
+
+        self.columnar_edge_attrs.update(attrs)
+
+    def _node_column(self, overlay_id, attr):
+        """Returns (columns, (values, present)) for node attr in overlay.
+        None if attr isn't columnar, has non-numeric values, or NumPy
+        isn't installed"""
+
+        if numpy is None or attr not in self.columnar_attrs:
+            return None
+
+        graph = self._overlays[overlay_id]
+        columns = self._node_columns.get(overlay_id)
+        if columns is None or len(columns) != len(graph):
+            # first use, or nodes added or removed on the NetworkX graph
+            columns = AttributeColumns(graph)
+            self._node_columns[overlay_id] = columns
+
+        column = columns.column(attr, self._node_attr_getter(overlay_id,
+                                                             attr))
+        if column is None:
+            return None
+        return (columns, column)
+
+    def _node_column_value(self, overlay_id, node_id, attr):
+        """Returns attr of node_id from its column. Raises KeyError if the
+        column isn't built or current, or the node has no value, to read
+        the node data instead"""
+
+        columns = self._node_columns[overlay_id]
+        if len(columns) != len(self._overlays[overlay_id]):
+            raise KeyError(node_id)  # nodes added on the NetworkX graph
+        return columns.value(attr, node_id)
+
+    def _update_node_columns(self, overlay_id, nbunch, attrs,
+                             refresh=True):
+        """Refreshes columnar attrs for node ids in nbunch, unless refresh
+        is False, eg as already written in bulk.
+        asn falls back to phy, so an asn set on phy drops the asn
+        column of every other overlay."""
+
+        attrs = [attr for attr in attrs if attr in self.columnar_attrs]
+        if not attrs or not self._node_columns:
+            return
+
+        if overlay_id == 'phy' and 'asn' in attrs:
+            for (column_overlay_id, columns) in self._node_columns.items():
+                if column_overlay_id != 'phy':
+                    columns.columns.pop('asn', None)
+
+        columns = self._node_columns.get(overlay_id)
+        if not refresh:
+            return
+        if columns is None:
+            return  # not yet built
+        nbunch = [getattr(n, 'node_id', n) for n in nbunch]
+        for attr in attrs:
+            columns.update(attr, nbunch,
+                           self._node_attr_getter(overlay_id, attr))
+
+    def _node_attrs_set(self, overlay_id, node_ids, attrs, columns=True,
+                        record=True):
+        """Updates the journal, indexes and caches after attrs were written
+        directly to the data of node_ids in overlay, eg by bulk setters.
+        Columnar attributes are refreshed unless columns is False, and
+        the changes journalled unless record is False."""
+
+        if record and self.journal is not None:
+            for node_id in node_ids:
+                for attr in attrs:
+                    self._record(overlay_id, 'set', 'node', node_id, attr)
+
+        self._index_node_attrs(overlay_id, node_ids, attrs, columns)
+        self._invalidate_phy_attrs(overlay_id, node_ids)
+        label_attrs = ['label'] + self.label_attrs
+        if any(attr in label_attrs for attr in attrs):
+            self._invalidate_label_index()  # labels have changed
+        if any(attr == 'asn' or attr in label_attrs for attr in attrs):
+            self._invalidate_sort_keys(node_ids)
+
+    def _edge_attrs_set(self, overlay_id, edges, attrs, columns=True):
+        """As for _node_attrs_set, for attrs written directly to the data
+        of (src, dst) edges. Edge indexes on attrs, and columnar attrs
+        unless columns is False, are rebuilt on next use"""
+
+        if self.journal is not None:
+            for edge in edges:
+                for attr in attrs:
+                    self._record(overlay_id, 'set', 'edge', edge, attr)
+
+        if len(self._shared_overlays(overlay_id)) > 1:
+            # data is shared with views: rebuilt on next use, for each
+            self._invalidate_edge_index(overlay_id)
+            return
+
+        indexes = self._edge_indexes.get(overlay_id, {})
+        edge_columns = self._edge_columns.get(overlay_id)
+        for attr in attrs:
+            indexes.pop(attr, None)
+            if columns and edge_columns is not None:
+                edge_columns.columns.pop(attr, None)
+
+    def _edge_column(self, overlay_id, attr):
+        """Returns (columns, (values, present)) for edge attr in overlay,
+        with rows in edges_iter() order. None as for _node_column, or for
+        multigraph overlays"""
+
+        if numpy is None or attr not in self.columnar_edge_attrs:
+            return None
+
+        graph = self._overlays[overlay_id]
+        if graph.is_multigraph():
+            return None
+        columns = self._edge_columns.get(overlay_id)
+        if columns is None or len(columns) != graph.size():
+            # first use, or edges added or removed on the NetworkX graph
+            columns = AttributeColumns(graph.edges_iter())
+            self._edge_columns[overlay_id] = columns
+
+        column = columns.column(attr, lambda (src, dst):
+                                graph[src][dst].get(attr))
+        if column is None:
+            return None
+        return (columns, column)
+
+    def _edge_column_value(self, overlay_id, src, dst, attr):
+        """As for _node_column_value, for edge (src, dst)"""
+
+        columns = self._edge_columns[overlay_id]
+        graph = self._overlays[overlay_id]
+        if len(columns) != graph.size():
+            raise KeyError((src, dst))  # edges added on the NetworkX graph
+        if (src, dst) not in columns.rows and not graph.is_directed():
+            (src, dst) = (dst, src)  # as stored by edges_iter()
+        return columns.value(attr, (src, dst))
+
+    def _edge_rows(self, overlay_id, columns, ebunch):
+        """Returns the row array for (src, dst) edges in ebunch, matching
+        either orientation in undirected overlays"""
+
+        if self._overlays[overlay_id].is_directed():
+            return columns.rows_for(ebunch)
+        rows = columns.rows
+        return columns.rows_for(edge if edge in rows else edge[::-1]
+                                for edge in ebunch)
+
+    def _update_edge_column(self, overlay_id, columns, src, dst, attr):
+        """Refreshes columnar attr for edge (src, dst)"""
+
+        graph = self._overlays[overlay_id]
+        if (src, dst) not in columns.rows and not graph.is_directed():
+            (src, dst) = (dst, src)  # as stored by edges_iter()
+        columns.update(attr, [(src, dst)],
+                       lambda (src, dst): graph[src][dst].get(attr))
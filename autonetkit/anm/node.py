@@ -1,4 +1,3 @@
-import itertools
 import logging
 from functools import total_ordering
 
@@ -10,25 +9,55 @@ from autonetkit.log import CustomAdapter
 @total_ordering
 class NmNode(object):
 
-    """NmNode"""
+    """NmNode
 
-    def __init__(
-        self,
+    Handles are flyweights: one instance is interned per (overlay, node)
+    in the NetworkModel until the node is removed, and only stores the ids
+    needed to look up the underlying NetworkX data.
+    """
+
+    __slots__ = ('anm', 'overlay_id', 'node_id', '_log')
+
+    def __new__(
+        cls,
         anm,
         overlay_id,
         node_id,
     ):
+        try:
+            return anm._node_handles[overlay_id][node_id]
+        except KeyError:
+            pass
 
 # Set using this method to bypass __setattr__
 
+        self = object.__new__(cls)
         object.__setattr__(self, 'anm', anm)
         object.__setattr__(self, 'overlay_id', overlay_id)
 # should be able to use _graph from here as anm and overlay_id are defined
         object.__setattr__(self, 'node_id', node_id)
-        logger = logging.getLogger("ANK")
+        object.__setattr__(self, '_log', None)
+        anm._node_handles.setdefault(overlay_id, {})[node_id] = self
+        return self
+
+    def __getnewargs__(self):
+        return (self.anm, self.overlay_id, self.node_id)
+
+    def __getstate__(self):
+        # state is fully described by __getnewargs__
+        return None
+
+    @property
+    def log(self):
+        """Logger for this node, created on first use"""
+
         logstring = "Node: %s" % str(self)
-        logger = CustomAdapter(logger, {'item': logstring})
-        object.__setattr__(self, 'log', logger)
+        logger = self._log
+        if logger is None or logger.extra['item'] != logstring:
+            logger = CustomAdapter(logging.getLogger("ANK"),
+                                   {'item': logstring})
+            object.__setattr__(self, '_log', logger)
+        return logger
 
     def __hash__(self):
         """"""
@@ -78,59 +107,24 @@ class NmNode(object):
         return self.interfaces(type='loopback')
 
     def __lt__(self, other):
-        """"""
-
-# want [r1, r2, ..., r11, r12, ..., r21, r22] not [r1, r11, r12, r2, r21, r22]
-# so need to look at numeric part
-        import string
-        #TODO: use human sort from StackOverflow
-
-        # sort on label if available
-        if self.label is not None:
-            self_node_id = self.label
-        else:
-            self_node_id = self.node_id
-
-        if other.label is not None:
-            other_node_id = other.label
-        else:
-            other_node_id = other_node_id
+        """Sorts on asn then label, in natural order
+        ie [r1, r2, ..., r11, r12] not [r1, r11, r12, r2]"""
 
-        try:
-            self_node_string = [x for x in self_node_id if x
-                                not in string.digits]
-            other_node_string = [x for x in self_node_id if x
-                                 not in string.digits]
-        except TypeError:
+        return self._sort_key() < other._sort_key()
 
-            # e.g. non-iterable type, such as an int node_id
+    def _sort_key(self):
+        """Cached (asn, natural label key, node_id) for this node"""
 
-            pass
-        else:
-            if self_node_string == other_node_string:
-                self_node_id = """""".join([x for x in self_node_id
-                                            if x in string.digits])
-                other_node_id = """""".join([x for x in other_node_id
-                                             if x in string.digits])
-                try:
-                    self_node_id = int(self_node_id)
-                except ValueError:
-                    pass  # not a number
-                try:
-                    other_node_id = int(other_node_id)
-                except ValueError:
-                    pass  # not a number
-
-        return (self.asn, self_node_id) < (other.asn, other_node_id)
+        return self.anm._node_sort_key(self.overlay_id, self.node_id)
 
     def _next_int_id(self):
-        """"""
-
-# returns next free interface I
+        """Allocates a free interface id, starting at 1 as 0 is loopback
+        zero: the lowest, unless interfaces were changed in place (see
+        InterfaceIdAllocator). The caller adds the interface with this
+        id."""
 
-        for int_id in itertools.count(1):  # start at 1 as 0 is loopback
-            if int_id not in self._interfaces:
-                return int_id
+        return self.anm._interface_allocator(self.overlay_id, self.node_id,
+                                             self._interfaces).allocate()
 
     # TODO: interface function access needs to be cleaned up
 
@@ -148,6 +142,8 @@ class NmNode(object):
             next_id = self.phy._next_int_id()
             self.phy._interfaces[next_id] = {'type': type,
                                              'description': description}
+            self.anm._record('phy', 'add', 'interface',
+                             (self.node_id, next_id))
 
             # TODO: fix this workaround for not returning description from phy
             # graph
@@ -159,6 +155,8 @@ class NmNode(object):
             data['description'] = description
 
         self._interfaces[next_id] = data
+        self.anm._record(self.overlay_id, 'add', 'interface',
+                         (self.node_id, next_id))
         return next_id
 
     def add_loopback(self, *args, **kwargs):
@@ -259,6 +257,12 @@ class NmNode(object):
 
         try:
             return self.anm.overlay_nx_graphs[self.overlay_id]
+        except KeyError, e:
+            if self.anm.has_overlay(self.overlay_id):  # built on access
+                return self.anm.overlay_nx_graphs[self.overlay_id]
+            log.warning("Error accessing overlay %s for node %s: %s" %
+                (self.overlay_id, self.node_id, e))
+            raise SystemExit
         except Exception, e:
             log.warning("Error accessing overlay %s for node %s: %s" %
                 (self.overlay_id, self.node_id, e))
@@ -277,27 +281,30 @@ class NmNode(object):
     def is_router(self):
         """Either from this graph or the physical graph"""
 
-        return self.device_type == 'router' or self.phy.device_type \
-            == 'router'
+        return self.is_device_type('router')
 
     def is_device_type(self, device_type):
         """Generic user-defined cross-overlay search for device_type
         either from this graph or the physical graph"""
 
-        return self.device_type == device_type or self.phy.device_type \
-            == device_type
+        node_data = self._graph.node.get(self.node_id, {})
+        if node_data.get('device_type') == device_type:
+            return True
+        try:
+            return self.anm._phy_attr(self.node_id, 'device_type') \
+                == device_type
+        except KeyError:
+            return device_type is None  # not in phy
 
     def is_switch(self):
         """Returns if device is a switch"""
 
-        return self.device_type == 'switch' or self.phy.device_type \
-            == 'switch'
+        return self.is_device_type('switch')
 
     def is_server(self):
         """Returns if device is a server"""
 
-        return self.device_type == 'server' or self.phy.device_type \
-            == 'server'
+        return self.is_device_type('server')
 
     def is_l3device(self):
         """Layer 3 devices: router, server, cloud, host
@@ -322,8 +329,7 @@ class NmNode(object):
             # try from phy
 
             try:
-                return self.anm.overlay_nx_graphs['phy'
-                                                  ].node[self.node_id]['asn']
+                return self.anm._phy_attr(self.node_id, 'asn')
             except KeyError:
                 if self.node_id not in self.anm.overlay_nx_graphs['phy'
                                                                   ]:
@@ -364,21 +370,29 @@ class NmNode(object):
     def _overlay(self):
         """Access overlay graph for this node"""
 
-        from autonetkit.anm.graph import NmGraph
-        return NmGraph(self.anm, self.overlay_id)
+        return self.anm[self.overlay_id]
 
     def degree(self):
-        """Returns degree of node"""
+        """Returns degree of node, including pairs over segments"""
 
-        return self._graph.degree(self.node_id)
+        pairs = self.anm._segment_pairs(self.overlay_id, self._graph,
+                                        [self.node_id])
+        count = sum(1 for _ in pairs)
+        if self._graph.is_directed():
+            count *= 2  # in and out
+        return self._graph.degree(self.node_id) + count
 
 
 
     def neighbors(self, *args, **kwargs):
-        """Returns neighbors of node"""
+        """Returns neighbors of node, including the other members of
+        segments it is a member of"""
 
+        neighbor_ids = self._graph.neighbors(self.node_id)
+        neighbor_ids += [dst for (_, dst) in self.anm._segment_pairs(
+            self.overlay_id, self._graph, [self.node_id])]
         neighs = list(NmNode(self.anm, self.overlay_id, node)
-                    for node in self._graph.neighbors(self.node_id))
+                    for node in neighbor_ids)
 
         return self._overlay.filter(neighs, *args, **kwargs)
 
@@ -449,6 +463,13 @@ class NmNode(object):
         This is useful for accesing attributes passed through from graphml"""
         #TODO: refactor/document this logic
 
+        if key in self.anm.columnar_attrs:
+            try:
+                return self.anm._node_column_value(self.overlay_id,
+                                                   self.node_id, key)
+            except KeyError:
+                pass  # column not built: read the node data
+
         try:
             node_data = self._graph.node[self.node_id]
         except KeyError:
@@ -501,7 +522,35 @@ class NmNode(object):
             self._graph.node[self.node_id][key] = val
         except KeyError:
             self._graph.add_node(self.node_id)
+            self.anm._index_node_attrs(self.overlay_id, [self.node_id])
             self.set(key, val)
+            return
+
+        if key in self.anm.indexed_attrs or key in self.anm.columnar_attrs:
+            self.anm._index_node_attrs(self.overlay_id, [self.node_id], [key])
+            if key == 'asn':
+                self.anm._index_node_attrs('phy', [self.node_id], [key])
+
+        if (key in self.anm.cached_phy_attrs or key in self.anm.label_attrs) \
+                and (self.overlay_id == 'phy' or key == 'asn'):
+            # asn.setter also sets asn on phy
+            self.anm._invalidate_phy_attrs('phy', [self.node_id])
+
+        if key == 'asn' or key == 'label' or key in self.anm.label_attrs:
+            self.anm._invalidate_sort_keys([self.node_id])
+
+        if key == 'label' or key in self.anm.label_attrs:
+            # keep the label index in step with the new label
+            self.anm._index_node_labels(self.overlay_id, [self.node_id])
+            if key == 'asn':
+                # asn.setter also sets asn on phy
+                self.anm._index_node_labels('phy', [self.node_id])
+
+        self.anm._record(self.overlay_id, 'set', 'node', self.node_id, key)
+        if key == 'asn' and self.overlay_id != 'phy' \
+                and self.node_id in self.anm.overlay_nx_graphs['phy']:
+            # asn.setter set asn on phy
+            self.anm._record('phy', 'set', 'node', self.node_id, key)
 
     def set(self, key, val):
         """For consistency, node.set(key, value) is neater
@@ -0,0 +1,170 @@
+from autonetkit.anm.edge import NmEdge
+from autonetkit.anm.interface import NmInterface
+from autonetkit.anm.node import NmNode
+
+# segment data keys that aren't returned as edge attributes of member pairs
+SEGMENT_KEYS = ('_interfaces', '_groups', '_removed')
+
+
+def member_pairs(data, graph, src=None):
+    """Yields (src, dst) for members of the segment with data that are
+    adjacent over it in graph, from src if set. Pairs stored as edges in
+    graph are skipped: the edge takes precedence"""
+
+    members = [node_id for node_id in data['_interfaces']
+               if node_id in graph]
+    directed = graph.is_directed()
+    if src is None:
+        sources = members
+    else:
+        sources = [src]
+
+    for (index, src_id) in enumerate(sources):
+        if src is None and not directed:
+            dsts = members[index + 1:]  # each unordered pair once
+        else:
+            dsts = members
+        for dst_id in dsts:
+            if dst_id != src_id \
+                    and members_adjacent(data, src_id, dst_id, directed) \
+                    and not graph.has_edge(src_id, dst_id):
+                yield (src_id, dst_id)
+
+
+def members_adjacent(data, src, dst, directed=False):
+    """Returns if members src and dst are adjacent over the segment with
+    data: they are in different groups (if set), and the pair hasn't
+    been removed"""
+
+    groups = data.get('_groups')
+    if groups and groups.get(src) == groups.get(dst):
+        return False
+
+    removed = data.get('_removed')
+    if removed:
+        if [src, dst] in removed or (not directed and [dst, src] in removed):
+            return False
+
+    return True
+
+
+def pair_data(data, src, dst):
+    """Returns edge data for the member pair (src, dst): the segment
+    attributes, bound to the member interfaces of src and dst"""
+
+    interfaces = data['_interfaces']
+    result = dict((key, val) for (key, val) in data.items()
+                  if key not in SEGMENT_KEYS)
+    result['_interfaces'] = {src: interfaces[src], dst: interfaces[dst]}
+    return result
+
+
+class NmSegment(object):
+
+    """API to access a multipoint segment: a broadcast node (eg a switch)
+    held as the interfaces of its members, rather than as a full mesh of
+    edges between them. Edge, neighbor and binding queries on the overlay
+    expand it to an NmEdge per adjacent pair of members, on demand.
+    Attributes set on the segment are the attributes of each of these
+    edges; setting an attribute on one of the edges stores that pair as a
+    regular edge."""
+
+    __slots__ = ('anm', 'overlay_id', 'segment_id')
+
+    def __init__(self, anm, overlay_id, segment_id):
+
+# Set using this method to bypass __setattr__
+
+        object.__setattr__(self, 'anm', anm)
+        object.__setattr__(self, 'overlay_id', overlay_id)
+        object.__setattr__(self, 'segment_id', segment_id)
+
+    def __repr__(self):
+        return '%s: <%s>' % (self.overlay_id, self.segment_id)
+
+    def __eq__(self, other):
+        try:
+            return (self.overlay_id, self.segment_id) \
+                == (other.overlay_id, other.segment_id)
+        except AttributeError:
+            return self.segment_id == other
+
+    def __hash__(self):
+        return hash(self.segment_id)
+
+    def __nonzero__(self):
+        return self.segment_id in self.anm._segments(self.overlay_id)
+
+    @property
+    def _graph(self):
+        """Return graph the segment belongs to"""
+
+        return self.anm.overlay_nx_graphs[self.overlay_id]
+
+    @property
+    def _data(self):
+        """Return data dict for the segment"""
+
+        return self.anm._segments(self.overlay_id)[self.segment_id]
+
+    def __iter__(self):
+        return iter(self.nodes())
+
+    def __len__(self):
+        return len(self.nodes())
+
+    def __contains__(self, node):
+        node_id = getattr(node, 'node_id', node)
+        return node_id in self._data['_interfaces'] \
+            and node_id in self._graph
+
+    def nodes(self):
+        """Member nodes of the segment"""
+
+        graph = self._graph
+        return [NmNode(self.anm, self.overlay_id, node_id)
+                for node_id in self._data['_interfaces']
+                if node_id in graph]
+
+    def interfaces(self):
+        """Member interfaces joined by the segment"""
+
+        graph = self._graph
+        return [NmInterface(self.anm, self.overlay_id, node_id,
+                            interface_id) for (node_id, interface_id)
+                in self._data['_interfaces'].items() if node_id in graph]
+
+    def edges(self):
+        """Edges for each adjacent pair of members, expanded on demand"""
+
+        return [NmEdge(self.anm, self.overlay_id, src, dst)
+                for (src, dst) in member_pairs(self._data, self._graph)]
+
+    def dump(self):
+        return str(self._data)
+
+    def get(self, key):
+        """For consistency, segment.get(key) is neater than
+        getattr(segment, key)"""
+
+        return self.__getattr__(key)
+
+    def set(self, key, val):
+        """For consistency, segment.set(key, value) is neater than
+        setattr(segment, key, value)"""
+
+        return self.__setattr__(key, val)
+
+    def __getattr__(self, key):
+        """Returns segment property"""
+
+        return self._data.get(key)
+
+    def __setattr__(self, key, val):
+        """Sets segment property"""
+
+        self._data[key] = val
+        if key in SEGMENT_KEYS:
+            self.anm._invalidate_segments(self.overlay_id)
+        self.anm._record(self.overlay_id, 'set', 'segment',
+                         self.segment_id, key)
@@ -77,6 +77,12 @@ def grid_2d(dim):
 def initialise(input_graph):
     """Initialises the input graph with from a NetworkX graph"""
     anm = autonetkit.anm.NetworkModel()
+    # attributes the design rules and compilers filter nodes on
+    anm.index_attributes("device_type", "asn", "host", "platform", "syntax",
+                         "broadcast_domain")
+    anm.index_edge_attributes("type")
+    # graphics placement averages neighbor x and y in bulk
+    anm.columnar_attributes("x", "y")
 
     input_undirected = nx.Graph(input_graph)
     g_in = anm.add_overlay("input", graph=input_undirected)
@@ -149,8 +155,11 @@ def check_server_asns(anm):
 
 
 @call_log
-def apply_design_rules(anm):
-    """Applies appropriate design rules to ANM"""
+def apply_design_rules(anm, lazy=True):
+    """Applies appropriate design rules to ANM.
+    If lazy, the overlays that no other design rule modifies (eigrp, isis,
+    mpls_te, mpls_oam) are registered to be built on first access,
+    otherwise every overlay is built here."""
     g_in = anm['input']
 
     build_phy(anm)
@@ -214,16 +223,21 @@ def apply_design_rules(anm):
 
     from autonetkit.design.igp import build_ospf, build_eigrp, build_isis
     build_ospf(anm)
-    build_eigrp(anm)
-    build_isis(anm)
+    anm.add_overlay_builder("eigrp", build_eigrp, ["input", "phy", "layer3"])
+    anm.add_overlay_builder("isis", build_isis,
+                            ["input", "phy", "layer3", "ipv4"])
+    if not lazy:
+        anm.build_overlays(["eigrp", "isis"])
 
     from autonetkit.design.bgp import build_bgp
     build_bgp(anm)
     # autonetkit.update_http(anm)
 
     from autonetkit.design.mpls import mpls_te, mpls_oam
-    mpls_te(anm)
-    mpls_oam(anm)
+    anm.add_overlay_builder("mpls_te", mpls_te, ["input", "phy", "layer3"])
+    anm.add_overlay_builder("mpls_oam", mpls_oam, ["input"])
+    if not lazy:
+        anm.build_overlays(["mpls_te", "mpls_oam"])
 
 # post-processing
     if anm['phy'].data.enable_routing:
@@ -329,13 +343,9 @@ def build_phy(anm):
         g_phy.data.mgmt_prefixlen = g_in.data.mgmt_prefixlen
         g_phy.data.mgmt_prefixlen = g_in.data.mgmt_prefixlen
 
-        ank_utils.copy_attr_from(g_in, g_phy, "use_cdp")
-        ank_utils.copy_attr_from(g_in, g_phy, "use_onepk")
-        ank_utils.copy_attr_from(g_in, g_phy, "label_full")
-        ank_utils.copy_attr_from(g_in, g_phy, "indices")
-        ank_utils.copy_attr_from(g_in, g_phy, "dont_configure_static_routing")
-        ank_utils.copy_attr_from(g_in, g_phy, "server_username")
-        ank_utils.copy_attr_from(g_in, g_phy, "server_ssh_key")
+        ank_utils.copy_attr_from(g_in, g_phy, ["use_cdp", "use_onepk",
+            "label_full", "indices", "dont_configure_static_routing",
+            "server_username", "server_ssh_key"])
 
     ank_utils.set_node_default(g_phy,  use_ipv4=False, use_ipv6=False)
     ank_utils.copy_attr_from(g_in, g_phy, "custom_config_global",
@@ -359,7 +369,8 @@ def build_phy(anm):
 
 @call_log
 def build_l3_connectivity(anm):
-    """ l3_connectivity graph: switch nodes aggregated and exploded"""
+    """ l3_connectivity graph: switch nodes aggregated and replaced by
+    multipoint segments"""
     g_in = anm['input']
     g_l3conn = anm.add_overlay("l3_conn")
     g_l3conn.add_nodes_from(
@@ -370,12 +381,10 @@ def build_l3_connectivity(anm):
     g_l3conn.add_edges_from(g_in.edges())
 
     ank_utils.aggregate_nodes(g_l3conn, g_l3conn.switches())
-    exploded_edges = ank_utils.explode_nodes(g_l3conn,
-                                             g_l3conn.switches())
-    for edge in exploded_edges:
-        edge.multipoint = True
-        edge.src_int.multipoint = True
-        edge.dst_int.multipoint = True
+    segments = ank_utils.multipoint_nodes(g_l3conn, g_l3conn.switches())
+    for segment in segments:
+        for interface in segment.interfaces():
+            interface.multipoint = True
 
 
 @call_log
@@ -15,7 +15,10 @@ def build_ibgp_v4(anm):
     ipv4_nodes = set(g_phy.routers("use_ipv4"))
     g_ibgpv4.add_nodes_from((n for n in g_bgp if n in ipv4_nodes),
             retain = ["ibgp_role", "hrr_cluster", "rr_cluster"] )
-    g_ibgpv4.add_edges_from(g_bgp.edges(type="ibgp"), retain="direction")
+    g_ibgpv4.add_edges_from(g_bgp.edges(type="ibgp", segments=False),
+            retain="direction")
+    g_ibgpv4.add_segments_from((s for s in g_bgp.segments()
+            if s.type == "ibgp"), retain="direction")
 
 @call_log
 def build_ibgp_v6(anm):
@@ -28,7 +31,10 @@ def build_ibgp_v6(anm):
     ipv6_nodes = set(g_phy.routers("use_ipv6"))
     g_ibgpv6.add_nodes_from((n for n in g_bgp if n in ipv6_nodes),
             retain = ["ibgp_role", "hrr_cluster", "rr_cluster"] )
-    g_ibgpv6.add_edges_from(g_bgp.edges(type="ibgp"), retain="direction")
+    g_ibgpv6.add_edges_from(g_bgp.edges(type="ibgp", segments=False),
+            retain="direction")
+    g_ibgpv6.add_segments_from((s for s in g_bgp.segments()
+            if s.type == "ibgp"), retain="direction")
 
 @call_log
 def build_ebgp_v4(anm):
@@ -36,20 +42,20 @@ def build_ebgp_v4(anm):
     # TODO: build from design rules, currently just builds from ibgp links in bgp layer
     g_ebgp = anm['ebgp']
     g_phy = anm['phy']
-    g_ebgpv4 = anm.add_overlay("ebgp_v4", directed=True)
     ipv4_nodes = set(g_phy.routers("use_ipv4"))
-    g_ebgpv4.add_nodes_from(n for n in g_ebgp if n in ipv4_nodes)
-    g_ebgpv4.add_edges_from(g_ebgp.edges(), retain="direction")
+    # sessions between IPv4 nodes, shared with the ebgp overlay
+    anm.add_overlay_view("ebgp_v4", "ebgp",
+            (n for n in g_ebgp if n in ipv4_nodes))
 
 def build_ebgp_v6(anm):
     #TODO: remove the bgp layer and have just ibgp and ebgp
     # TODO: build from design rules, currently just builds from ibgp links in bgp layer
     g_ebgp = anm['ebgp']
     g_phy = anm['phy']
-    g_ebgpv6 = anm.add_overlay("ebgp_v6", directed=True)
     ipv6_nodes = set(g_phy.routers("use_ipv6"))
-    g_ebgpv6.add_nodes_from(n for n in g_ebgp if n in ipv6_nodes)
-    g_ebgpv6.add_edges_from(g_ebgp.edges(), retain="direction")
+    # sessions between IPv6 nodes, shared with the ebgp overlay
+    anm.add_overlay_view("ebgp_v6", "ebgp",
+            (n for n in g_ebgp if n in ipv6_nodes))
 
 
 @call_log
@@ -61,8 +67,9 @@ def build_ebgp(anm):
     ebgp_edges = [e for e in g_in.edges() if e.src.asn != e.dst.asn]
     g_ebgp.add_edges_from(ebgp_edges, bidirectional=True, type='ebgp')
 
-    ebgp_switches = [n for n in g_in.switches()
-            if not ank_utils.neigh_equal(g_phy, n, "asn")]
+    switches = list(g_in.switches())
+    ebgp_switches = [n for (n, equal) in zip(switches,
+            ank_utils.neigh_equals(g_phy, switches, "asn")) if not equal]
     g_ebgp.add_nodes_from(ebgp_switches, retain=['asn'])
     g_ebgp.log.debug("eBGP switches are %s" % ebgp_switches)
     g_ebgp.add_edges_from((e for e in g_in.edges()
@@ -72,16 +79,177 @@ def build_ebgp(anm):
     # need to recalculate as may have aggregated
     ebgp_switches = list(g_ebgp.switches())
     g_ebgp.log.debug("aggregated eBGP switches are %s" % ebgp_switches)
-    exploded_edges = ank_utils.explode_nodes(g_ebgp, ebgp_switches)
-    same_asn_edges = []
-    for edge in exploded_edges:
-        if edge.src.asn == edge.dst.asn:
-            same_asn_edges.append(edge)
-        else:
-            edge.multipoint = True
+    # sessions across the switch only between different ASNs
+    ank_utils.multipoint_nodes(g_ebgp, ebgp_switches, group_attr="asn")
     """TODO: remove up to here once compiler updated"""
 
-    g_ebgp.remove_edges_from(same_asn_edges)
+
+# reflectors per cluster, so clients keep a session if one fails
+RR_REDUNDANCY = 2
+
+
+def _phy_order(graph, members, routers, degree):
+    """Returns routers in breadth-first order over the phy graph
+    restricted to members (the nodes of the AS, including switches), so
+    routers close in the topology are close in the order. Each search
+    starts from the highest degree router not yet reached"""
+
+    order = []
+    visited = set()
+    starts = sorted(routers, key=lambda n: -degree[n])  # stable
+    for start in starts:
+        if start in visited:
+            continue
+        visited.add(start)
+        queue = [start]
+        for node in queue:  # queue grows as nodes are reached
+            if node in degree:
+                order.append(node)
+            for neigh in graph.neighbors(node):
+                if neigh in members and neigh not in visited:
+                    visited.add(neigh)
+                    queue.append(neigh)
+    return order
+
+
+def _split(nodes, size):
+    """Splits nodes into consecutive chunks of at most size, of even
+    length"""
+
+    count = -(-len(nodes) // size)
+    return [nodes[index * len(nodes) // count:
+                  (index + 1) * len(nodes) // count]
+            for index in range(count)]
+
+
+def _rr_hierarchy(graph, members, routers, pops, max_sessions):
+    """Returns {node_id: (ibgp_role, rr_cluster, hrr_cluster)} for
+    routers (node ids) of an AS, so that each has at most max_sessions
+    iBGP sessions where the AS allows it"""
+
+    redundancy = RR_REDUNDANCY
+    degree = dict((node, sum(1 for neigh in graph.neighbors(node)
+                             if neigh in members)) for node in routers)
+    order = _phy_order(graph, members, routers, degree)
+    rank = dict((node, index) for (index, node) in enumerate(order))
+    by_degree = lambda nodes: sorted(nodes,
+                                     key=lambda n: (-degree[n], rank[n]))
+
+    pop_routers = {}
+    pop_order = []
+    for node in order:
+        pop = pops.get(node)
+        if pop not in pop_routers:
+            pop_routers[pop] = []
+            pop_order.append(pop)
+        pop_routers[pop].append(node)
+
+    def clusters_of(size):
+        """Routers of each PoP, split into connected parts of size"""
+        clusters = []
+        for pop in pop_order:
+            name = "cluster" if pop is None else pop
+            for (index, nodes) in enumerate(_split(pop_routers[pop], size)):
+                clusters.append(("%s_%s" % (name, index + 1), nodes))
+        return clusters
+
+    reflectors = lambda clusters: sum(min(len(nodes), redundancy)
+                                      for (_, nodes) in clusters)
+
+    # two levels: RRs for each cluster, in a full mesh with each other.
+    # An RR has sessions to the other RRs and to its clients
+    for size in range(max_sessions + 1, redundancy, -1):
+        clusters = clusters_of(size)
+        largest = max(len(nodes) for (_, nodes) in clusters)
+        if reflectors(clusters) - 1 + largest - redundancy <= max_sessions:
+            result = {}
+            for (cluster, nodes) in clusters:
+                nodes = by_degree(nodes)
+                for node in nodes[:redundancy]:
+                    result[node] = ("RR", cluster, None)
+                for node in nodes[redundancy:]:
+                    result[node] = ("RRC", cluster, None)
+            return result
+
+    # three levels: HRRs for each cluster, with sessions up to the RRs
+    # and down to its clients, and RRs for groups of consecutive clusters
+    clusters = clusters_of(max(max_sessions, redundancy + 1))
+    rr_sessions = lambda per_group: (redundancy
+        * -(-len(clusters) // per_group) - 1 + redundancy * per_group)
+    per_group = min(range(1, len(clusters) + 1), key=rr_sessions)
+    if rr_sessions(per_group) > max_sessions:
+        log.warning("Route reflectors have up to %s iBGP sessions: AS is "
+                    "too large for a limit of %s" % (rr_sessions(per_group),
+                                                     max_sessions))
+
+    result = {}
+    for (index, group) in enumerate(_split(clusters, per_group)):
+        rr_cluster = "rr_%s" % (index + 1)
+        rrs = by_degree(node for (_, nodes) in group for node in nodes)
+        rrs = set(rrs[:redundancy])
+        for node in rrs:
+            result[node] = ("RR", rr_cluster, None)
+        for (cluster, nodes) in group:
+            nodes = by_degree(n for n in nodes if n not in rrs)
+            for node in nodes[:redundancy]:
+                result[node] = ("HRR", rr_cluster, cluster)
+            for node in nodes[redundancy:]:
+                result[node] = ("RRC", None, cluster)
+    return result
+
+
+@call_log
+def build_ibgp_hierarchy(anm):
+    """Chooses route reflectors for ASes too large for an iBGP full mesh
+    within ibgp_max_sessions sessions per router, if set on the input
+    graph. Sets ibgp_role, ibgp_l3_cluster and ibgp_l2_cluster on the
+    input routers, for build_ibgp. ASes with any of these already set
+    are left as designed.
+
+    Routers are clustered by pop, split into parts connected in phy,
+    and the highest degree routers of each cluster reflect for it. The
+    cluster reflectors are RRs, or HRRs below a further level of RRs if
+    the RRs would exceed the limit. Each client has a session to each
+    of the RR_REDUNDANCY reflectors of its cluster, so sessions grow
+    linearly with the size of the AS"""
+
+    g_in = anm['input']
+    g_phy = anm['phy']
+    max_sessions = g_in.data.ibgp_max_sessions
+    if not max_sessions:
+        return
+    max_sessions = int(max_sessions)
+
+    graph = ank_utils.unwrap_graph(g_phy)
+    as_members = {}
+    for (node, data) in graph.nodes_iter(data=True):
+        as_members.setdefault(data.get('asn'), set()).add(node)
+
+    for asn, asn_devices in ank_utils.groupby("asn", g_in.routers()):
+        asn_devices = [n for n in asn_devices
+                       if n.ibgp_role != "Disabled" and n in g_phy]
+        if len(asn_devices) - 1 <= max_sessions:
+            continue  # full mesh is within the limit
+        if any(n.ibgp_role is not None or n.ibgp_l3_cluster is not None
+               or n.ibgp_l2_cluster is not None for n in asn_devices):
+            log.debug("iBGP hierarchy for ASN%s is set, not generating"
+                      % asn)
+            continue
+
+        routers = [n.node_id for n in asn_devices]
+        pops = dict((n.node_id, n.pop) for n in asn_devices)
+        hierarchy = _rr_hierarchy(graph, as_members.get(asn, ()), routers,
+                                  pops, max_sessions)
+        for node in asn_devices:
+            (role, rr_cluster, hrr_cluster) = hierarchy[node.node_id]
+            node.ibgp_role = role
+            node.ibgp_l3_cluster = rr_cluster
+            node.ibgp_l2_cluster = hrr_cluster
+
+        roles = [role for (role, _, _) in hierarchy.values()]
+        log.info("Generated iBGP hierarchy for ASN%s: %s RRs, %s HRRs, "
+                 "%s RRCs" % (asn, roles.count("RR"), roles.count("HRR"),
+                              roles.count("RRC")))
 
 
 @call_log
@@ -92,9 +260,9 @@ def build_ibgp(anm):
 
     #TODO: build direct to ibgp graph - can construct combined bgp for vis
 
-    ank_utils.copy_attr_from(g_in, g_bgp, "ibgp_role")
-    ank_utils.copy_attr_from(g_in, g_bgp, "ibgp_l2_cluster", "hrr_cluster", default = None)
-    ank_utils.copy_attr_from(g_in, g_bgp, "ibgp_l3_cluster", "rr_cluster", default = None)
+    ank_utils.copy_attr_from(g_in, g_bgp,
+        ["ibgp_role", "ibgp_l2_cluster", "ibgp_l3_cluster"],
+        ["ibgp_role", "hrr_cluster", "rr_cluster"], default = None)
 
     #TODO: add more detailed logging
 
@@ -124,7 +292,6 @@ def build_ibgp(anm):
         rrcs = [n for n in asn_devices if n.ibgp_role == "RRC"]
 
 
-        over_links = []
         up_links = []
         down_links = []
 
@@ -140,15 +307,14 @@ def build_ibgp(anm):
 
         # 1. Peers:
         # 1a. Peers connect over to peers
-        over_links += [(s,t) for s in peers for t in peers]
         # 1b. Peers connect over to RRs
-        over_links += [(s,t) for s in peers for t in rrs]
-
         # 2. RRs:
         # 2a. RRs connect over to Peers
-        over_links += [(s,t) for s in rrs for t in peers]
         # 2b. RRs connect over to RRs
-        over_links += [(s,t) for s in rrs for t in rrs]
+        # Together a full mesh of peers and RRs: held as a segment (a peer
+        # group) on their loopbacks, rather than an edge per session
+        over_group = [(n.node_id, 0) for n in peers + rrs]
+
         # 2c. RRs connect down to RRCs in same rr_cluster
         down_links += [(s,t) for s in rrs for t in rrcs
             if s.rr_cluster == t.rr_cluster != None]
@@ -175,11 +341,11 @@ def build_ibgp(anm):
             and s.rr_cluster is None]
 
         # Remove self-links
-        over_links = [(s,t) for s,t in over_links if s!=t]
         up_links = [(s,t) for s,t in up_links if s!=t]
         down_links = [(s,t) for s,t in down_links if s!=t]
 
-        g_bgp.add_edges_from(over_links, type='ibgp', direction='over')
+        g_bgp.add_segment("ibgp_%s" % asn, over_group, type='ibgp',
+                direction='over')
         g_bgp.add_edges_from(up_links, type='ibgp', direction='up')
         g_bgp.add_edges_from(down_links, type='ibgp', direction='down')
 
@@ -199,53 +365,41 @@ def build_bgp(anm):
     build_ebgp_v6(anm)
 
     """TODO: remove from here once compiler updated"""
+    # eBGP sessions as built for the ebgp overlay, to add iBGP to
+    g_ebgp = anm['ebgp']
     g_bgp = anm.add_overlay("bgp", directed=True)
     g_bgp.add_nodes_from(g_in.routers())
-    ebgp_edges = [edge for edge in g_in.edges()
-        if edge.src.asn != edge.dst.asn]
-    g_bgp.add_edges_from(ebgp_edges, bidirectional=True, type='ebgp')
-
-    ebgp_switches = [n for n in g_in.switches()
-            if not ank_utils.neigh_equal(g_phy, n, "asn")]
-    g_bgp.add_nodes_from(ebgp_switches, retain=['asn'])
-    log.debug("eBGP switches are %s" % ebgp_switches)
-    g_bgp.add_edges_from((e for e in g_in.edges()
-            if e.src in ebgp_switches or e.dst in ebgp_switches), bidirectional=True, type='ebgp')
-    ank_utils.aggregate_nodes(g_bgp, ebgp_switches)
-    ebgp_switches = list(g_bgp.switches()) # need to recalculate as may have aggregated
-    log.debug("aggregated eBGP switches are %s" % ebgp_switches)
-    exploded_edges = ank_utils.explode_nodes(g_bgp, ebgp_switches)
-
-    same_asn_edges = []
-    for edge in exploded_edges:
-        if edge.src.asn == edge.dst.asn:
-            same_asn_edges.append(edge)
-        else:
-            edge.multipoint = True
+    g_bgp.add_edges_bulk((src, dst, dict(data,
+            _interfaces=dict(data['_interfaces'])))
+        for (src, dst, data)
+        in ank_utils.unwrap_graph(g_ebgp).edges_iter(data=True))
+    g_bgp.add_segments_from(g_ebgp.segments(), retain="multipoint")
     """TODO: remove up to here once compiler updated"""
     ank_utils.copy_attr_from(g_in, g_bgp, "custom_config_bgp", dst_attr="custom_config")
 
-    g_bgp.remove_edges_from(same_asn_edges)
-
 
+    build_ibgp_hierarchy(anm)
     build_ibgp(anm)
 
     ebgp_nodes = [d for d in g_bgp if any(
-        edge.type == 'ebgp' for edge in d.edges())]
+        edge.type == 'ebgp' for edge in d.edges(segments=False))]
     g_bgp.update(ebgp_nodes, ebgp=True)
 
     for ebgp_edge in g_bgp.edges(type = "ebgp"):
         for interface in ebgp_edge.interfaces():
             interface.ebgp = True
 
-    for edge in g_bgp.edges(type='ibgp'):
+    # sessions in the full mesh segments are bound to interface zero
+    for edge in g_bgp.edges(type='ibgp', segments=False):
         # TODO: need interface querying/selection. rather than hard-coded ids
         edge.bind_interface(edge.src, 0)
 
     #TODO: need to initialise interface zero to be a loopback rather than physical type
     for node in g_bgp:
         for interface in node.interfaces():
-            interface.multipoint = any(e.multipoint for e in interface.edges())
+            interface.multipoint = (any(e.multipoint
+                for e in interface.edges(segments=False))
+                or any(s.multipoint for s in interface.segments()))
 
     build_ibgp_v4(anm)
     build_ibgp_v6(anm)
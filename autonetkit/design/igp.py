@@ -3,7 +3,116 @@ import autonetkit.ank as ank_utils
 
 from autonetkit.ank_utils import call_log
 
-#TODO: extract the repeated code and use the layer2  and layer3 graphs
+try:
+    import numpy
+except ImportError:
+    numpy = None  # optional: OSPF areas are allocated in a Python loop
+
+@call_log
+def build_layer3_igp(anm):
+    """Build the intra-AS layer3 overlay the IGP overlays are derived from:
+    layer3 without inter-AS links, and with segments split by AS.
+    Internal, so not exported: built on first use by an IGP builder, and
+    again after layer3 is replaced"""
+    g_l3 = anm['layer3']
+    g_l3_igp = anm.add_overlay("layer3_igp", derived_from="layer3")
+    g_l3_igp.add_nodes_from(g_l3)
+    g_l3_igp.add_edges_from(link for link in g_l3.edges(segments=False)
+                            if link.src.asn == link.dst.asn)
+    g_l3_igp.add_segments_from(g_l3.segments())
+    ank_utils.copy_int_attr_from(g_l3, g_l3_igp, "multipoint")
+    ank_utils.split_segments(g_l3_igp, "asn")
+    return g_l3_igp
+
+def _add_igp_overlay(anm, overlay_id):
+    """Adds overlay_id with the nodes, edges and segments of layer3_igp.
+    Interfaces are shared with layer3_igp copy-on-write, so the overlay
+    only stores the protocol attributes set on it. Edges have their own
+    interface map"""
+    if not anm.has_overlay("layer3_igp"):
+        build_layer3_igp(anm)
+    g_l3_igp = anm['layer3_igp']
+    graph = ank_utils.unwrap_graph(g_l3_igp)
+    # added in layer3 order, as when added from layer3, for the same order
+    graph_l3 = ank_utils.unwrap_graph(anm['layer3'])
+
+    overlay = anm.add_overlay(overlay_id, parent="layer3_igp")
+    overlay.add_nodes_bulk((node_id, {}) for node_id in graph_l3
+                           if node_id in graph)
+    overlay.add_edges_bulk((src, dst, {'_interfaces': dict(graph[src][dst][
+        '_interfaces'])}) for (src, dst) in graph_l3.edges_iter()
+        if graph.has_edge(src, dst))
+    overlay.add_segments_from(g_l3_igp.segments())
+    return overlay
+
+def _map_link_attrs(overlay, attrs):
+    """Sets attrs of the interfaces of each edge and segment of overlay
+    to those of the link"""
+    graph = ank_utils.unwrap_graph(overlay)
+    values = []
+    for (src, dst, data) in graph.edges_iter(data=True):
+        link_values = [(attr, data.get(attr)) for attr in attrs]
+        values.extend((node, interface_id, link_values) for
+            (node, interface_id) in data['_interfaces'].items())
+    for segment in overlay.segments():
+        link_values = [(attr, segment.get(attr)) for attr in attrs]
+        values.extend((interface.node_id, interface.interface_id,
+                       link_values) for interface in segment.interfaces())
+    ank_utils.set_int_attrs(overlay, values)
+
+def _cast_ospf_area(area, default_area):
+    """Returns (area, valid) for an OSPF area from the input: an int, an
+    IPAddress, or default_area if unset or invalid"""
+    import netaddr
+    if not area or area == "None":
+        return (default_area, True)
+    try:
+        return (int(area), True)
+    except ValueError:
+        try:
+            return (netaddr.IPAddress(area), True)
+        except netaddr.core.AddrFormatError:
+            return (default_area, False)
+
+def _ospf_area_key(area):
+    """Sort key for OSPF areas: by area number, then ints before
+    IPAddresses, so 0 sorts before 0.0.0.0"""
+    return (int(area), not isinstance(area, int))
+
+def _ospf_link_codes(first, second, zero):
+    """Returns the area code of links between routers with area codes
+    first and second (arrays, first the router seen first), or -1 for
+    links between different non-backbone areas. zero is whether each
+    code is a backbone area: a link is in the area of both its routers,
+    else the non-backbone area of the two. A link between 0 and 0.0.0.0
+    is in the area of the router seen first"""
+    if numpy is None:
+        return [a if zero[b] or a == b else (b if zero[a] else -1)
+                for (a, b) in zip(first, second)]
+
+    zero = numpy.array(zero, dtype=bool)
+    return numpy.where(zero[second] | (first == second), first,
+                       numpy.where(zero[first], second, -1))
+
+def _router_link_codes(rows, codes, count):
+    """Returns, for each of count routers, the distinct codes of its
+    links in the order first seen, from a (row, code) entry per link"""
+    result = [[] for _ in range(count)]
+    if numpy is None:
+        seen = set()
+        for entry in zip(rows, codes):
+            if entry not in seen:
+                seen.add(entry)
+                result[entry[0]].append(entry[1])
+        return result
+
+    size = int(codes.max()) + 2 if len(codes) else 1
+    (keys, first_index) = numpy.unique(numpy.array(rows) * size + codes + 1,
+                                       return_index=True)
+    for key in keys[numpy.argsort(first_index)].tolist():
+        (row, code) = divmod(key, size)
+        result[row].append(code - 1)
+    return result
 
 @call_log
 def build_ospf(anm):
@@ -22,7 +131,6 @@ def build_ospf(anm):
     """
     import netaddr
     g_in = anm['input']
-    g_l3 = anm['layer3']
     # add regardless, so allows quick check of node in anm['ospf'] in compilers
     g_ospf = anm.add_overlay("ospf")
     if not anm['phy'].data.enable_routing:
@@ -33,107 +141,149 @@ def build_ospf(anm):
         g_ospf.log.debug("No OSPF nodes")
         return
 
-    g_ospf.add_nodes_from(g_l3)
-    g_ospf.add_edges_from(g_l3.edges())
-    ank_utils.copy_int_attr_from(g_l3, g_ospf, "multipoint")
+    g_ospf = _add_igp_overlay(anm, "ospf")  # intra-AS links only
 
-    ank_utils.copy_attr_from(g_in, g_ospf, "ospf_area", dst_attr="area")
+    ank_utils.copy_attr_from(g_in, g_ospf, ["ospf_area", "custom_config_ospf"],
+        dst_attr=["area", "custom_config"])
     ank_utils.copy_edge_attr_from(g_in, g_ospf, "ospf_cost",
         dst_attr="cost",  type=int, default = 1)
-    ank_utils.copy_attr_from(g_in, g_ospf, "custom_config_ospf", dst_attr="custom_config")
 
-    g_ospf.remove_edges_from([link for link in g_ospf.edges(
-    ) if link.src.asn != link.dst.asn])  # remove inter-AS links
+    graph = ank_utils.unwrap_graph(g_ospf)
+    routers = graph.nodes()
 
     area_zero_ip = netaddr.IPAddress("0.0.0.0")
     area_zero_int = 0
     area_zero_ids = {area_zero_ip, area_zero_int}
     default_area = area_zero_int
-    if any(router.area == "0.0.0.0" for router in g_ospf):
+    input_areas = [graph.node[router].get("area") for router in routers]
+    if "0.0.0.0" in input_areas:
         # string comparison as hasn't yet been cast to IPAddress
         default_area = area_zero_ip
 
-
-    for router in g_ospf:
-        if not router.area or router.area == "None":
-            router.area = default_area
-            # check if 0.0.0.0 used anywhere, if so then use 0.0.0.0 as format
-        else:
-            try:
-                router.area = int(router.area)
-            except ValueError:
-                try:
-                    router.area = netaddr.IPAddress(router.area)
-                except netaddr.core.AddrFormatError:
-                    router.log.warning("Invalid OSPF area %s. Using default"
-                                " of %s" % (router.area, default_area))
-                    router.area = default_area
+    # each distinct area is cast once, and given an integer code: areas are
+    # compared by code, with 0 and 0.0.0.0 distinct
+    cast = {}
+    area_codes = {}
+    router_codes = []
+    for (router, area) in zip(routers, input_areas):
+        if area not in cast:
+            cast[area] = _cast_ospf_area(area, default_area)
+        (value, valid) = cast[area]
+        if not valid:
+            g_ospf.node(router).log.warning("Invalid OSPF area %s. Using"
+                " default of %s" % (area, default_area))
+        router_codes.append(area_codes.setdefault(value, len(area_codes)))
+    area_values = sorted(area_codes, key=area_codes.get)
+    zero = [value in area_zero_ids for value in area_values]
+    router_areas = [area_values[code] for code in router_codes]
+    g_ospf.set_node_attrs("area", router_areas)
 
     #TODO: use interfaces throughout, rather than edges
-    for router in g_ospf:
-# and set area on interface
-        for edge in router.edges():
-            if edge.area:
-                continue  # allocated (from other "direction", as undirected)
-            if router.area == edge.dst.area:
-                edge.area = router.area  # intra-area
-                continue
-
-            if router.area in area_zero_ids or edge.dst.area in area_zero_ids:
-# backbone to other area
-                if router.area in area_zero_ids:
-                    # router in backbone, use other area
-                    edge.area = edge.dst.area
-                else:
-                    # router not in backbone, use its area
-                    edge.area = router.area
-
-    for router in g_ospf:
-        areas = {edge.area for edge in router.edges()}
-        router.areas = list(areas)  # edges router participates in
+    # links are allocated an area from the routers' codes, by the order
+    # routers are seen in: for all links, then for each router's links
+    rank = dict((router, row) for (row, router) in enumerate(routers))
+    edges = graph.edges()
+    ends = [sorted((rank[src], rank[dst])) for (src, dst) in edges]
+    rows = []
+    neighbors = []
+    for (row, router) in enumerate(routers):
+        for neighbor in graph.adj[router]:
+            rows.append(row)
+            neighbors.append(rank[neighbor])
+    if numpy is not None:
+        router_codes = numpy.array(router_codes, dtype=int)
+        ends = numpy.array(ends, dtype=int).reshape(-1, 2)
+        (rows, neighbors) = (numpy.array(rows, dtype=int),
+                             numpy.array(neighbors, dtype=int))
+        edge_codes = _ospf_link_codes(router_codes[ends[:, 0]],
+                                      router_codes[ends[:, 1]], zero)
+        link_codes = _ospf_link_codes(
+            router_codes[numpy.minimum(rows, neighbors)],
+            router_codes[numpy.maximum(rows, neighbors)], zero)
+    else:
+        edge_codes = _ospf_link_codes([router_codes[a] for (a, _) in ends],
+                                      [router_codes[b] for (_, b) in ends],
+                                      zero)
+        link_codes = _ospf_link_codes(
+            [router_codes[min(a, b)] for (a, b) in zip(rows, neighbors)],
+            [router_codes[max(a, b)] for (a, b) in zip(rows, neighbors)],
+            zero)
+    allocated = [(edge, code) for (edge, code) in zip(edges, edge_codes)
+                 if code >= 0]
+    g_ospf.set_edge_attrs("area", [area_values[code] for (_, code)
+                                   in allocated], [e for (e, _) in allocated])
+
+    # a segment is in one area: as for edges, the area of its members, or
+    # the non-backbone area for backbone members. Ties (0 and 0.0.0.0, or
+    # several non-backbone areas) go to the lowest area
+    segment_areas = {}
+    for segment in g_ospf.segments():
+        member_areas = {node.area for node in segment}
+        non_backbone_areas = member_areas - area_zero_ids
+        if len(non_backbone_areas) == 1:
+            segment.area = non_backbone_areas.pop()
+        elif not non_backbone_areas:
+            segment.area = min(member_areas, key=_ospf_area_key)
+        else:
+            segment.area = min(non_backbone_areas, key=_ospf_area_key)
+            g_ospf.log.warning("Segment %s spans multiple areas but is not"
+                " a member of area 0. Using area %s" % (
+                    sorted(str(node) for node in segment), segment.area))
+        for node in segment:
+            segment_areas.setdefault(node.node_id, set()).add(segment.area)
+
+    router_types = []
+    router_area_lists = []
+    for (router, area, codes) in zip(routers, router_areas,
+            _router_link_codes(rows, link_codes, len(routers))):
+        areas = {area_values[code] if code >= 0 else None
+                 for code in codes}
+        areas |= segment_areas.get(router, set())
+        router_area_lists.append(list(areas))  # edges router participates in
 
         if len(areas) in area_zero_ids:
-            router.type = "backbone"  # no ospf edges (eg single node in AS)
+            router_type = "backbone"  # no ospf edges (eg single node in AS)
         elif len(areas) == 1:
             # single area: either backbone (all 0) or internal (all nonzero)
             if len(areas & area_zero_ids):
                 # intersection has at least one element -> router has area zero
-                router.type = "backbone"
+                router_type = "backbone"
             else:
-                router.type = "internal"
+                router_type = "internal"
 
         else:
             # multiple areas
             if len(areas & area_zero_ids):
                 # intersection has at least one element -> router has area zero
-                router.type = "backbone ABR"
-            elif router.area in area_zero_ids:
-                router.log.debug("Router belongs to area %s but has no area zero interfaces" %(router.area))
-                router.type = "backbone ABR"
+                router_type = "backbone ABR"
+            elif area in area_zero_ids:
+                g_ospf.node(router).log.debug("Router belongs to area %s but has no area zero interfaces" %(area))
+                router_type = "backbone ABR"
             else:
-                router.log.warning("spans multiple areas but is not a member of area 0")
-                router.type = "INVALID"
+                g_ospf.node(router).log.warning("spans multiple areas but is not a member of area 0")
+                router_type = "INVALID"
+        router_types.append(router_type)
+
+    g_ospf.set_node_attrs("areas", router_area_lists)
+    g_ospf.set_node_attrs("type", router_types)
 
-    if (any(area_zero_int in router.areas for router in g_ospf) and
-            any(area_zero_ip in router.areas for router in g_ospf)):
-        router.log.warning("Using both area 0 and area 0.0.0.0")
+    if (any(area_zero_int in areas for areas in router_area_lists) and
+            any(area_zero_ip in areas for areas in router_area_lists)):
+        g_ospf.node(routers[-1]).log.warning("Using both area 0 and area 0.0.0.0")
 
-    for link in g_ospf.edges():
-        if not link.cost:
-            link.cost = 1
+    g_ospf.set_edge_attrs("cost", 1, [(src, dst) for (src, dst) in edges
+                                      if not graph[src][dst].get("cost")])
+    for segment in g_ospf.segments():
+        if not segment.cost:
+            segment.cost = 1
 
     # map areas and costs onto interfaces
     #TODO: later map them directly rather than with edges - this is part of the transition
-    for edge in g_ospf.edges():
-        for interface in edge.interfaces():
-            interface.cost = edge.cost
-            interface.area = edge.area
-            interface.multipoint = edge.multipoint
+    _map_link_attrs(g_ospf, ["cost", "area", "multipoint"])
 
-    for router in g_ospf:
-        router.loopback_zero.area = router.area
-        router.loopback_zero.cost = 0
-        router.process_id = router.asn
+    ank_utils.set_int_attrs(g_ospf, ((router, 0, [("area", area),
+        ("cost", 0)]) for (router, area) in zip(routers, router_areas)))
+    g_ospf.set_node_attrs("process_id", g_ospf.get_node_attrs("asn"))
 
 @call_log
 def ip_to_net_ent_title_ios(ip_addr):
@@ -162,7 +312,6 @@ def build_eigrp(anm):
     """Build eigrp overlay"""
     g_in = anm['input']
     # add regardless, so allows quick check of node in anm['isis'] in compilers
-    g_l3 = anm['layer3']
     g_eigrp = anm.add_overlay("eigrp")
 
     if not anm['phy'].data.enable_routing:
@@ -172,39 +321,27 @@ def build_eigrp(anm):
     if not any(n.igp == "eigrp" for n in g_in):
         log.debug("No EIGRP nodes")
         return
-    g_eigrp.add_nodes_from(g_l3)
-    g_eigrp.add_edges_from(g_l3.edges())
-    ank_utils.copy_int_attr_from(g_l3, g_eigrp, "multipoint")
+    g_eigrp = _add_igp_overlay(anm, "eigrp")  # intra-AS links only
 
     ank_utils.copy_attr_from(g_in, g_eigrp, "custom_config_eigrp", dst_attr="custom_config")
 
-# Merge and explode switches
+# Merge switches into multipoint segments
     ank_utils.aggregate_nodes(g_eigrp, g_eigrp.switches())
-    exploded_edges = ank_utils.explode_nodes(g_eigrp,
-        g_eigrp.switches())
-    for edge in exploded_edges:
-        edge.multipoint = True
+    ank_utils.multipoint_nodes(g_eigrp, g_eigrp.switches())
 
-    g_eigrp.remove_edges_from(
-        [link for link in g_eigrp.edges() if link.src.asn != link.dst.asn])
+    g_eigrp.set_node_attrs("process_id", g_eigrp.get_node_attrs("asn"))
 
-    for node in g_eigrp:
-        node.process_id = node.asn
+    g_eigrp.set_edge_attrs("metric", 1)  # default
+    for segment in g_eigrp.segments():
+        segment.metric = 1
 
-    for link in g_eigrp.edges():
-        link.metric = 1  # default
-
-    for edge in g_eigrp.edges():
-        for interface in edge.interfaces():
-            interface.metric = edge.metric
-            interface.multipoint = edge.multipoint
+    _map_link_attrs(g_eigrp, ["metric", "multipoint"])
 
 @call_log
 def build_isis(anm):
     """Build isis overlay"""
     g_in = anm['input']
     # add regardless, so allows quick check of node in anm['isis'] in compilers
-    g_l3 = anm['layer3']
     g_isis = anm.add_overlay("isis")
 
     if not anm['phy'].data.enable_routing:
@@ -215,25 +352,18 @@ def build_isis(anm):
         g_isis.log.debug("No ISIS nodes")
         return
 
-    g_isis.add_nodes_from(g_l3)
-    g_isis.add_edges_from(g_l3.edges())
-    ank_utils.copy_int_attr_from(g_l3, g_isis, "multipoint")
+    g_isis = _add_igp_overlay(anm, "isis")  # intra-AS links only
 
     g_ipv4 = anm['ipv4']
     ank_utils.copy_attr_from(g_in, g_isis, "custom_config_isis", dst_attr="custom_config")
 
-    g_isis.remove_edges_from(
-        [link for link in g_isis.edges() if link.src.asn != link.dst.asn])
-
     for node in g_isis.routers():
         ip_node = g_ipv4.node(node)
         node.net = ip_to_net_ent_title_ios(ip_node.loopback)
         node.process_id = node.asn
 
-    for link in g_isis.edges():
-        link.metric = 1  # default
+    g_isis.set_edge_attrs("metric", 1)  # default
+    for segment in g_isis.segments():
+        segment.metric = 1
 
-    for edge in g_isis.edges():
-        for interface in edge.interfaces():
-            interface.metric = edge.metric
-            interface.multipoint = edge.multipoint
+    _map_link_attrs(g_isis, ["metric", "multipoint"])
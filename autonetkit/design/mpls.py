@@ -25,12 +25,14 @@ def mpls_te(anm):
 
     # build up edge list sequentially, to provide meaningful messages for multipoint links
 
-    multipoint_edges = [e for e in g_l3.edges() if e.multipoint]
+    multipoint_edges = [e for e in g_l3.edges(segments=False)
+                        if e.multipoint]
+    multipoint_edges += g_l3.segments()
     if len(multipoint_edges):
         log.info('Excluding multi-point edges from MPLS TE topology: %s'
            % ', '.join(str(e) for e in multipoint_edges))
 
-    edges_to_add = set(g_l3.edges()) - set(multipoint_edges)
+    edges_to_add = set(g_l3.edges(segments=False)) - set(multipoint_edges)
     g_mpls_te.add_edges_from(edges_to_add)
 
 
@@ -154,7 +156,10 @@ def build_ibgp_vpn_v4(anm):
     ibgp_vpn_v4_nodes = (n for n in ibgp_v4_nodes
             if n not in ce_nodes)
     g_ibgp_vpn_v4.add_nodes_from(ibgp_vpn_v4_nodes, retain = ["ibgp_role"])
-    g_ibgp_vpn_v4.add_edges_from(g_ibgp_v4.edges(), retain = "direction")
+    g_ibgp_vpn_v4.add_edges_from(g_ibgp_v4.edges(segments=False),
+            retain = "direction")
+    g_ibgp_vpn_v4.add_segments_from(g_ibgp_v4.segments(),
+            retain = "direction")
 
     for node in g_ibgp_vpn_v4:
         if node.ibgp_role in ("HRR", "RR"):
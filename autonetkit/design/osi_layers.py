@@ -26,18 +26,20 @@ def build_layer2_broadcast(anm):
         split_created_nodes = list(ank_utils.split(g_l2_bc, edges_to_split,
                                    retain=['split'],
                                    id_prepend='cd_'))
-        for node in split_created_nodes:
-            node['graphics'].x = ank_utils.neigh_average(g_l2_bc, node, 'x',
-                    g_graphics) + 0.1
+        neighbors = ank_utils.neigh_adjacency(g_l2_bc, split_created_nodes)
+        xs = ank_utils.neigh_averages(g_l2_bc, neighbors, 'x', g_graphics)
+        ys = ank_utils.neigh_averages(g_l2_bc, neighbors, 'y', g_graphics)
+        asns = ank_utils.neigh_most_frequents(g_l2_bc, neighbors, 'asn',
+                g_phy)  # arbitrary choice
+        for (node, x, y, asn) in zip(split_created_nodes, xs, ys, asns):
+            node['graphics'].x = x + 0.1
 
              # temporary fix for gh-90
 
-            node['graphics'].y = ank_utils.neigh_average(g_l2_bc, node, 'y',
-                    g_graphics) + 0.1
+            node['graphics'].y = y + 0.1
 
                 # temporary fix for gh-90
 
-            asn = ank_utils.neigh_most_frequent(g_l2_bc, node, 'asn', g_phy)  # arbitrary choice
             node['graphics'].asn = asn
             node.asn = asn  # need to use asn in IP overlay for aggregating subnets
 
@@ -50,10 +52,13 @@ def build_layer2_broadcast(anm):
 
     # Assign collision domain to a host if all neighbours from same host
 
-        for node in split_created_nodes:
-            if ank_utils.neigh_equal(g_l2_bc, node, 'host', g_phy):
-                node.host = ank_utils.neigh_attr(g_l2_bc, node, 'host',
-                        g_phy).next()  # first attribute
+        hosts_equal = ank_utils.neigh_equals(g_l2_bc, neighbors, 'host',
+                g_phy)
+        neigh_hosts = ank_utils.neigh_attrs(g_l2_bc, neighbors, 'host', g_phy)
+        for (node, equal, hosts) in zip(split_created_nodes, hosts_equal,
+                                        neigh_hosts):
+            if equal:
+                node.host = hosts[0]  # first attribute
 
         # set collision domain IPs
         #TODO; work out why this throws a json exception
@@ -76,7 +81,8 @@ def build_layer2_broadcast(anm):
 
 
 def build_layer3(anm):
-    """ l3_connectivity graph: switch nodes aggregated and exploded"""
+    """ l3_connectivity graph: switch nodes aggregated and replaced by
+    multipoint segments"""
     g_in = anm['input']
     g_l2 = anm['layer2']
     g_l3 = anm.add_overlay("layer3")
@@ -85,9 +91,7 @@ def build_layer3(anm):
     g_l3.add_edges_from(g_in.edges())
 
     ank_utils.aggregate_nodes(g_l3, g_l3.switches())
-    exploded_edges = ank_utils.explode_nodes(g_l3,
-                                             g_l3.switches())
-    for edge in exploded_edges:
-        edge.multipoint = True
-        edge.src_int.multipoint = True
-        edge.dst_int.multipoint = True
+    segments = ank_utils.multipoint_nodes(g_l3, g_l3.switches())
+    for segment in segments:
+        for interface in segment.interfaces():
+            interface.multipoint = True
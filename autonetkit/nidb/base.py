@@ -4,19 +4,25 @@ from autonetkit.nidb.interface import DmInterface
 from autonetkit.nidb.edge import DmEdge
 from autonetkit.nidb.node import DmNode
 from autonetkit import ank_json
+from autonetkit.ank_utils import InterfaceIdAllocator
 
 class DmBase(object):
     #TODO: inherit common methods from same base as overlay
     def __init__(self):
         #TODO: make optional for restore serialized file on init
         self._graph = None
-        pass
+        self._label_index = None  # label -> [node_id, ...]
+        self._label_index_size = None
+        self._interface_allocators = {}  # node_id -> InterfaceIdAllocator
 
     def __getstate__(self):
         return self._graph
 
     def __setstate__(self, state):
         self._graph = state
+        self._label_index = None
+        self._label_index_size = None
+        self._interface_allocators = {}
 
     def __repr__(self):
         return "nidb"
@@ -75,6 +81,7 @@ class DmBase(object):
             #data = json.load(fh)
             data = fh.read()
             self._graph = ank_json.ank_json_loads(data)
+            self._label_index = None
 
         ank_json.rebind_nidb_interfaces(self)
 
@@ -112,21 +119,82 @@ class DmBase(object):
         return iter(DmNode(self, node)
                 for node in self._graph)
 
+    @staticmethod
+    def _label_key(label):
+        """Key used for label in the label index, matching str(node)"""
+        try:
+            return str(label)
+        except UnicodeEncodeError:
+            return label  # use unicode label directly
+
+    def _build_label_index(self):
+        """Builds the label -> node_id index"""
+        index = {}
+        for node_id, data in self._graph.nodes(data=True):
+            label = data.get('label')
+            if label is not None:
+                label = self._label_key(label)
+                index.setdefault(label, []).append(node_id)
+
+        self._label_index = index
+        self._label_index_size = len(self._graph)
+        return index
+
+    def _index_node_label(self, node_id, label):
+        """Adds a (new) label for node_id to the label index"""
+        if self._label_index is None:
+            return  # built on first lookup
+        label = self._label_key(label)
+        node_ids = self._label_index.setdefault(label, [])
+        if node_id not in node_ids:
+            node_ids.append(node_id)
+
+    def _label_lookup(self, key):
+        """Returns node_id with label (or id) key, or None"""
+        index = self._label_index
+        if index is None:
+            index = self._build_label_index()
+
+        while True:
+            for node_id in index.get(key, ()):
+                # entries can be stale if node has since been relabelled
+                if (node_id in self._graph and self._label_key(
+                        self._graph.node[node_id].get('label')) == key):
+                    return node_id
+
+            if key in self._graph:
+                # label could be "a b" -> "a_b" (ie folder safe, etc)
+                #TODO: need to fix this discrepancy
+                return key
+
+            if self._label_index_size == len(self._graph):
+                return None
+
+            index = self._build_label_index()  # nodes added directly
+
+    def _interface_allocator(self, node_id, interfaces):
+        """Returns the interface ID allocator for the interface dict of
+        node_id, rebuilt if the dict was replaced or resized directly"""
+        allocator = self._interface_allocators.get(node_id)
+        if allocator is None or not allocator.tracks(interfaces):
+            allocator = InterfaceIdAllocator(interfaces)
+            self._interface_allocators[node_id] = allocator
+        return allocator
+
     def node(self, key):
         """Returns node based on name
-        This is currently O(N). Could use a lookup table"""
+        Label lookups use a label -> node_id index"""
         try:
             if key.node_id in self._graph:
                 return DmNode(self, key.node_id)
         except AttributeError:
             # doesn't have node_id, likely a label string, search on label
-            for node in self:
-                if str(node) == key:
-                    return node
-                elif node.id == key:
-                    # label could be "a b" -> "a_b" (ie folder safe, etc)
-                    #TODO: need to fix this discrepancy
-                    return node
+            try:
+                node_id = self._label_lookup(key)
+            except TypeError:
+                node_id = None  # unhashable key
+            if node_id is not None:
+                return DmNode(self, node_id)
             print "Unable to find node", key, "in", self
             return None
 
@@ -199,6 +267,7 @@ class DmBase(object):
         else:
             log.warning("Cannot add node ids directly to DeviceModel: must add overlay nodes")
         self._graph.add_nodes_from(nbunch, **kwargs)
+        self._label_index = None  # rebuilt on next lookup
 
         for node in nodes_to_add:
             #TODO: add an interface_retain for attributes also
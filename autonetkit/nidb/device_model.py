@@ -4,6 +4,7 @@ import time
 
 import networkx as nx
 
+from autonetkit.ank_utils import SubgraphView
 from autonetkit.nidb.edge import DmEdge
 from autonetkit.nidb.node import DmNode
 from autonetkit.nidb.base import DmBase
@@ -76,7 +77,7 @@ class DeviceModel(DmBase):
 
     def subgraph(self, nbunch, name = None):
         nbunch = (n.node_id for n in nbunch) # only store the id in overlay
-        return DmSubgraph(self._graph.subgraph(nbunch), name)
+        return DmSubgraph(SubgraphView(self._graph, nbunch), name)
 
     def boundary_nodes(self, nbunch, nbunch2 = None):
         nbunch = (n.node_id for n in nbunch) # only store the id in overlay
@@ -1,8 +1,8 @@
 import functools
 import logging
-import string
 
 import autonetkit.log as log
+from autonetkit.ank_utils import natural_sort_key
 from autonetkit.log import CustomAdapter
 from autonetkit.nidb.config_stanza import ConfigStanza
 from autonetkit.nidb.interface import DmInterface
@@ -82,12 +82,12 @@ class DmNode(object):
 
     @property
     def _next_int_id(self):
-        """"""
-# returns next free interface ID
-        import itertools
-        for int_id in itertools.count(1):  # start at 1 as 0 is loopback
-            if int_id not in self._interfaces:
-                return int_id
+        """Allocates a free interface ID, starting at 1 as 0 is loopback:
+        the lowest, unless interfaces were changed in place (see
+        InterfaceIdAllocator). The caller adds the interface with this
+        ID."""
+        return self.nidb._interface_allocator(self.node_id,
+                                              self._interfaces).allocate()
 
     def add_interface(self, description = None, type = "physical", *args,  **kwargs):
         """Public function to add interface"""
@@ -164,45 +164,16 @@ class DmNode(object):
         object.__setattr__(self, 'node_id', node_id)
 
     def __lt__(self, other):
-        #TODO: use human sort from StackOverflow
+        """Sorts on asn then label, in natural order
+        ie [r1, r2, ..., r11, r12] not [r1, r11, r12, r2]"""
 
-        # sort on label if available
-        if self.label is not None:
-            self_node_id = self.label
-        else:
-            self_node_id = self.node_id
+        return self._sort_key() < other._sort_key()
 
-        if other.label is not None:
-            other_node_id = other.label
-        else:
-            other_node_id = other_node_id
-
-        try:
-            self_node_string = [x for x in self_node_id if x
-                                not in string.digits]
-            other_node_string = [x for x in self_node_id if x
-                                 not in string.digits]
-        except TypeError:
-
-            # e.g. non-iterable type, such as an int node_id
-
-            pass
-        else:
-            if self_node_string == other_node_string:
-                self_node_id = """""".join([x for x in self_node_id
-                                            if x in string.digits])
-                other_node_id = """""".join([x for x in other_node_id
-                                             if x in string.digits])
-                try:
-                    self_node_id = int(self_node_id)
-                except ValueError:
-                    pass  # not a number
-                try:
-                    other_node_id = int(other_node_id)
-                except ValueError:
-                    pass  # not a number
-
-        return (self.asn, self_node_id) < (other.asn, other_node_id)
+    def _sort_key(self):
+        label = self.label
+        if label is None:
+            label = self.node_id
+        return (self.asn, natural_sort_key(label), self.node_id)
 
     @property
     def _node_data(self):
@@ -264,6 +235,8 @@ class DmNode(object):
     def __setattr__(self, key, val):
         """Sets edge property"""
         self._node_data[key] = val
+        if key == 'label':
+            self.nidb._index_node_label(self.node_id, val)
         #return DmNode_category(self.nidb, self.node_id, key)
 
     def __iter__(self):
@@ -585,9 +585,10 @@ class IpTree(object):
 
 def assign_asn_to_interasn_cds(g_ip, address_block=None):
     G_phy = g_ip.overlay('phy')
-    for broadcast_domain in g_ip.nodes('broadcast_domain'):
-        neigh_asn = list(ank_utils.neigh_attr(g_ip, broadcast_domain,
-                         'asn', G_phy))  # asn of neighbors
+    broadcast_domains = list(g_ip.nodes('broadcast_domain'))
+    neigh_asns = ank_utils.neigh_attrs(g_ip, broadcast_domains, 'asn',
+                                       G_phy)  # asn of neighbors
+    for (broadcast_domain, neigh_asn) in zip(broadcast_domains, neigh_asns):
         if len(set(neigh_asn)) == 1:
             asn = set(neigh_asn).pop()  # asn of any neigh, as all same
         else:
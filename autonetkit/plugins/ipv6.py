@@ -23,9 +23,10 @@ def assign_asn_to_interasn_cds(G_ip):
     # TODO: make this a common function to ip4 and ip6
 
     G_phy = G_ip.overlay('phy')
-    for broadcast_domain in G_ip.nodes('broadcast_domain'):
-        neigh_asn = list(ank_utils.neigh_attr(G_ip, broadcast_domain,
-                         'asn', G_phy))  # asn of neighbors
+    broadcast_domains = list(G_ip.nodes('broadcast_domain'))
+    neigh_asns = ank_utils.neigh_attrs(G_ip, broadcast_domains, 'asn',
+                                       G_phy)  # asn of neighbors
+    for (broadcast_domain, neigh_asn) in zip(broadcast_domains, neigh_asns):
         if len(set(neigh_asn)) == 1:
             asn = set(neigh_asn).pop()  # asn of any neigh, as all same
         else:
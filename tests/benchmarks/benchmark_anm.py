@@ -0,0 +1,563 @@
+"""Benchmarks for the abstract network model (ANM).
+
+Run directly, eg:
+    python tests/benchmarks/benchmark_anm.py
+    python tests/benchmarks/benchmark_anm.py memory
+
+Not collected by py.test as the larger topologies take some time to build.
+"""
+import collections
+import logging
+import os
+import random
+import resource
+import sys
+import time
+from cStringIO import StringIO
+
+import networkx as nx
+
+import autonetkit
+import autonetkit.ank
+import autonetkit.anm
+import autonetkit.build_network as build_network
+import autonetkit.load.graphml as graphml
+import autonetkit.log as log
+
+dirname, filename = os.path.split(os.path.abspath(__file__))
+tests_dir = os.path.dirname(dirname)
+
+
+def load_topology(topology_name):
+    input_filename = os.path.join(tests_dir, "%s.graphml" % topology_name)
+    input_graph = graphml.load_graphml(input_filename)
+    # bigger topologies don't fit into the default IPv4 blocks
+    input_graph.graph.setdefault("ipv4_loopback_subnet", "10.0.0.0")
+    input_graph.graph.setdefault("ipv4_loopback_prefix", 16)
+    input_graph.graph.setdefault("ipv4_infra_subnet", "172.16.0.0")
+    input_graph.graph.setdefault("ipv4_infra_prefix", 12)
+    return input_graph
+
+
+def multi_as_topology(routers=5000, routers_per_as=50, seed=0):
+    """Random multi-AS router topology, eg for memory benchmarks"""
+    rng = random.Random(seed)
+    graph = nx.Graph()
+    as_count = routers // routers_per_as
+    for asn in range(1, as_count + 1):
+        as_graph = nx.connected_watts_strogatz_graph(routers_per_as, 4, 0.2,
+            seed=rng.randint(0, 2 ** 31))
+        for node in as_graph:
+            node_id = "as%sr%s" % (asn, node + 1)
+            graph.add_node(node_id, label=node_id, asn=asn,
+                           device_type="router", x=asn * 50, y=node * 50)
+        graph.add_edges_from(("as%sr%s" % (asn, src + 1),
+                              "as%sr%s" % (asn, dst + 1))
+                             for (src, dst) in as_graph.edges())
+
+    # connect each AS to the next, and to a random other AS
+    for asn in range(1, as_count + 1):
+        for peer_asn in [asn % as_count + 1, rng.randint(1, as_count)]:
+            if peer_asn == asn:
+                continue
+            src = "as%sr%s" % (asn, rng.randint(1, routers_per_as))
+            dst = "as%sr%s" % (peer_asn, rng.randint(1, routers_per_as))
+            graph.add_edge(src, dst)
+
+    output = StringIO()
+    nx.write_graphml(graph, output)
+    input_graph = graphml.load_graphml(output.getvalue())
+    # infrastructure blocks are allocated per AS
+    input_graph.graph["ipv4_loopback_subnet"] = "172.16.0.0"
+    input_graph.graph["ipv4_loopback_prefix"] = 12
+    input_graph.graph["ipv4_infra_subnet"] = "10.0.0.0"
+    input_graph.graph["ipv4_infra_prefix"] = 8
+    return input_graph
+
+
+class AllocationCounter(object):
+
+    """Counts logger and label allocations made while building"""
+
+    def __init__(self):
+        self.loggers = 0
+        self.labels = 0
+        self._adapter_init = logging.LoggerAdapter.__init__
+        self._build_node_label = autonetkit.anm.NetworkModel._build_node_label
+
+    def __enter__(self):
+        counter = self
+        adapter_init = self._adapter_init
+        build_node_label = self._build_node_label
+
+        def counted_adapter_init(adapter, *args, **kwargs):
+            counter.loggers += 1
+            adapter_init(adapter, *args, **kwargs)
+
+        def counted_build_node_label(anm):
+            build_node_label(anm)
+            label_func = anm.node_label
+
+            def counted_label(node):
+                counter.labels += 1
+                return label_func(node)
+            anm.node_label = counted_label
+
+        logging.LoggerAdapter.__init__ = counted_adapter_init
+        autonetkit.anm.NetworkModel._build_node_label = counted_build_node_label
+        return self
+
+    def __exit__(self, *args):
+        logging.LoggerAdapter.__init__ = self._adapter_init
+        autonetkit.anm.NetworkModel._build_node_label = self._build_node_label
+
+
+def handle_count(anm):
+    """Number of distinct NmNode/NmEdge/NmInterface handles held by anm"""
+    nodes = sum(len(handles) for handles in anm._node_handles.values())
+    return nodes + sum(len(node_handles) for cache in (anm._edge_handles,
+        anm._interface_handles) for handles in cache.values()
+        for node_handles in handles.values())
+
+
+def benchmark_build(topology_name="bigger"):
+    input_graph = load_topology(topology_name)
+    with AllocationCounter() as counter:
+        start = time.time()
+        anm = build_network.initialise(input_graph)
+        anm = build_network.apply_design_rules(anm)
+        duration = time.time() - start
+
+    print "build %s: %.2fs" % (topology_name, duration)
+    print "  loggers allocated: %s" % counter.loggers
+    print "  labels computed: %s" % counter.labels
+    print "  interned handles: %s" % handle_count(anm)
+    return anm
+
+
+def benchmark_interface_edges(anm, overlay_id="phy"):
+    """Times edges()/is_bound/neighbors() for every interface in overlay"""
+    interfaces = [i for n in anm[overlay_id] for i in n.interfaces()]
+    start = time.time()
+    for interface in interfaces:
+        interface.edges()
+        interface.is_bound
+        interface.neighbors()
+    duration = time.time() - start
+    print "interface edges %s: %.2fs for %s interfaces" % (overlay_id,
+        duration, len(interfaces))
+
+
+def benchmark_filter(anm, overlay_id="phy", repeats=100):
+    """Times nodes(**kwargs) with and without attribute indexes"""
+    overlay = anm[overlay_id]
+    indexed_attrs = set(anm.indexed_attrs)
+    for label, attrs in [("indexed", indexed_attrs), ("scan", set())]:
+        anm.indexed_attrs = attrs
+        start = time.time()
+        for _ in range(repeats):
+            list(overlay.nodes(host="internal", platform="netkit"))
+            list(overlay.nodes("broadcast_domain"))
+        duration = time.time() - start
+        print "filter %s (%s): %.2fs for %s queries" % (overlay_id, label,
+            duration, 2 * repeats)
+    anm.indexed_attrs = indexed_attrs
+
+
+def benchmark_edges(anm, overlay_id="bgp", repeats=20):
+    """Times edges(type=...) with and without edge attribute indexes,
+    and edge() lookups"""
+    overlay = anm[overlay_id]
+    indexed_edge_attrs = set(anm.indexed_edge_attrs)
+    for label, attrs in [("indexed", indexed_edge_attrs), ("scan", set())]:
+        anm.indexed_edge_attrs = attrs
+        start = time.time()
+        for _ in range(repeats):
+            overlay.edges(type="ebgp")
+        duration = time.time() - start
+        print "edges %s (%s): %.2fs for %s queries" % (overlay_id, label,
+            duration, repeats)
+    anm.indexed_edge_attrs = indexed_edge_attrs
+
+    edges = overlay.edges()
+    start = time.time()
+    for edge in edges:
+        overlay.edge(edge)
+        overlay.edge(edge.src, edge.dst)
+    duration = time.time() - start
+    print "edge %s: %.2fs for %s lookups" % (overlay_id, duration,
+        2 * len(edges))
+
+
+def benchmark_node_roles(anm, repeats=10):
+    """Times the cross-overlay is_router()/is_switch()/asn lookups"""
+    nodes = [n for overlay_id in anm.overlays() for n in anm[overlay_id]]
+    start = time.time()
+    for _ in range(repeats):
+        for node in nodes:
+            node.is_router()
+            node.is_switch()
+            node.asn
+    duration = time.time() - start
+    print "node roles: %.2fs for %s nodes" % (duration,
+        repeats * len(nodes))
+
+
+def benchmark_labels(anm, repeats=10):
+    """Times str() of every node in every overlay"""
+    nodes = [n for overlay_id in anm.overlays() for n in anm[overlay_id]]
+    start = time.time()
+    for _ in range(repeats):
+        for node in nodes:
+            str(node)
+    duration = time.time() - start
+    print "labels: %.2fs for %s nodes" % (duration, repeats * len(nodes))
+
+
+def benchmark_overlay_access(anm, repeats=200000):
+    """Times anm[overlay_id], as compilers do per node and interface"""
+    start = time.time()
+    for _ in range(repeats):
+        anm["ipv4"]
+    duration = time.time() - start
+    print "overlay access: %.2fs for %s lookups" % (duration, repeats)
+
+
+def benchmark_columns(anm, overlay_id="graphics", repeats=1000):
+    """Times reading x, y of every node, eg to normalise placement, with
+    and without the columnar store. Needs NumPy"""
+    overlay = anm[overlay_id]
+    for label, attrs in [("columnar", set(["x", "y"])), ("dict", set())]:
+        anm.columnar_attrs = attrs
+        start = time.time()
+        for _ in range(repeats):
+            overlay.get_node_attrs("x").min()
+            overlay.get_node_attrs("y").min()
+        duration = time.time() - start
+        print "columns %s (%s): %.2fs for %s reads of %s nodes" % (
+            overlay_id, label, duration, 2 * repeats, len(overlay))
+    anm.columnar_attrs = set()
+
+
+def benchmark_neigh_aggregates(anm, overlay_id="layer2_bc", repeats=10):
+    """Times the neighbor averages, most frequent and equal checks made
+    for each collision domain, one node at a time and in bulk"""
+    overlay = anm[overlay_id]
+    g_graphics = anm["graphics"]
+    g_phy = anm["phy"]
+    nodes = [node for node in overlay if node.broadcast_domain]
+    start = time.time()
+    for _ in range(repeats):
+        for node in nodes:
+            autonetkit.ank.neigh_average(overlay, node, "x", g_graphics)
+            autonetkit.ank.neigh_most_frequent(overlay, node, "asn", g_phy)
+            autonetkit.ank.neigh_equal(overlay, node, "host", g_phy)
+    per_node = time.time() - start
+    start = time.time()
+    for _ in range(repeats):
+        neighbors = autonetkit.ank.neigh_adjacency(overlay, nodes)
+        autonetkit.ank.neigh_averages(overlay, neighbors, "x", g_graphics)
+        autonetkit.ank.neigh_most_frequents(overlay, neighbors, "asn", g_phy)
+        autonetkit.ank.neigh_equals(overlay, neighbors, "host", g_phy)
+    bulk = time.time() - start
+    print "neigh aggregates: %.2fs per node, %.2fs bulk, for %s nodes" % (
+        per_node, bulk, len(nodes))
+
+
+def benchmark_subgraphs(nodes=50000, slices=500):
+    """Times taking many small per-AS subgraphs of a large overlay, and
+    iterating their nodes"""
+    anm = autonetkit.anm.NetworkModel()
+    g_phy = anm["phy"]
+    node_ids = ["r%s" % index for index in range(nodes)]
+    g_phy.add_nodes_from(node_ids)
+    g_phy.add_edges_from(zip(node_ids, node_ids[1:]))
+    members = {}
+    for (index, node) in enumerate(g_phy):
+        members.setdefault(index % slices, []).append(node)
+    start = time.time()
+    count = 0
+    for nbunch in members.values():
+        subgraph = g_phy.subgraph(nbunch)
+        count += len(subgraph)
+    duration = time.time() - start
+    print "subgraphs: %.2fs for %s subgraphs of %s nodes" % (duration,
+        slices, count)
+
+
+def benchmark_add_interfaces(interfaces=5000):
+    """Times adding many interfaces to one node, eg a large switch"""
+    anm = autonetkit.anm.NetworkModel()
+    g_phy = anm["phy"]
+    g_phy.add_nodes_from(["sw1"])
+    node = g_phy.node("sw1")
+    start = time.time()
+    for _ in range(interfaces):
+        node.add_interface()
+    duration = time.time() - start
+    print "add interfaces: %.2fs for %s interfaces" % (duration, interfaces)
+
+
+def benchmark_add_batches(nodes=20000, batch=100):
+    """Times building an overlay from another in many small batches, as
+    the design rules do, with retained attributes and edges"""
+    anm = autonetkit.anm.NetworkModel()
+    g_in = anm.add_overlay("input")
+    node_ids = ["r%s" % index for index in range(nodes)]
+    g_in.add_nodes_from(node_ids, asn=1, platform="netkit")
+    g_in.add_edges_from(zip(node_ids, node_ids[1:]))
+    g_test = anm.add_overlay("test")
+    in_nodes = list(g_in)
+    start = time.time()
+    for index in range(0, nodes, batch):
+        g_test.add_nodes_from(in_nodes[index:index + batch],
+                              retain=["asn", "platform"])
+    g_test.add_edges_from(g_in.edges(), retain=["type"])
+    duration = time.time() - start
+    print "add batches: %.2fs for %s nodes in batches of %s" % (duration,
+        nodes, batch)
+
+
+def benchmark_copy_attrs(nodes=20000, attrs=8):
+    """Times copying several attributes between overlays in one
+    copy_attr_from call"""
+    anm = autonetkit.anm.NetworkModel()
+    g_in = anm.add_overlay("input")
+    g_in.add_nodes_from(["r%s" % index for index in range(nodes)])
+    attr_names = ["attr%s" % index for index in range(attrs)]
+    g_in.update(**dict((attr, 1) for attr in attr_names))
+    g_test = anm.add_overlay("test")
+    g_test.add_nodes_from(g_in)
+    start = time.time()
+    autonetkit.ank.copy_attr_from(g_in, g_test, attr_names, type=int)
+    duration = time.time() - start
+    print "copy attrs: %.2fs for %s attributes of %s nodes" % (duration,
+        attrs, nodes)
+
+
+def benchmark_sort_interfaces(interfaces=100000, per_node=10, seed=0):
+    """Times sorting shuffled interfaces, ie natural sort on node
+    (asn, label) then interface id"""
+    rng = random.Random(seed)
+    anm = autonetkit.anm.NetworkModel()
+    g_phy = anm["phy"]
+    node_ids = ["r%s" % index for index in range(interfaces // per_node)]
+    g_phy.add_nodes_from(node_ids)
+    to_sort = []
+    for node in g_phy:
+        node.asn = rng.randint(1, 10)
+        to_sort += [node.add_interface() for _ in range(per_node)]
+    rng.shuffle(to_sort)
+
+    start = time.time()
+    sorted(to_sort)
+    duration = time.time() - start
+    print "sort interfaces: %.2fs for %s interfaces" % (duration,
+        len(to_sort))
+
+
+def benchmark_aggregate(switches=20000, per_cluster=10, ports=4):
+    """Times aggregating clusters of chained switches, each with router
+    ports, into one switch per cluster"""
+    anm = autonetkit.anm.NetworkModel()
+    g_phy = anm["phy"]
+    switch_ids = ["sw%s" % index for index in range(switches)]
+    g_phy.add_nodes_from(switch_ids, device_type="switch")
+    links = [(src, dst) for (index, (src, dst))
+             in enumerate(zip(switch_ids, switch_ids[1:]))
+             if (index + 1) % per_cluster]
+    for switch_id in switch_ids:
+        router_ids = ["%s_r%s" % (switch_id, index) for index in range(ports)]
+        g_phy.add_nodes_from(router_ids, device_type="router")
+        links += [(switch_id, router_id) for router_id in router_ids]
+    g_phy.add_edges_from([(g_phy.node(src).add_interface(),
+                           g_phy.node(dst).add_interface())
+                          for (src, dst) in links])
+    to_aggregate = list(g_phy.switches())
+    start = time.time()
+    autonetkit.ank.aggregate_nodes(g_phy, to_aggregate)
+    duration = time.time() - start
+    print "aggregate: %.2fs for %s switches into %s" % (duration,
+        switches, len(list(g_phy.switches())))
+
+
+def ixp_topology(members=200):
+    """One exchange switch joining a router from each of members ASes,
+    each with an internal link to a second router"""
+    graph = nx.Graph()
+    graph.add_node("ixp", label="ixp", asn=1, device_type="switch",
+                   x=0, y=0)
+    for asn in range(2, members + 2):
+        for index in (1, 2):
+            node_id = "as%sr%s" % (asn, index)
+            graph.add_node(node_id, label=node_id, asn=asn,
+                           device_type="router", x=asn * 50, y=index * 50)
+        graph.add_edge("as%sr1" % asn, "as%sr2" % asn)
+        graph.add_edge("as%sr1" % asn, "ixp")
+
+    output = StringIO()
+    nx.write_graphml(graph, output)
+    input_graph = graphml.load_graphml(output.getvalue())
+    input_graph.graph["ipv4_loopback_subnet"] = "172.16.0.0"
+    input_graph.graph["ipv4_loopback_prefix"] = 12
+    input_graph.graph["ipv4_infra_subnet"] = "10.0.0.0"
+    input_graph.graph["ipv4_infra_prefix"] = 8
+    return input_graph
+
+
+def benchmark_ixp(members=200):
+    """Times the design rules for an exchange switch joining many ASes,
+    then listing the eBGP sessions of each member"""
+    input_graph = ixp_topology(members)
+    start = time.time()
+    anm = build_network.initialise(input_graph)
+    anm = build_network.apply_design_rules(anm)
+    g_ebgp_v4 = anm["ebgp_v4"]
+    sessions = sum(len(g_ebgp_v4.edges(node)) for node in g_ebgp_v4)
+    duration = time.time() - start
+    print "ixp: %.2fs for %s members, %s eBGP sessions" % (duration,
+        members, sessions)
+
+
+def benchmark_bgp(anm, repeats=5):
+    """Times rebuilding the BGP overlays: the eBGP sessions, the
+    per-address family overlays, and the legacy bgp overlay"""
+    from autonetkit.design.bgp import build_bgp
+    start = time.time()
+    for _ in range(repeats):
+        build_bgp(anm)
+    duration = time.time() - start
+    stored = sum(anm.overlay_nx_graphs[overlay_id].number_of_edges()
+                 for overlay_id in ("bgp", "ebgp", "ebgp_v4", "ebgp_v6"))
+    print "bgp: %.3fs per build, %s edges stored" % (duration / repeats,
+                                                     stored)
+
+
+def benchmark_flat_ibgp(routers=500):
+    """Times the design rules for a single AS of routers, all iBGP peers,
+    then listing the iBGP sessions of each router"""
+    input_graph = multi_as_topology(routers, routers_per_as=routers)
+    start = time.time()
+    anm = build_network.initialise(input_graph)
+    anm = build_network.apply_design_rules(anm)
+    g_ibgp_v4 = anm["ibgp_v4"]
+    sessions = sum(len(g_ibgp_v4.edges(node)) for node in g_ibgp_v4)
+    duration = time.time() - start
+    stored = anm.overlay_nx_graphs["ibgp_v4"].number_of_edges()
+    print "flat ibgp: %.2fs for %s routers, %s iBGP sessions, %s stored" % (
+        duration, routers, sessions, stored)
+
+
+def benchmark_rr_hierarchy(routers=2000, max_sessions=40):
+    """As benchmark_flat_ibgp, with a generated route reflector hierarchy
+    limiting the sessions of each router"""
+    input_graph = multi_as_topology(routers, routers_per_as=routers)
+    input_graph.graph["ibgp_max_sessions"] = max_sessions
+    start = time.time()
+    anm = build_network.initialise(input_graph)
+    anm = build_network.apply_design_rules(anm)
+    g_ibgp_v4 = anm["ibgp_v4"]
+    sessions = [len(g_ibgp_v4.edges(node)) for node in g_ibgp_v4]
+    duration = time.time() - start
+    print "rr hierarchy: %.2fs for %s routers, %s iBGP sessions, " \
+        "at most %s per router" % (duration, routers, sum(sessions),
+        max(sessions))
+
+
+def benchmark_ospf(routers=2000, areas=10, repeats=5):
+    """Times rebuilding the OSPF overlay for a single AS of routers, split
+    into areas of consecutive routers around the ring, with routers
+    linked to another area in area 0"""
+    from autonetkit.design.igp import build_ospf
+    input_graph = multi_as_topology(routers, routers_per_as=routers)
+    chunk = dict((node, int(input_graph.node[node]["label"].split("r")[-1])
+                  * areas // (routers + 1) + 1) for node in input_graph)
+    for node in input_graph:
+        area = chunk[node]
+        if any(chunk[neigh] != area for neigh in input_graph.neighbors(node)):
+            area = 0
+        input_graph.node[node]["ospf_area"] = area
+    anm = build_network.initialise(input_graph)
+    anm = build_network.apply_design_rules(anm)
+    start = time.time()
+    for _ in range(repeats):
+        build_ospf(anm)
+    duration = time.time() - start
+    types = collections.Counter(node.type for node in anm["ospf"])
+    print "ospf: %.3fs per build for %s routers, %s" % (duration / repeats,
+        routers, ", ".join("%s %s" % (count, router_type)
+                           for (router_type, count) in sorted(types.items())))
+
+
+def benchmark_igps(routers=2000, repeats=5):
+    """Times rebuilding the OSPF, EIGRP and IS-IS overlays for a single AS
+    of routers running a mix of IGPs, and counts the interface attribute
+    dicts they hold"""
+    from autonetkit.design.igp import build_ospf, build_eigrp, build_isis
+    input_graph = multi_as_topology(routers, routers_per_as=routers)
+    igps = ["ospf", "eigrp", "isis"]
+    for (index, node) in enumerate(sorted(input_graph)):
+        input_graph.node[node]["igp"] = igps[index % len(igps)]
+    anm = build_network.initialise(input_graph)
+    anm = build_network.apply_design_rules(anm, lazy=False)
+    start = time.time()
+    for _ in range(repeats):
+        build_ospf(anm)
+        build_eigrp(anm)
+        build_isis(anm)
+    duration = time.time() - start
+    interfaces = set(id(data) for overlay_id in igps
+                     for (_, node_data) in anm.overlay_nx_graphs[
+                         overlay_id].nodes(data=True)
+                     for data in node_data["_interfaces"].values())
+    print "igps: %.3fs per build of %s, %s interface dicts" % (
+        duration / repeats, ", ".join(igps), len(interfaces))
+
+
+def benchmark_memory(routers=5000):
+    """Peak RSS of building a multi-AS topology. Run in its own process,
+    as peak RSS covers the whole process"""
+    input_graph = multi_as_topology(routers)
+    start = time.time()
+    anm = build_network.initialise(input_graph)
+    anm = build_network.apply_design_rules(anm)
+    duration = time.time() - start
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print "build %s routers: %.2fs, peak RSS %.1f MB" % (len(anm["phy"]),
+        duration, peak_rss / 1024.0)
+    return anm
+
+
+if __name__ == "__main__":
+    log.logger.setLevel(logging.WARNING)
+    if sys.argv[1:] == ["memory"]:
+        benchmark_memory()
+        sys.exit()
+
+    benchmark_build("big")
+    anm = benchmark_build("bigger")
+    benchmark_interface_edges(anm)
+    benchmark_filter(anm)
+    benchmark_edges(anm)
+    benchmark_node_roles(anm)
+    benchmark_labels(anm)
+    benchmark_overlay_access(anm)
+    benchmark_neigh_aggregates(anm)
+    benchmark_bgp(anm)
+    try:
+        import numpy
+    except ImportError:
+        pass
+    else:
+        benchmark_columns(anm)
+    benchmark_add_interfaces()
+    benchmark_add_batches()
+    benchmark_copy_attrs()
+    benchmark_sort_interfaces()
+    benchmark_subgraphs()
+    benchmark_aggregate()
+    benchmark_ixp()
+    benchmark_flat_ibgp()
+    benchmark_rr_hierarchy()
+    benchmark_ospf()
+    benchmark_igps()
@@ -0,0 +1,44 @@
+import autonetkit
+import autonetkit.ank as ank_utils
+import autonetkit.log as log
+
+log.info("Testing switch clusters and aggregation")
+
+anm = autonetkit.anm.NetworkModel()
+g_phy = anm["phy"]
+g_phy.add_nodes_from(["sw1", "sw2", "sw3", "sw4"], device_type="switch")
+g_phy.add_nodes_from(["r1", "r2", "r3", "r4"], device_type="router")
+links = [("sw1", "sw2"), ("sw2", "sw3"), ("r1", "sw1"), ("r2", "sw3"),
+    ("r3", "sw4"), ("r4", "sw4"), ("r1", "r2")]
+g_phy.add_edges_from([(g_phy.node(src).add_interface(),
+    g_phy.node(dst).add_interface()) for (src, dst) in links])
+
+switches = ["sw1", "sw2", "sw3", "sw4"]
+clusters = ank_utils.connected_subgraphs(g_phy,
+    [g_phy.node(n) for n in switches])
+assert [[str(n) for n in c] for c in clusters] == [
+    ["sw1", "sw2", "sw3"], ["sw4"]]
+
+graph = anm.overlay_nx_graphs["phy"]
+(clusters, boundaries) = ank_utils.node_clusters(graph, switches)
+assert sorted(boundaries[0]) == [("sw1", "r1"), ("sw3", "r2")]
+assert sorted(boundaries[1]) == [("sw4", "r3"), ("sw4", "r4")]
+
+# directed: one-way edges only join members through a cycle
+directed = autonetkit.anm.NetworkModel().add_overlay("test", directed=True)
+directed.add_nodes_from(["a", "b", "c", "d"])
+directed.add_edges_from([("a", "b"), ("b", "c"), ("c", "a"), ("c", "d")])
+(clusters, boundaries) = ank_utils.node_clusters(
+    directed._anm.overlay_nx_graphs["test"], ["a", "b", "c", "d"])
+assert sorted(sorted(c) for c in clusters) == [["a", "b", "c"], ["d"]]
+
+# the last switch in each cluster is kept, with the boundary edges moved
+g_l2 = anm.add_overlay("layer2")
+g_l2.add_nodes_from(g_phy)
+g_l2.add_edges_from(g_phy.edges())
+ank_utils.aggregate_nodes(g_l2, [g_l2.node(n) for n in switches])
+assert sorted(str(n) for n in g_l2.switches()) == ["sw3", "sw4"]
+assert sorted(str(n) for n in g_l2.node("sw3").neighbors()) == ["r1", "r2"]
+r1_int = g_l2.edge("r1", "sw3").src_int
+assert r1_int.interface_id == g_phy.edge("r1", "sw1").src_int.interface_id
+assert len(g_l2.edges()) == 5
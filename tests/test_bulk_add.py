@@ -0,0 +1,47 @@
+import autonetkit
+import autonetkit.log as log
+
+log.info("Testing ANM bulk overlay construction")
+
+anm = autonetkit.anm.NetworkModel()
+g_in = anm.add_overlay("input")
+g_in.add_nodes_from(["r1", "r2", "r3"], asn=1)
+g_in.node("r1").add_interface("eth0")
+g_in.add_edges_from([("r1", "r2"), ("r2", "r3"), ("r3", "r4")])
+assert len(g_in.edges()) == 2  # r4 not in overlay: ignored
+g_in.edge("r1", "r2").weight = 5
+
+# retained attributes and interface tables copied input->phy
+g_phy = anm["phy"]
+g_phy.add_nodes_from(g_in, retain=["asn", "label"])
+assert g_phy.node("r1").asn == 1
+assert [i.description for i in g_phy.node("r1").physical_interfaces] == [
+    "eth0"]
+g_phy.add_edges_from(g_in.edges(), retain="weight")
+assert g_phy.edge("r1", "r2").weight == 5
+
+# unwrapped ids and data, only new nodes are added and labelled
+g_test = anm.add_overlay("test")
+added = g_test.add_nodes_bulk([("r1", {"x": 1}), ("r2", {})])
+assert added == ["r1", "r2"]
+assert g_test.add_nodes_bulk([("r1", {"x": 2}), ("r3", {})]) == ["r3"]
+assert g_test.node("r1").x == 1
+assert str(g_test.node("r3")) == "r3"
+g_test.add_nodes_bulk([("r1", {"x": 2})], update=True)
+assert g_test.node("r1").x == 2
+
+added = g_test.add_edges_bulk([("r1", "r2", {}), ("r1", "r4", {})],
+                              type="physical")
+assert [(src, dst) for (src, dst, _) in added] == [("r1", "r2")]
+assert g_test.edge("r1", "r2").type == "physical"
+
+# several attributes copied, cast and defaulted in one pass
+import autonetkit.ank as ank_utils
+g_in.update(ospf_area="1", ospf_cost="10")
+ank_utils.copy_attr_from(g_in, g_test, ["ospf_area", "ospf_cost", "missing"],
+                         ["area", "cost", "present"], type=None)
+assert g_test.node("r1").area == "1" and g_test.node("r1").present is None
+ank_utils.copy_attr_from(g_in, g_test, "ospf_cost", "cost", type=int)
+assert g_test.node("r2").cost == 10
+ank_utils.set_node_default(g_test, area="0", platform="netkit")
+assert g_test.node("r1").area == "1" and g_test.node("r1").platform == "netkit"
@@ -0,0 +1,67 @@
+import autonetkit
+import autonetkit.log as log
+from autonetkit.anm.columns import numpy
+from autonetkit.anm.node import NmNode
+
+log.info("Testing ANM columnar attributes")
+
+# runs with or without NumPy: without, bulk access reads the node data
+anm = autonetkit.anm.NetworkModel()
+anm.columnar_attributes("x")
+anm.columnar_edge_attributes("cost")
+g_phy = anm["phy"]
+g_phy.add_nodes_from(["r1", "r2", "r3"])
+g_phy.update(x=10)
+assert list(g_phy.get_node_attrs("x", ["r1", "r2"])) == [10, 10]
+
+# node API writes through to the column
+g_phy.node("r1").x = 20
+assert list(g_phy.get_node_attrs("x", ["r1", "r2"])) == [20, 10]
+
+# bulk writes are visible to the node API
+g_phy.set_node_attrs("x", [1, 2, 3], ["r1", "r2", "r3"])
+assert g_phy.node("r2").x == 2
+g_phy.set_node_attrs("x", 5)
+assert list(g_phy.get_node_attrs("x")) == [5, 5, 5]
+
+# missing values take the default
+g_phy.add_nodes_from(["r4"])
+assert list(g_phy.get_node_attrs("x", ["r4", "r1"], default=-1)) == [-1, 5]
+
+g_phy.add_edges_from([("r1", "r2"), ("r2", "r3")])
+g_phy.set_edge_attrs("cost", [4, 8], [("r2", "r1"), ("r2", "r3")])
+assert g_phy.edge("r1", "r2").cost == 4
+g_phy.edge("r2", "r3").cost = 6
+assert list(g_phy.get_edge_attrs("cost", [("r1", "r2"), ("r3", "r2")])) \
+    == [4, 6]
+
+# missing values raise unless a default is given
+try:
+    g_phy.get_node_attrs("x")
+except ValueError:
+    pass
+else:
+    assert False, "expected ValueError for unset x on r4"
+assert min(g_phy.get_node_attrs("x", default=0)) == 0
+g_phy.node("r4").x = 7
+assert min(g_phy.get_node_attrs("x")) == 5
+
+# once built, node.x is read from the column with the node data's type
+assert g_phy.node("r4").x == 7 and type(g_phy.node("r4").x) is int
+if numpy is not None:  # served by the column, not the node data
+    assert anm._node_column_value("phy", "r4", "x") == 7
+# mixed ints and floats get no column: each node keeps its own type
+g_phy.set_node_attrs("x", [1.5, 2.5], ["r1", "r2"])
+assert list(g_phy.get_node_attrs("x", ["r1", "r2", "r4"])) == [1.5, 2.5, 7]
+assert type(g_phy.node("r1").x) is float
+assert type(g_phy.node("r4").x) is int
+
+# a node added on the graph directly makes the column stale, not wrong
+g_phy._graph.add_node("r5", x=3)
+assert NmNode(anm, "phy", "r5").x == 3
+assert list(g_phy.get_node_attrs("x", ["r5", "r4"])) == [3, 7]
+
+assert list(g_phy.get_edge_attrs("cost")) in ([4, 6], [6, 4])
+g_phy.set_edge_attrs("cost", 9, [("r3", "r2")])
+assert g_phy.edge("r2", "r3").cost == 9
+assert type(g_phy.edge("r2", "r3").cost) is int
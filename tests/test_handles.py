@@ -0,0 +1,60 @@
+import autonetkit
+import autonetkit.ank as ank_utils
+import autonetkit.log as log
+
+log.info("Testing interned ANM handles")
+
+def handle_counts(anm, overlay_id):
+    """Interned (nodes, edges, interfaces) of overlay"""
+    return (len(anm._node_handles.get(overlay_id, {})),
+            sum(len(h) for h in anm._edge_handles.get(overlay_id,
+                                                      {}).values()),
+            sum(len(h) for h in anm._interface_handles.get(overlay_id,
+                                                           {}).values()))
+
+anm = autonetkit.anm.NetworkModel()
+g_phy = anm["phy"]
+g_phy.add_nodes_from(["r1", "r2", "r3", "r4", "sw1"], device_type="router")
+g_phy.node("sw1").device_type = "switch"
+links = [("r1", "sw1"), ("r2", "sw1"), ("r3", "sw1"), ("r4", "sw1"),
+         ("r1", "r2"), ("r3", "r4")]
+g_phy.add_edges_from([(g_phy.node(src).add_interface(),
+    g_phy.node(dst).add_interface()) for (src, dst) in links])
+
+# one handle per item
+r1 = g_phy.node("r1")
+assert g_phy.node("r1") is r1
+edge = g_phy.edge("r1", "r2")
+assert g_phy.edge("r1", "r2") is edge
+assert edge.src_int is r1.interface(edge.src_int.interface_id)
+
+# removal shrinks the caches
+list(g_phy)
+g_phy.edges()
+[list(node.interfaces()) for node in g_phy]
+(nodes, edges, interfaces) = handle_counts(anm, "phy")
+assert nodes == 5
+r3_edges = len(g_phy.node("r3").edges())
+r3_interfaces = len(list(g_phy.node("r3").interfaces()))
+g_phy.remove_node("r3")
+assert handle_counts(anm, "phy") == (nodes - 1, edges - r3_edges,
+                                     interfaces - r3_interfaces)
+g_phy.remove_edges_from([g_phy.edge("r1", "r2")])
+assert handle_counts(anm, "phy") == (nodes - 1, edges - r3_edges - 1,
+                                     interfaces - r3_interfaces)
+assert g_phy.node("r1") is r1  # handles of other nodes are kept
+
+# pairs expanded from segments aren't interned
+g_l3 = anm.add_overlay("layer3")
+g_l3.add_nodes_from(g_phy)
+g_l3.add_edges_from(g_phy.edges())
+ank_utils.multipoint_nodes(g_l3, g_l3.switches())
+l3_edges = handle_counts(anm, "layer3")[1]
+assert len(g_l3.edges()) == 3  # r1, r2 and r4 over sw1
+assert handle_counts(anm, "layer3")[1] == l3_edges
+
+# replacing an overlay drops its handles
+assert handle_counts(anm, "layer3")[0]
+anm.add_overlay("layer3")
+assert handle_counts(anm, "layer3") == (0, 0, 0)
+assert g_phy.node("r1") is r1
@@ -0,0 +1,128 @@
+import autonetkit
+import autonetkit.ank_validate as ank_validate
+import autonetkit.design.bgp as bgp
+import autonetkit.log as log
+
+log.info("Testing iBGP full mesh segments")
+
+anm = autonetkit.anm.NetworkModel()
+g_in = anm.add_overlay("input")
+g_in.add_nodes_from(["r1", "r2", "r3", "r4", "r5", "r6"],
+    device_type="router", asn=1)
+g_in.node("r6").asn = 2
+g_in.node("r3").ibgp_role = "RR"
+g_in.node("r3").ibgp_l3_cluster = "a"
+g_in.node("r4").ibgp_role = "RRC"
+g_in.node("r4").ibgp_l3_cluster = "a"
+g_in.node("r5").ibgp_role = "Disabled"
+
+g_phy = anm["phy"]
+g_phy.add_nodes_from(g_in, retain=["device_type", "asn"], use_ipv4=True)
+for node in g_phy:
+    node.add_loopback()  # interface 0
+g_bgp = anm.add_overlay("bgp", directed=True)
+g_bgp.add_nodes_from(g_in, retain="asn")
+
+bgp.build_ibgp(anm)
+
+# peers and RRs are a single peer group, RR clients are edges
+assert [s.segment_id for s in g_bgp.segments()] == ["ibgp_1"]
+segment = g_bgp.segment("ibgp_1")
+assert sorted(str(n) for n in segment) == ["r1", "r2", "r3"]
+assert (segment.type, segment.direction) == ("ibgp", "over")
+assert sorted((str(e.src), str(e.dst), e.direction)
+              for e in g_bgp.edges(segments=False)) == [
+    ("r3", "r4", "down"), ("r4", "r3", "up")]
+
+# sessions expand to the same full mesh
+over = sorted((str(e.src), str(e.dst)) for e in g_bgp.edges(direction="over"))
+assert over == [(s, t) for s in ("r1", "r2", "r3")
+                for t in ("r1", "r2", "r3") if s != t]
+assert sorted(str(n) for n in g_bgp.node("r1").neighbors()) == ["r2", "r3"]
+assert g_bgp.edge("r2", "r1").src_int.interface_id == 0
+
+loopback = g_bgp.node("r1").interface(0)
+assert [s.segment_id for s in loopback.segments()] == ["ibgp_1"]
+assert loopback.edges(segments=False) == []
+assert len(loopback.edges()) == 2
+
+bgp.build_ibgp_v4(anm)
+g_ibgp_v4 = anm["ibgp_v4"]
+assert g_ibgp_v4.segment("ibgp_1").direction == "over"
+assert g_ibgp_v4.segment("ibgp_1").type is None  # not retained
+assert len(g_ibgp_v4.edges()) == 8
+assert sorted(str(n) for n in g_ibgp_v4.node("r3").neighbors()) == [
+    "r1", "r2", "r4"]
+
+# r5 is disabled: validation reports ASN1 as disconnected
+messages = []
+g_ibgp_v4.log.warning = messages.append
+ank_validate.validate_ibgp(anm)
+assert messages == ["iBGP v4 topology for ASN1 is disconnected"]
+g_ibgp_v4.remove_node("r5")
+del messages[:]
+ank_validate.validate_ibgp(anm)
+assert messages == []
+
+log.info("Testing generated route reflector hierarchy")
+
+def ring_anm(routers, pops=1):
+    anm = autonetkit.anm.NetworkModel()
+    g_in = anm.add_overlay("input")
+    node_ids = ["r%s" % index for index in range(routers)]
+    g_in.add_nodes_from(node_ids, device_type="router", asn=1)
+    for (index, node_id) in enumerate(node_ids):
+        g_in.node(node_id).pop = "pop%s" % (index * pops // routers)
+    g_phy = anm["phy"]
+    g_phy.add_nodes_from(g_in, retain=["device_type", "asn"])
+    g_phy.add_edges_from([(g_phy.node(src).add_interface(),
+        g_phy.node(dst).add_interface())
+        for (src, dst) in zip(node_ids, node_ids[1:] + node_ids[:1])])
+    return anm
+
+def sessions(anm, max_sessions):
+    anm["input"].data.ibgp_max_sessions = max_sessions
+    bgp.build_ibgp_hierarchy(anm)
+    g_bgp = anm.add_overlay("bgp", directed=True)
+    g_bgp.add_nodes_from(anm["input"], retain="asn")
+    bgp.build_ibgp(anm)
+    return dict((str(n), len(n.edges())) for n in g_bgp)
+
+# full mesh within the limit: left as peers
+anm = ring_anm(6)
+assert set(sessions(anm, 5).values()) == set([5])
+assert all(n.ibgp_role == "Peer" for n in anm["bgp"])
+
+# two levels, with a cluster for each pop
+anm = ring_anm(12, pops=2)
+counts = sessions(anm, 8)
+assert max(counts.values()) <= 8
+g_in = anm["input"]
+assert sorted(set(n.ibgp_l3_cluster for n in g_in)) == ["pop0_1", "pop1_1"]
+assert all(n.ibgp_l2_cluster is None for n in g_in)
+rrs = [n for n in g_in if n.ibgp_role == "RR"]
+assert len(rrs) == 4
+assert all(counts[str(n)] == 2 for n in g_in if n.ibgp_role == "RRC")
+
+# three levels when the RRs of all clusters can't be meshed
+anm = ring_anm(40)
+counts = sessions(anm, 10)
+assert max(counts.values()) <= 10
+roles = [n.ibgp_role for n in anm["input"]]
+assert set(roles) == set(["RR", "HRR", "RRC"])
+assert sum(counts.values()) < 4 * 40
+
+# clusters are connected parts of the phy ring
+g_in = anm["input"]
+for n in g_in:
+    if n.ibgp_role == "RRC":
+        neighbors = [g_in.node(m.node_id) for m in n["phy"].neighbors()]
+        if all(m.ibgp_role == "RRC" for m in neighbors):
+            assert any(m.ibgp_l2_cluster == n.ibgp_l2_cluster
+                       for m in neighbors)
+
+# roles set by the user are kept
+anm = ring_anm(12)
+anm["input"].node("r1").ibgp_role = "RR"
+sessions(anm, 4)
+assert set(n.ibgp_role for n in anm["input"]) == set(["RR", None])
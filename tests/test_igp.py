@@ -0,0 +1,91 @@
+import autonetkit
+import autonetkit.ank as ank_utils
+import autonetkit.design.igp as igp
+import autonetkit.log as log
+
+log.info("Testing IGP overlays derived from layer3_igp")
+
+anm = autonetkit.anm.NetworkModel()
+g_in = anm.add_overlay("input")
+g_in.add_nodes_from(["r1", "r2", "r3", "r4"], device_type="router", asn=1)
+g_in.add_nodes_from(["sw1"], device_type="switch", asn=1)
+g_in.node("r4").asn = 2
+g_in.update(["r1", "r2"], igp="ospf")
+g_in.update(["r3", "r4"], igp="eigrp")
+g_phy = anm["phy"]
+g_phy.data.enable_routing = True
+g_phy.add_nodes_from(g_in, retain=["device_type", "asn"])
+links = [("r1", "r2"), ("r2", "r4"), ("r1", "sw1"), ("r3", "sw1"),
+         ("r4", "sw1")]
+g_phy.add_edges_from([(g_phy.node(src).add_interface(),
+    g_phy.node(dst).add_interface()) for (src, dst) in links])
+g_l3 = anm.add_overlay("layer3")
+g_l3.add_nodes_from(g_phy, retain="asn")
+g_l3.add_edges_from(g_phy.edges())
+ank_utils.multipoint_nodes(g_l3, g_l3.switches())
+for segment in g_l3.segments():
+    for interface in segment.interfaces():
+        interface.multipoint = True
+
+igp.build_ospf(anm)
+igp.build_eigrp(anm)
+
+# intra-AS links only, the segment split by AS
+g_l3_igp = anm["layer3_igp"]
+for overlay_id in ("layer3_igp", "ospf", "eigrp"):
+    overlay = anm[overlay_id]
+    assert sorted(str(n) for n in overlay) == ["r1", "r2", "r3", "r4"]
+    assert [(str(e.src), str(e.dst)) for e in overlay.edges(
+        segments=False)] == [("r1", "r2")]
+    assert [s.segment_id for s in overlay.segments()] == ["sw1_1"]
+    assert sorted(str(n) for n in overlay.segment("sw1_1")) == ["r1", "r3"]
+
+# protocol attributes are stored on each overlay only
+g_ospf = anm["ospf"]
+g_eigrp = anm["eigrp"]
+assert g_ospf.edge("r1", "r2").cost == 1
+assert g_ospf.edge("r1", "r2").metric is None
+assert g_eigrp.edge("r1", "r2").metric == 1
+assert g_eigrp.edge("r1", "r2").area is None
+interface = g_ospf.edge("r1", "r2").src_int
+assert (interface.cost, interface.area) == (1, 0)
+interface = g_eigrp.edge("r1", "r2").src_int
+assert (interface.metric, interface.cost) == (1, None)
+assert g_l3_igp.node("r3").interface(1).multipoint  # copied from layer3
+assert g_l3_igp.node("r3").interface(1).metric is None
+
+# interfaces are shared copy-on-write
+graph_eigrp = ank_utils.unwrap_graph(g_eigrp)
+graph_l3_igp = ank_utils.unwrap_graph(g_l3_igp)
+assert graph_eigrp.node["r4"]["_interfaces"][0] is \
+    graph_l3_igp.node["r4"]["_interfaces"][0]
+assert graph_eigrp.node["r2"]["_interfaces"][1] is \
+    graph_eigrp.node["r1"]["_interfaces"][1]  # same attributes
+g_eigrp.node("r2").interface(1).description = "to r1"
+assert g_eigrp.node("r1").interface(1).description is None
+assert g_ospf.node("r2").interface(1).description is None
+
+# the base is reused
+igp.build_eigrp(anm)
+assert anm["layer3_igp"] is g_l3_igp
+assert graph_l3_igp is ank_utils.unwrap_graph(anm["layer3_igp"])
+
+# edges have an interface map per overlay
+graph_ospf = ank_utils.unwrap_graph(g_ospf)
+graph_ospf["r1"]["r2"]["_interfaces"]["r1"] = 2
+assert graph_eigrp["r1"]["r2"]["_interfaces"]["r1"] == 1
+assert graph_l3_igp["r1"]["r2"]["_interfaces"]["r1"] == 1
+
+# the base is internal, and rebuilt once layer3 is replaced
+assert "layer3_igp" not in anm.overlays()
+assert "ospf" in anm.overlays()
+g_l3 = anm.add_overlay("layer3")
+g_l3.add_nodes_from(g_phy, retain="asn")
+g_l3.add_edges_from(g_phy.edges())
+assert not anm.has_overlay("layer3_igp")
+assert anm._overlay_parents.get("eigrp") is None
+igp.build_ospf(anm)
+assert anm["layer3_igp"] is not g_l3_igp
+assert sorted(tuple(sorted((str(e.src), str(e.dst)))) for e
+              in anm["ospf"].edges()) == [("r1", "r2"), ("r1", "sw1"),
+                                          ("r3", "sw1")]  # no segments
@@ -0,0 +1,32 @@
+import autonetkit
+import autonetkit.log as log
+
+log.info("Testing interface id allocation")
+
+anm = autonetkit.anm.NetworkModel()
+g_phy = anm["phy"]
+g_phy.add_nodes_from(["r1"])
+r1 = g_phy.node("r1")
+assert [r1.add_interface().interface_id for _ in range(3)] == [1, 2, 3]
+
+# dicts resized directly are rescanned: the lowest free id
+interfaces = r1._interfaces
+interfaces[5] = {'type': 'physical', 'description': None}
+assert r1.add_interface().interface_id == 4
+del interfaces[2]
+assert r1.add_interface().interface_id == 2
+assert r1.add_interface().interface_id == 6
+
+# and replaced dicts
+r1._interfaces = dict((i, data) for (i, data) in interfaces.items()
+                      if i != 3)
+assert r1.add_interface().interface_id == 3
+
+# in-place changes keeping the size aren't seen: still a free id, but not
+# the lowest
+interfaces = r1._interfaces
+del interfaces[1]
+interfaces[11] = {'type': 'physical', 'description': None}
+interface_id = r1.add_interface().interface_id
+assert interface_id == 7
+assert sorted(r1._interfaces) == [0, 2, 3, 4, 5, 6, 7, 11]
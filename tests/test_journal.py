@@ -0,0 +1,45 @@
+import autonetkit
+import autonetkit.log as log
+
+log.info("Testing ANM journal")
+
+anm = autonetkit.anm.NetworkModel()
+g_in = anm.add_overlay("input")
+g_in.add_nodes_from(["r1", "r2", "r3"])
+
+assert anm.journal is None  # off by default
+journal = anm.enable_journal()
+assert anm.enable_journal() is journal
+
+start = journal.checkpoint()
+g_in.update(asn=1)
+r1 = g_in.node("r1")
+eth0 = r1.add_interface("eth0")
+eth0.speed = 100
+g_in.add_edges_from([("r1", "r2"), ("r2", "r3")])
+g_in.edge("r1", "r2").weight = 10
+g_in.data.igp = "ospf"
+
+changed_nodes = journal.changed_items(start, "input", "node")
+assert changed_nodes == set(["r1", "r2", "r3"])
+assert journal.changed_items(start, kind="interface") == set([("r1", 1)])
+assert journal.changed_items(start, kind="edge") == set([("r1", "r2"),
+    ("r2", "r3")])
+graph_changes = journal.changes_since(start, kind="graph")
+assert [(c.action, c.key) for c in graph_changes] == [("set", "igp")]
+
+middle = journal.checkpoint()
+assert journal.changes_since(middle) == []
+g_in.remove_node("r3")
+changes = journal.changes_since(middle)
+assert [(c.action, c.kind, c.item) for c in changes] == [
+    ("remove", "edge", ("r3", "r2")),
+    ("remove", "node", "r3"),
+    ]
+
+anm.add_overlay("phy_test")
+assert journal.changed_overlays(middle) == set(["input", "phy_test"])
+
+anm.disable_journal()
+g_in.update(asn=2)
+assert anm.journal is None
@@ -0,0 +1,31 @@
+import json
+import os
+
+import autonetkit.ank_json as ank_json
+import autonetkit.build_network as build_network
+import autonetkit.load.graphml as graphml
+import autonetkit.log as log
+
+log.info("Testing lazily built overlays")
+
+lazy_overlays = ["eigrp", "isis", "mpls_oam", "mpls_te"]
+dirname, filename = os.path.split(os.path.abspath(__file__))
+input_file = os.path.join(dirname, "small_internet.graphml")
+
+# build() publishes the model for visualisation, without building them
+anm = build_network.build(graphml.load_graphml(input_file))
+assert sorted(anm._overlay_builders) == lazy_overlays
+assert not any(overlay_id in anm.overlays() for overlay_id in lazy_overlays)
+exported = json.loads(ank_json.dumps(anm))
+assert not any(overlay_id in exported for overlay_id in lazy_overlays)
+assert anm.has_overlay("layer3_igp") and "layer3_igp" not in exported
+
+# built on first access
+assert anm["mpls_oam"] is not None
+assert "mpls_oam" in anm.overlays()
+assert sorted(anm._overlay_builders) == ["eigrp", "isis", "mpls_te"]
+
+# and all of them to be saved
+ank_json.jsonify_anm(anm)
+assert not anm._overlay_builders
+assert all(overlay_id in anm.overlays() for overlay_id in lazy_overlays)
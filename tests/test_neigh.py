@@ -0,0 +1,59 @@
+import random
+
+import autonetkit
+import autonetkit.ank as ank_utils
+import autonetkit.log as log
+
+log.info("Testing bulk neighbor aggregates")
+
+rng = random.Random(0)
+anm = autonetkit.anm.NetworkModel()
+g_phy = anm["phy"]
+node_ids = ["r%s" % index for index in range(60)]
+g_phy.add_nodes_from(node_ids)
+g_phy.add_edges_from(set(tuple(rng.sample(node_ids, 2)) for _ in range(150)))
+for node in g_phy:
+    node.asn = rng.choice([1, 2, 3, None])
+    node.host = rng.choice(["h1", "h1", "h2"])
+    node.x = rng.random() * 100
+    node.label_type = rng.choice(["a", "b", "c"])
+
+# a second overlay, with some neighbors missing, for attribute_graph
+g_attr = anm.add_overlay("attr")
+g_attr.add_nodes_from(node for node in g_phy if node.node_id != "r1")
+for node in g_attr:
+    node.asn = g_phy.node(node).asn
+
+nodes = [node for node in g_phy if node.degree()]
+for attr in ["x", "label_type"]:
+    assert ank_utils.neigh_averages(g_phy, nodes, attr) == [
+        ank_utils.neigh_average(g_phy, node, attr) for node in nodes]
+
+for allow_none in [True, False]:
+    assert ank_utils.neigh_most_frequents(g_phy, nodes, "asn",
+                                          allow_none=allow_none) == [
+        ank_utils.neigh_most_frequent(g_phy, node, "asn",
+                                      allow_none=allow_none)
+        for node in nodes]
+
+nodes = list(g_phy)  # including nodes without neighbors
+for (attr, attribute_graph) in [("asn", None), ("host", None),
+                                ("asn", g_attr)]:
+    assert ank_utils.neigh_equals(g_phy, nodes, attr, attribute_graph) == [
+        ank_utils.neigh_equal(g_phy, node, attr, attribute_graph)
+        for node in nodes]
+    assert ank_utils.neigh_attrs(g_phy, nodes, attr, attribute_graph) == [
+        list(ank_utils.neigh_attr(g_phy, node, attr, attribute_graph))
+        for node in nodes]
+
+# a snapshot of the neighbors can be shared between calls
+neighbors = ank_utils.neigh_adjacency(g_phy, nodes)
+assert ank_utils.neigh_equals(g_phy, neighbors, "asn") == \
+    ank_utils.neigh_equals(g_phy, nodes, "asn")
+assert ank_utils.neigh_attrs(g_phy, neighbors, "host") == \
+    ank_utils.neigh_attrs(g_phy, nodes, "host")
+
+# ties go to the value seen first
+assert ank_utils.most_frequent([3, 2, 2, 3, 1]) == 3
+assert ank_utils.most_frequent(["b", "a"]) == "b"
+assert ank_utils.most_frequent([[1], [2], [2]]) == [2]  # unhashable
@@ -0,0 +1,86 @@
+import netaddr
+
+import autonetkit
+import autonetkit.ank as ank_utils
+import autonetkit.design.igp as igp
+import autonetkit.log as log
+
+log.info("Testing OSPF areas")
+
+def ospf_anm(areas, links, switches=()):
+    anm = autonetkit.anm.NetworkModel()
+    g_in = anm.add_overlay("input")
+    g_in.add_nodes_from(sorted(areas), device_type="router", asn=1,
+                        igp="ospf")
+    for (node_id, area) in areas.items():
+        g_in.node(node_id).ospf_area = area
+    g_phy = anm["phy"]
+    g_phy.data.enable_routing = True
+    g_phy.add_nodes_from(g_in, retain=["device_type", "asn"])
+    for node in g_phy:
+        node.add_loopback()  # interface 0
+    g_phy.add_nodes_from(switches, device_type="switch", asn=1)
+    g_phy.add_edges_from([(g_phy.node(src).add_interface(),
+        g_phy.node(dst).add_interface()) for (src, dst) in links])
+    g_l3 = anm.add_overlay("layer3")
+    g_l3.add_nodes_from(g_phy, retain="asn")
+    g_l3.add_edges_from(g_phy.edges())
+    ank_utils.multipoint_nodes(g_l3, g_l3.switches())
+    igp.build_ospf(anm)
+    return anm["ospf"]
+
+g_ospf = ospf_anm({"r1": "0", "r2": 0, "r3": "1", "r4": "1", "r5": 2,
+                   "r6": "invalid", "r7": None},
+                  [("r1", "r2"), ("r2", "r3"), ("r3", "r4"), ("r4", "r5"),
+                   ("r1", "r6"), ("r5", "r7")])
+
+assert [g_ospf.node(n).area for n in ("r1", "r3", "r5", "r6", "r7")] == [
+    0, 1, 2, 0, 0]
+assert g_ospf.edge("r1", "r2").area == 0
+assert g_ospf.edge("r2", "r3").area == 1  # backbone to other area
+assert g_ospf.edge("r3", "r4").area == 1
+assert g_ospf.edge("r4", "r5").area is None  # area 1 to area 2
+assert g_ospf.edge("r5", "r7").area == 2
+
+types = dict((str(n), n.type) for n in g_ospf)
+assert types == {"r1": "backbone", "r2": "backbone ABR", "r3": "internal",
+                 "r4": "INVALID", "r5": "INVALID", "r6": "backbone",
+                 "r7": "internal"}
+assert sorted(g_ospf.node("r2").areas) == [0, 1]
+assert set(g_ospf.node("r4").areas) == set([1, None])
+
+# areas and costs are mapped onto interfaces
+edge = g_ospf.edge("r2", "r3")
+assert edge.cost == 1
+assert [(i.area, i.cost) for i in edge.interfaces()] == [(1, 1), (1, 1)]
+loopback = g_ospf.node("r3").interface(0)
+assert (loopback.area, loopback.cost) == (1, 0)
+assert g_ospf.node("r3").process_id == 1
+
+# 0.0.0.0 in use: unset areas default to it, and 0 is kept distinct
+area_zero_ip = netaddr.IPAddress("0.0.0.0")
+g_ospf = ospf_anm({"r1": "0.0.0.0", "r2": None, "r3": "0", "r4": "0.0.0.1"},
+                  [("r1", "r2"), ("r2", "r3"), ("r3", "r4")])
+assert g_ospf.node("r2").area == area_zero_ip
+assert isinstance(g_ospf.node("r3").area, int)
+assert g_ospf.edge("r1", "r2").area == area_zero_ip
+assert g_ospf.edge("r2", "r3").area == area_zero_ip  # router seen first
+assert g_ospf.edge("r3", "r4").area == netaddr.IPAddress("0.0.0.1")
+assert g_ospf.node("r3").type == "backbone ABR"
+assert g_ospf.node("r4").type == "internal"
+
+# a LAN is in one area, also if its routers are in several
+g_ospf = ospf_anm({"r1": "0", "r2": "0.0.0.0", "r3": 1, "r4": 2,
+                   "r5": "0.0.0.1"},
+                  [("r1", "sw1"), ("r2", "sw1"), ("r3", "sw2"),
+                   ("r4", "sw2"), ("r5", "sw2"), ("r1", "r3")],
+                  switches=["sw1", "sw2"])
+areas = dict((tuple(sorted(str(n) for n in segment)), segment.area)
+             for segment in g_ospf.segments())
+assert areas == {("r1", "r2"): 0, ("r3", "r4", "r5"): 1}  # lowest area
+for router in g_ospf:
+    assert None not in router.areas
+    assert all(interface.area is not None for interface
+               in router.physical_interfaces)
+assert set(g_ospf.node("r4").areas) == set([1])
+assert g_ospf.node("r4").type == "internal"
@@ -0,0 +1,89 @@
+import autonetkit
+import autonetkit.ank as ank_utils
+import autonetkit.log as log
+
+log.info("Testing ANM multipoint segments")
+
+anm = autonetkit.anm.NetworkModel()
+g_phy = anm["phy"]
+g_phy.add_nodes_from(["r1", "r2", "r3", "r4", "sw1"], device_type="router")
+g_phy.node("sw1").device_type = "switch"
+g_phy.update(asn=1)
+g_phy.node("r4").asn = 2
+links = [("r1", "sw1"), ("r2", "sw1"), ("r3", "sw1"), ("r4", "sw1"),
+    ("r1", "r2")]
+g_phy.add_edges_from([(g_phy.node(src).add_interface(),
+    g_phy.node(dst).add_interface()) for (src, dst) in links])
+
+g_l3 = anm.add_overlay("layer3")
+g_l3.add_nodes_from(g_phy)
+g_l3.add_edges_from(g_phy.edges())
+sw1_interfaces = dict((e.dst_id, e.dst_int.interface_id)
+                      for e in g_phy.node("sw1").edges())
+r1_r2_interface = g_phy.edge("r1", "r2").src_int
+
+segments = ank_utils.multipoint_nodes(g_l3, g_l3.switches())
+assert [s.segment_id for s in segments] == ["sw1"]
+segment = g_l3.segment("sw1")
+assert segment.multipoint
+assert sorted(str(n) for n in segment) == ["r1", "r2", "r3", "r4"]
+assert "sw1" not in g_l3
+
+# pairs are expanded on demand, as the full mesh explode_nodes adds
+assert len(g_l3.edges()) == 6
+assert len(g_l3.edges(segments=False)) == 1  # r1 - r2, bound to sw1
+r1 = g_l3.node("r1")
+assert sorted(str(n) for n in r1.neighbors()) == ["r2", "r3", "r4"]
+assert r1.degree() == 3
+edge = g_l3.edge("r3", "r4")
+assert edge and edge.multipoint
+assert edge.dst_int.interface_id == sw1_interfaces["r4"]
+
+# the edge already between two members is bound to the segment instead
+edge = g_l3.edge("r1", "r2")
+assert edge.src_int.interface_id == sw1_interfaces["r1"]
+assert not g_l3.interface(r1_r2_interface).is_bound
+
+r3_int = g_l3.node("r3").interface(sw1_interfaces["r3"])
+assert r3_int.is_bound
+assert sorted(str(i.node) for i in r3_int.neighbors()) == ["r1", "r2", "r4"]
+
+# filtering tests each segment once, from its attributes
+assert len(g_l3.edges(multipoint=True)) == 6
+assert g_l3.edges(type="physical") == []
+
+# setting an attribute stores only that pair as an edge
+g_l3.edge("r3", "r4").cost = 10
+assert g_l3.edge("r3", "r4").cost == 10
+assert g_l3.edge("r2", "r3").cost is None
+assert len(g_l3.edges(segments=False)) == 2
+assert len(g_l3.edges()) == 6
+
+# removing a pair keeps the rest of the segment
+g_l3.remove_edges_from([g_l3.edge("r2", "r3")])
+assert not g_l3.edge("r2", "r3")
+assert len(g_l3.edges()) == 5
+
+# copies join the same interfaces, for members in the overlay
+g_copy = anm.add_overlay("copy")
+g_copy.add_nodes_from(n for n in g_l3 if n.asn == 1)
+g_copy.add_segments_from(g_l3.segments())
+assert sorted(str(n) for n in g_copy.segment("sw1")) == ["r1", "r2", "r3"]
+assert g_copy.segment("sw1").multipoint is None  # not retained
+assert len(g_copy.edges()) == 2  # r2 - r3 was removed
+
+# splitting on an attribute drops members left alone
+ank_utils.split_segments(g_l3, "asn")
+assert [s.segment_id for s in g_l3.segments()] == ["sw1_1"]
+assert "r4" not in g_l3.segment("sw1_1")
+
+# groups: only members with different values are adjacent
+g_ebgp = anm.add_overlay("ebgp", directed=True)
+g_ebgp.add_nodes_from(g_phy)
+g_ebgp.add_edges_from(g_phy.edges(), bidirectional=True)
+ank_utils.multipoint_nodes(g_ebgp, g_ebgp.switches(), group_attr="asn")
+assert sorted((str(e.src), str(e.dst)) for e in g_ebgp.edges()
+              if e.multipoint) == [
+    ("r1", "r4"), ("r2", "r4"), ("r3", "r4"),
+    ("r4", "r1"), ("r4", "r2"), ("r4", "r3")]
+assert not g_ebgp.edge("r2", "r3")
@@ -0,0 +1,33 @@
+import autonetkit
+import autonetkit.log as log
+
+log.info("Testing ANM sort order")
+
+anm = autonetkit.anm.NetworkModel()
+g_phy = anm["phy"]
+g_phy.add_nodes_from(["r11", "r2", "r1", "a12", "r12"])
+g_phy.update(asn=1)
+g_phy.node("a12").asn = 2
+
+# natural order on label within asn, then asn
+assert [str(n) for n in sorted(g_phy)] == ["r1", "r2", "r11", "r12", "a12"]
+
+# relabelling updates the order
+g_phy.node("r2").label = "r20"
+assert [str(n) for n in sorted(g_phy)] == ["r1", "r11", "r12", "r20", "a12"]
+
+# interfaces sort on node, then interface id
+r1 = g_phy.node("r1")
+r11 = g_phy.node("r11")
+r11_first = r11.add_interface()
+r11_second = r11.add_interface()
+r1_first = r1.add_interface()
+assert sorted([r11_second, r1_first, r11_first]) == [r1_first, r11_first,
+    r11_second]
+
+# edges sort on (src, dst) nodes
+g_directed = anm.add_overlay("directed", directed=True)
+g_directed.add_nodes_from(g_phy)
+g_directed.add_edges_from([("r11", "r1"), ("r1", "r12"), ("r1", "r11")])
+assert [(str(e.src), str(e.dst)) for e in sorted(g_directed.edges())] == [
+    ("r1", "r11"), ("r1", "r12"), ("r11", "r1")]
@@ -0,0 +1,68 @@
+import random
+
+import networkx as nx
+
+import autonetkit
+import autonetkit.log as log
+from autonetkit.ank_utils import SubgraphView
+
+log.info("Testing subgraph views")
+
+
+def edge_set(edges, directed):
+    """Edges as sorted tuples, with undirected edges in src < dst order"""
+    if directed:
+        return sorted(edges)
+    return sorted((min(e[:2]), max(e[:2])) + tuple(e[2:]) for e in edges)
+
+rng = random.Random(0)
+for graph_class in [nx.Graph, nx.DiGraph, nx.MultiGraph]:
+    graph = graph_class()
+    graph.add_nodes_from(range(50), asn=1)
+    graph.add_edges_from((rng.randrange(50), rng.randrange(50), {"w": i})
+                         for i in range(150))
+    nbunch = rng.sample(range(60), 30)  # some not in the graph
+    view = SubgraphView(graph, nbunch)
+    copy = graph.subgraph(nbunch)
+
+    assert sorted(view) == sorted(copy) and len(view) == len(copy)
+    directed = graph.is_directed()
+    assert edge_set(view.edges(), directed) == \
+        edge_set(copy.edges(), directed)
+    assert edge_set(view.edges(data=True), directed) == \
+        edge_set(copy.edges(data=True), directed)
+    assert view.degree() == copy.degree()
+    assert view.size() == copy.size()
+    for node in copy:
+        assert sorted(view.neighbors(node)) == sorted(copy.neighbors(node))
+        assert edge_set(view.edges(node), directed) == \
+            edge_set(copy.edges(node), directed)
+        assert view.degree(node) == copy.degree(node)
+        assert view.node[node] is graph.node[node]  # not copied
+    if graph.is_directed():
+        assert sorted(view.in_edges()) == sorted(copy.in_edges())
+        assert nx.is_strongly_connected(view) == \
+            nx.is_strongly_connected(copy)
+    else:
+        assert nx.number_connected_components(view) == \
+            nx.number_connected_components(copy)
+
+    # data is shared with the graph
+    node = next(iter(view))
+    view.node[node]["asn"] = 2
+    assert graph.node[node]["asn"] == 2
+    assert 55 not in view and not view.has_node(55)
+
+# overlay subgraphs
+anm = autonetkit.anm.NetworkModel()
+g_phy = anm["phy"]
+g_phy.add_nodes_from(["r1", "r2", "r3", "r4"], asn=1)
+g_phy.add_edges_from([("r1", "r2"), ("r2", "r3"), ("r3", "r4")])
+g_phy.node("r4").asn = 2
+sub = g_phy.subgraph(g_phy.nodes(asn=1), "asn1")
+assert str(sub) == "asn1"
+assert sorted(str(n) for n in sub) == ["r1", "r2", "r3"]
+assert len(sub.edges()) == 2
+assert sub.node("r1") and not sub.node("r4")
+assert [str(n) for n in sub.nodes(asn=1)] == ["r1", "r2", "r3"]
+assert sorted(str(e.dst) for e in sub.edges(sub.node("r3"))) == ["r2"]
@@ -0,0 +1,70 @@
+import os
+import shutil
+import tempfile
+
+import autonetkit.build_network as build_network
+import autonetkit.console_script as console_script
+import autonetkit.load.graphml as graphml
+import autonetkit.log as log
+import autonetkit.render as render
+
+log.info("Testing OSPF areas rendered for switched LANs")
+
+dirname, filename = os.path.split(os.path.abspath(__file__))
+
+def rendered_ospf_areas(name, ospf_areas=None):
+    """Builds, compiles and renders tests/name.graphml with ospf_areas
+    set on the input, and returns {router: {network: area}} from the
+    rendered Quagga ospfd.conf files"""
+    input_graph = graphml.load_graphml(os.path.join(dirname,
+                                                    "%s.graphml" % name))
+    for (node, area) in (ospf_areas or {}).items():
+        input_graph.node[node]['ospf_area'] = area
+    anm = build_network.build(input_graph)
+    nidb = console_script.compile_network(anm)
+
+    cwd = os.getcwd()
+    render_dir = tempfile.mkdtemp()
+    os.chdir(render_dir)
+    try:
+        render.render(nidb)
+        result = {}
+        netkit_dir = os.path.join("rendered", "localhost", "netkit")
+        for router in os.listdir(netkit_dir):
+            path = os.path.join(netkit_dir, router, "etc", "zebra",
+                                "ospfd.conf")
+            if not os.path.isfile(path):
+                continue
+            networks = [line.split() for line in open(path)
+                        if line.strip().startswith("network")]
+            result[router] = dict((network, area) for
+                                  (_, network, _, area) in networks)
+        return result
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(render_dir)
+
+def lan_areas(ospf_areas, routers):
+    """Returns the areas rendered for the network shared by routers"""
+    (network, ) = set.intersection(*(set(ospf_areas[router])
+                                     for router in routers))
+    return [ospf_areas[router][network] for router in routers]
+
+def all_areas(ospf_areas):
+    """Returns the distinct areas rendered over all routers"""
+    return set(area for areas in ospf_areas.values()
+               for area in areas.values())
+
+as1_lan = ["as1r1", "as1r2", "as1r3"]  # over as1sw1 and as1sw2
+as2_lan = ["as2r1", "as2r2", "as2r3"]  # over as2sw1, in area 1
+for name in ["sw_netkit", "sw_netkit_ixp"]:
+    ospf_areas = rendered_ospf_areas(name)
+    assert all_areas(ospf_areas) == set(["0", "1"])
+    assert lan_areas(ospf_areas, as1_lan) == ["0", "0", "0"]
+    assert lan_areas(ospf_areas, as2_lan) == ["1", "1", "1"]
+
+# a LAN with routers in several non-backbone areas is in the lowest
+ospf_areas = rendered_ospf_areas("sw_netkit_ixp", {"as1r1": "1",
+    "as1r2": "2", "as1r3": "0.0.0.1"})
+assert "None" not in all_areas(ospf_areas)
+assert lan_areas(ospf_areas, as1_lan) == ["1", "1", "1"]
@@ -0,0 +1,69 @@
+import autonetkit
+import autonetkit.ank as ank_utils
+import autonetkit.ank_json as ank_json
+import autonetkit.log as log
+
+log.info("Testing overlay views")
+
+anm = autonetkit.anm.NetworkModel()
+g_phy = anm["phy"]
+g_phy.add_nodes_from(["r1", "r2", "r3", "r4", "sw1"], device_type="router")
+g_phy.node("sw1").device_type = "switch"
+g_phy.update(asn=1)
+g_phy.node("r3").asn = 2
+g_phy.node("r4").asn = 3
+links = [("r1", "r3"), ("r2", "sw1"), ("r3", "sw1"), ("r4", "sw1")]
+g_phy.add_edges_from([(g_phy.node(src).add_interface(),
+    g_phy.node(dst).add_interface()) for (src, dst) in links])
+
+g_ebgp = anm.add_overlay("ebgp", directed=True)
+g_ebgp.add_nodes_from(g_phy)
+g_ebgp.add_edges_from(g_phy.edges(), bidirectional=True, type="ebgp")
+ank_utils.multipoint_nodes(g_ebgp, g_ebgp.switches(), group_attr="asn")
+
+g_view = anm.add_overlay_view("ebgp_v4", "ebgp", ["r1", "r3", "r4"])
+assert sorted(str(n) for n in g_view) == ["r1", "r3", "r4"]
+assert "r2" not in g_view
+
+# edges and segment pairs between nodes of the view, bound as in ebgp
+assert sorted((str(e.src), str(e.dst)) for e in g_view.edges()) == [
+    ("r1", "r3"), ("r3", "r1"), ("r3", "r4"), ("r4", "r3")]
+assert len(g_view.edges(segments=False)) == 2
+assert [s.segment_id for s in g_view.segments()] == ["sw1"]
+assert sorted(str(n) for n in g_view.segment("sw1")) == ["r3", "r4"]
+edge = g_view.edge("r1", "r3")
+assert edge.type == "ebgp"
+assert edge.src_int.interface_id == g_ebgp.edge("r1", "r3").src_int.interface_id
+assert sorted(str(n) for n in g_view.node("r3").neighbors()) == ["r1", "r4"]
+
+# data is shared: attributes set on either are seen by both
+edge.exclude = True
+assert g_ebgp.edge("r1", "r3").exclude
+g_ebgp.node("r4").note = "x"
+assert g_view.node("r4").note == "x"
+
+# a segment pair stored as an edge is stored on ebgp
+g_view.edge("r3", "r4").exclude = True
+assert g_ebgp.edge("r3", "r4").exclude
+assert g_view.edge("r3", "r4").exclude
+assert len(g_view.edges(segments=False)) == 3
+
+# edges added to ebgp show in the view, and its caches are dropped
+assert not g_view.edge("r1", "r4")
+g_ebgp.add_edges_from([("r1", "r4")])
+assert g_view.edge("r1", "r4")
+assert g_view.node("r1").degree() == 3  # in and out
+
+# indexed filters see attributes set through the other overlay
+anm.index_edge_attributes("exclude")
+assert len(g_view.edges(exclude=True)) == 2
+g_ebgp.edge("r1", "r4").exclude = True
+assert len(g_view.edges(exclude=True)) == 3
+
+# exported as a copy: ebgp keeps its segments
+ank_json.jsonify_anm_with_graphics(anm)
+assert [s.segment_id for s in g_ebgp.segments()] == ["sw1"]
+
+# replacing ebgp leaves the view on the graph it was added on
+anm.add_overlay("ebgp", directed=True)
+assert len(g_view) == 3